@@ -17,6 +17,7 @@ class Agent:
         self.stamina = 500  # 初始体力值，为0则失败
         self.gold = 0           # 金币：目标性资源，需要最大化
         self.inventory = defaultdict(int) # 使用defaultdict作为背包
+        self.bosses_defeated = 0  # 已经击败的BOSS数，重新规划时据此判断是否已经过BOSS
         
     # def move(self, dx: int, dy: int):
     #     """
@@ -0,0 +1,147 @@
+# labyrinthos/batch_generator.py
+"""
+无界面的批量地图生成工具，用于回归测试和对战比赛。
+
+用法示例（在 Labyrinthos 目录下运行）:
+    python batch_generator.py --count 1000 --sizes 21 31 51 --difficulties 简单 困难 --seed 0 --workers 8
+    python batch_generator.py --count 500 --sizes 15 --calibrate --gold-min 10 --gold-max 30
+    python batch_generator.py --precompute-fields   # 为已有地图补算距离场文件
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from environment import Environment, CompactEnvironment
+from io_handler import MAPS_DIR, save_maze_to_json, save_maze_to_binary, precompute_saved_fields
+from mapped_environment import MAZE_EXT
+from components.world_generator import generate_world, generate_calibrated_world
+from components.strategy_core.map_evaluator import DEFAULT_STAMINA
+
+
+def generate_one(index: int, size: int, difficulty: str, seed: int, fmt: str,
+                 calibrate: tuple | None = None) -> dict:
+    """
+    生成并保存一张地图，返回它在清单中的记录。在工作进程中运行。
+
+    calibrate 为 (gold_band, stamina) 时使用校准模式生成；校准失败的地图不保存。
+    生成过程中的打印输出会被丢弃，避免成千上万张地图刷屏。
+    """
+    started = time.perf_counter()
+    env = CompactEnvironment(size, size)
+    score = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        if calibrate is None:
+            generate_world(env, difficulty, seed=seed)
+        else:
+            score = generate_calibrated_world(env, difficulty, calibrate[0], calibrate[1], seed=seed)
+        elapsed = time.perf_counter() - started
+        filename = f"map_{size}x{size}_seed{seed}_{index:05d}"
+        if calibrate is not None and score is None:
+            filepath = None
+        elif fmt == 'maze':
+            filepath = save_maze_to_binary(env, filename + MAZE_EXT)
+        else:
+            filepath = save_maze_to_json(env, filename + '.json')
+    record = {
+        "file": os.path.basename(filepath) if filepath else None,
+        "seed": seed,
+        "width": env.width,
+        "height": env.height,
+        "difficulty": difficulty,
+        "elements": {element: env.count(element) for element in Environment.INDEXED_ELEMENTS},
+        "generation_seconds": round(elapsed, 6),
+    }
+    if score is not None:
+        record["best_gold"] = score["best_gold"]
+        record["route_length"] = score["route_length"]
+    return record
+
+
+def generate_batch(count: int, sizes: list[int], difficulties: list[str], base_seed: int = 0,
+                   workers: int | None = None, fmt: str = 'json', calibrate: tuple | None = None) -> str:
+    """
+    用进程池批量生成 count 张地图，并在地图目录中写出清单文件。
+
+    第 i 张地图的种子为 base_seed + i，尺寸和难度按 sizes、difficulties 轮流组合，
+    因此同样的参数总是生成同样的一批地图。calibrate 见 generate_one。
+
+    Returns:
+        str: 清单文件的路径。
+    """
+    os.makedirs(MAPS_DIR, exist_ok=True)
+    jobs = []
+    for i in range(count):
+        size = sizes[i % len(sizes)]
+        difficulty = difficulties[(i // len(sizes)) % len(difficulties)]
+        jobs.append((i, size, difficulty, base_seed + i, fmt, calibrate))
+
+    started = time.perf_counter()
+    records = []
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            records = list(executor.map(generate_one, *zip(*jobs), chunksize=max(1, count // 64)))
+    total = time.perf_counter() - started
+
+    manifest = {
+        "generated_at": str(datetime.now()),
+        "count": count,
+        "sizes": sizes,
+        "difficulties": difficulties,
+        "base_seed": base_seed,
+        "calibrate": calibrate,
+        "total_seconds": round(total, 3),
+        "maps": records,
+    }
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    manifest_path = os.path.join(MAPS_DIR, f"manifest_{timestamp}.json")
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    failed = sum(1 for record in records if record["file"] is None)
+    print(f"已生成 {count - failed}/{count} 张地图，用时 {total:.2f} 秒，清单: {manifest_path}")
+    return manifest_path
+
+
+def _positive_int(text: str) -> int:
+    """argparse 的类型检查：只接受正整数。"""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"必须是正整数: {text}")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量生成迷宫地图")
+    parser.add_argument("--count", type=_positive_int, default=100, help="生成的地图数量")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[21, 31, 51], help="迷宫边长（奇数）")
+    parser.add_argument("--difficulties", nargs="+", default=['简单', '困难'], help="难度列表")
+    parser.add_argument("--seed", type=int, default=0, help="第一张地图的随机种子")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认为CPU核数")
+    parser.add_argument("--format", choices=['json', 'maze'], default='json', help="地图文件格式")
+    parser.add_argument("--calibrate", action="store_true", help="使用校准模式：保证体力内可通关")
+    parser.add_argument("--gold-min", type=int, default=None, help="校准模式下最优金币的下限")
+    parser.add_argument("--gold-max", type=int, default=None, help="校准模式下最优金币的上限")
+    parser.add_argument("--stamina", type=int, default=DEFAULT_STAMINA, help="校准模式下的体力")
+    parser.add_argument("--precompute-fields", action="store_true", help="只为地图目录中已有的地图补算距离场文件")
+    args = parser.parse_args()
+    if args.precompute_fields:
+        print(f"已为 {precompute_saved_fields()} 张地图生成距离场文件。")
+        return
+    calibrate = None
+    if args.calibrate:
+        gold_band = None
+        if args.gold_min is not None or args.gold_max is not None:
+            gold_band = (args.gold_min if args.gold_min is not None else -10**9,
+                         args.gold_max if args.gold_max is not None else 10**9)
+        calibrate = (gold_band, args.stamina)
+    generate_batch(args.count, args.sizes, args.difficulties, args.seed, args.workers, args.format, calibrate)
+
+
+if __name__ == "__main__":
+    main()
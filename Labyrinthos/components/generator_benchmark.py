@@ -0,0 +1,80 @@
+# labyrinthos/components/generator_benchmark.py
+import sys
+import os
+import random
+import time
+import tracemalloc
+
+# 添加项目根目录到模块搜索路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from environment import Environment, CompactEnvironment
+from components.maze_generators import MAZE_GENERATORS, carve_with
+
+# 默认测试的迷宫尺寸（边长）
+DEFAULT_SIZES = (101, 501, 1001, 2001, 4001, 8001)
+
+
+def benchmark_generation(sizes=DEFAULT_SIZES, env_classes=(CompactEnvironment,), seed: int = 0,
+                         algorithms=('recursive_division',), measure_memory: bool = True) -> list[dict]:
+    """
+    测量迷宫雕刻的吞吐量（单元格/秒）和峰值内存。
+
+    计时与内存测量分两次运行，避免 tracemalloc 的开销影响计时；
+    峰值内存只统计雕刻过程中新分配的内存，不含环境本身的网格。
+
+    Args:
+        sizes: 要测试的迷宫边长列表，每个尺寸生成一张 size x size 的迷宫。
+        env_classes: 要比较的环境存储类型。
+        seed (int): 随机种子，保证每次测试的迷宫相同。
+        algorithms: 要比较的生成算法名称，见 MAZE_GENERATORS。
+        measure_memory (bool): 是否额外运行一次来测量峰值内存。
+
+    Returns:
+        list[dict]: 每个 (算法, 存储类型, 尺寸) 一条记录。
+    """
+    results = []
+    for algorithm in algorithms:
+        for env_class in env_classes:
+            for size in sizes:
+                env = env_class(size, size)
+                started = time.perf_counter()
+                carve_with(env, algorithm, random.Random(seed))
+                elapsed = time.perf_counter() - started
+
+                peak = None
+                if measure_memory:
+                    env = env_class(size, size)
+                    tracemalloc.start()
+                    carve_with(env, algorithm, random.Random(seed))
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+
+                cells = size * size
+                results.append({
+                    "algorithm": algorithm,
+                    "env": env_class.__name__,
+                    "size": size,
+                    "seconds": elapsed,
+                    "cells_per_second": cells / elapsed if elapsed > 0 else float('inf'),
+                    "peak_bytes": peak,
+                })
+                memory = f"{peak / 2**20:10.1f} MiB" if peak is not None else ""
+                print(f"{algorithm:>18} {env_class.__name__:>20} {size:>5}x{size:<5} {elapsed:9.3f} s  "
+                      f"{cells / elapsed:14,.0f} 单元格/秒 {memory}")
+    return results
+
+
+def main():
+    # 用法: python generator_benchmark.py [尺寸1 尺寸2 ...]
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    algorithms = sorted(MAZE_GENERATORS)
+    print("--- 迷宫生成吞吐量测试 ---")
+    # list-of-lists 存储在大尺寸下非常慢，只在较小的尺寸上作为对照
+    benchmark_generation([size for size in sizes if size <= 1001], (Environment,), algorithms=algorithms)
+    benchmark_generation(sizes, (CompactEnvironment,), algorithms=algorithms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# labyrinthos/components/maze_generators.py
+"""
+完美迷宫生成算法的注册表。
+
+所有算法都在同一套格点上生成一棵生成树：房间位于奇数坐标 (2i+1, 2j+1)，
+打通两个相邻房间之间的格子即表示它们相连。因此不同算法生成的地图可以互换使用。
+"""
+import sys
+import os
+import random
+from array import array
+
+# 添加项目根目录到模块搜索路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from environment import Environment
+
+# 算法名 -> generator(env, rng)。rng 为 random.Random 实例，或为None表示使用全局的 random 模块。
+MAZE_GENERATORS = {}
+
+_PATH = Environment.CELL_CODES[Environment.PATH]
+
+
+def register_generator(name: str):
+    """把一个 generator(env, rng) 函数以 name 注册为迷宫生成算法的装饰器。"""
+    def decorator(func):
+        MAZE_GENERATORS[name] = func
+        return func
+    return decorator
+
+
+def carve_with(env: Environment, algorithm: str, rng: random.Random | None = None):
+    """用指定名称的算法在 env 上雕刻出迷宫。"""
+    generator = MAZE_GENERATORS.get(algorithm)
+    if generator is None:
+        raise ValueError(f"未知的迷宫生成算法 {algorithm!r}，可选: {', '.join(sorted(MAZE_GENERATORS))}")
+    generator(env, rng)
+
+
+class _Lattice:
+    """
+    房间格点。房间编号 c = j * cols + i 对应网格坐标 (2i+1, 2j+1)。
+
+    算法在本地的 cells 缓冲区（初始全是墙）上打通房间和通道，最后通过 env.paste 一次性写回环境。
+    """
+
+    def __init__(self, env: Environment):
+        self.width = env.width
+        self.cols = (env.width - 1) // 2
+        self.rows = (env.height - 1) // 2
+        self.size = self.cols * self.rows
+        self.cells = bytearray(env.width * env.height)
+
+    def neighbors(self, c: int) -> list[int]:
+        """返回房间 c 的相邻房间（右、左、下、上）。"""
+        cols = self.cols
+        i = c % cols
+        result = []
+        if i + 1 < cols: result.append(c + 1)
+        if i > 0: result.append(c - 1)
+        if c + cols < self.size: result.append(c + cols)
+        if c >= cols: result.append(c - cols)
+        return result
+
+    def open_between(self, a: int, b: int):
+        """打通两个相邻房间之间的墙。"""
+        cols = self.cols
+        x = a % cols + b % cols + 1
+        y = a // cols + b // cols + 1
+        self.cells[y * self.width + x] = _PATH
+
+    def write_to(self, env: Environment):
+        """打通所有房间，然后把结果写回环境。"""
+        room_row = bytes([_PATH]) * self.cols
+        for j in range(self.rows):
+            start = (2 * j + 1) * self.width + 1
+            self.cells[start:start + 2 * self.cols:2] = room_row
+        env.paste(0, 0, self.width, self.cells)
+
+
+@register_generator('recursive_division')
+def recursive_division(env: Environment, rng=None):
+    """分治法（world_generator.carve_perfect_maze），默认的生成算法。"""
+    # world_generator 本身导入了本模块，只能在调用时导入
+    from components.world_generator import carve_perfect_maze
+    carve_perfect_maze(env, rng)
+
+
+@register_generator('kruskal')
+def kruskal(env: Environment, rng=None):
+    """Kruskal 算法：按随机顺序考察所有墙，用并查集只打通连接两个不同连通块的墙。"""
+    rng = rng or random
+    lattice = _Lattice(env)
+    cols, size = lattice.cols, lattice.size
+    # 墙编码为 房间编号 * 2 + 方向（0 向右，1 向下）
+    walls = [c * 2 for c in range(size) if c % cols + 1 < cols]
+    walls += [c * 2 + 1 for c in range(size - cols)]
+    rng.shuffle(walls)
+
+    parent = array('i', range(size))
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    remaining = size - 1
+    for wall in walls:
+        if remaining <= 0:
+            break
+        a = wall >> 1
+        b = a + (cols if wall & 1 else 1)
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[rb] = ra
+            lattice.open_between(a, b)
+            remaining -= 1
+    lattice.write_to(env)
+
+
+@register_generator('wilson')
+def wilson(env: Environment, rng=None):
+    """Wilson 算法：用擦除回路的随机游走逐条接入生成树，得到均匀分布的生成树。"""
+    rng = rng or random
+    lattice = _Lattice(env)
+    size = lattice.size
+    if size:
+        in_tree = bytearray(size)
+        in_tree[rng.randrange(size)] = 1
+        # 随机游走时只记录每个房间最后一次离开的方向，回路因此被自动擦除
+        next_room = array('i', bytes(4 * size))
+        for start in range(size):
+            c = start
+            while not in_tree[c]:
+                n = rng.choice(lattice.neighbors(c))
+                next_room[c] = n
+                c = n
+            c = start
+            while not in_tree[c]:
+                in_tree[c] = 1
+                lattice.open_between(c, next_room[c])
+                c = next_room[c]
+    lattice.write_to(env)
+
+
+@register_generator('growing_tree')
+def growing_tree(env: Environment, rng=None, newest_ratio: float = 0.5):
+    """
+    Growing Tree 算法：维护一个活动房间列表，每次从中取一个向未访问的邻居扩展。
+
+    以 newest_ratio 的概率取最新加入的房间（类似回溯法，走廊较长），否则随机取一个（类似 Prim，分叉较多）。
+    """
+    rng = rng or random
+    lattice = _Lattice(env)
+    size = lattice.size
+    if size:
+        visited = bytearray(size)
+        first = rng.randrange(size)
+        visited[first] = 1
+        active = [first]
+        while active:
+            k = len(active) - 1 if rng.random() < newest_ratio else rng.randrange(len(active))
+            c = active[k]
+            options = [n for n in lattice.neighbors(c) if not visited[n]]
+            if options:
+                n = rng.choice(options)
+                visited[n] = 1
+                lattice.open_between(c, n)
+                active.append(n)
+            else:
+                active[k] = active[-1]
+                active.pop()
+    lattice.write_to(env)
+
+
+@register_generator('backtracker')
+def backtracker(env: Environment, rng=None):
+    """用显式栈实现的深度优先回溯法。"""
+    rng = rng or random
+    lattice = _Lattice(env)
+    size = lattice.size
+    if size:
+        visited = bytearray(size)
+        first = rng.randrange(size)
+        visited[first] = 1
+        stack = [first]
+        while stack:
+            c = stack[-1]
+            options = [n for n in lattice.neighbors(c) if not visited[n]]
+            if options:
+                n = rng.choice(options)
+                visited[n] = 1
+                lattice.open_between(c, n)
+                stack.append(n)
+            else:
+                stack.pop()
+    lattice.write_to(env)
@@ -2,148 +2,595 @@
 
 
 import collections
+import heapq
+import os
 import sys
+import time
 
-sys.setrecursionlimit(10000)
+# 添加项目根目录到模块搜索路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
 
+from components.strategy_core.map_evaluator import (GOLD_VALUE, TRAP_VALUE, DEFAULT_STAMINA, GoldTables, is_tree,
+                                                    mandatory_cells, route_plan, tree_children, evaluate_map,
+                                                    region_upper_bound, boss_exit_distances, rooted_fields)
+from components.strategy_core.poi_planner import poi_planner, DEFAULT_TIME_LIMIT
 
-def dp_planner(env):
+# 位掩码搜索中每个状态的估计内存（金币表和前驱表各一项，键为打包后的整数）
+STATE_BYTES = 200
+# 位掩码搜索默认的状态表内存上限（MB）
+DEFAULT_MEMORY_LIMIT_MB = 512
+# dp_planner 可选的 mode
+PLANNER_MODES = ('auto', 'tree', 'bitmask', 'bnb', 'poi')
+
+
+def dp_planner(env, mode: str = 'auto', memory_limit_mb: float | None = DEFAULT_MEMORY_LIMIT_MB,
+               stats: dict | None = None, stamina: int | None = None, start: tuple[int, int] | None = None,
+               boss: bool = False, collected=(), time_limit: float | None = DEFAULT_TIME_LIMIT):
     """
-    状态: (x, y, boss_flag, resource_mask) - 位置、是否经过BOSS、资源点收集状态
+    计算从起点出发、经过至少一个BOSS后到达终点的最大金币路线。
+
+    Args:
+        mode (str): 'tree' 使用线性时间的树形DP，只适用于无环的地图；
+            'bitmask' 使用按资源掩码展开状态的广度优先搜索，适用于任意地图但随资源点数指数增长；
+            'bnb' 在位掩码搜索的基础上按上界优先展开并剪枝（分支限界），在 time_limit 内完成时结果与 'bitmask' 相同；
+            'poi' 只在兴趣点之间做子集DP（见 poi_planner），总是限制步数，stamina 为None时按 Agent 的初始体力；
+            'auto'（默认）在地图无环时选择 'tree'，否则选择 'bnb'。其他取值抛出 ValueError。
+        memory_limit_mb, stats: 见 bitmask_dp_planner；stats 中还会记录实际使用的 planner。
+        stamina (int | None): Agent 的剩余体力。提供时只考虑体力耗尽之前到达终点的路线（最多 stamina-1 步），
+            为None时不限制路线长度。'tree' 不能处理体力限制：它的路线超出体力时，指定 'tree' 返回 (None, None)，
+            'auto' 改用 'bnb'，受 time_limit 限制，超时时至少返回 shortest_route_plan 的路线。
+        start (tuple | None): 从这个格子（例如智能体当前的位置）而不是起点 S 出发规划。
+        boss (bool): 出发时是否已经经过了BOSS；为真时直接去终点，途中不必再经过BOSS。
+        collected: 已经收集过、但仍留在地图上的金币和陷阱的坐标，规划时不再计分。
+        time_limit (float | None): 'bnb' 和 'poi'（包括 'auto' 选中 'bnb' 时）的搜索时间上限（秒），为None时不限制。
+            超时后使用到目前为止最好的路线（不比体力内的 spanning_tree_plan 或 shortest_route_plan 差），不保证最优。
+
+    Returns:
+        (best_coins, path): 最大金币数和 (x, y) 坐标路径；没有可行路线时为 (None, None)。
+            从 start 出发时 best_coins 是从这里开始还能得到的金币，path 以 start 开头。
     """
-    # 获取迷宫尺寸
-    width = env.width
-    height = env.height
-    
-    # 寻找起点和终点
-    start_pos, end_pos = None, None
-    for y in range(height):
-        for x in range(width):
-            cell = env.get_cell(x, y)
-            if cell == env.START:
-                start_pos = (x, y)
-            elif cell == env.EXIT:
-                end_pos = (x, y)
+    if mode not in PLANNER_MODES:
+        raise ValueError(f"未知的规划模式 {mode!r}，可选: {', '.join(PLANNER_MODES)}")
+    # 寻找起点和终点（直接查询环境的位置索引，无需扫描整张地图）
+    start_pos = env.find_first(env.START)
+    end_pos = env.find_first(env.EXIT)
     
     if start_pos is None or end_pos is None:
         print("错误: 迷宫缺少起点或终点")
         return None, None
-    
-    # 收集所有资源点（金币和陷阱）和BOSS点
-    resource_points = {}  # {(x, y): (index, type)}
-    boss_points = set()
-    n_resources = 0
-    
-    for y in range(height):
-        for x in range(width):
-            cell = env.get_cell(x, y)
-            if cell == env.GOLD or cell == env.TRAP:
-                resource_points[(x, y)] = (n_resources, cell)
-                n_resources += 1
-            elif cell == env.BOSS:
-                boss_points.add((x, y))
-    
-    # 状态表示: (x, y, boss_flag, resource_mask)
-    # 使用字典存储每个状态的最佳金币数和前驱状态
-    dp = {}
-    pre = {}
-    
-    # 初始化起点状态
-    start_x, start_y = start_pos
-    start_boss_flag = 1 if start_pos in boss_points else 0
-    start_mask = 0
-    
-    # 如果起点是资源点，收集它
-    if start_pos in resource_points:
-        idx, res_type = resource_points[start_pos]
-        start_mask |= (1 << idx)
-        start_coins = 5 if res_type == env.GOLD else -3
+    if start is not None and not env.is_walkable(*start):
+        print(f"错误: 出发位置 {start} 不可通行")
+        return None, None
+
+    # 预计算的距离场（随地图加载或计算一次后缓存）可以立即判断终点是否可达；到终点的距离与出发点无关
+    fields = env.get_fields()
+    start_id = fields.start_id if start is None else start[1] * env.width + start[0]
+    if fields.dist_from_exit[start_id] < 0:
+        print("错误: 未找到有效路径")
+        return None, None
+    if boss and start_id == fields.exit_id:
+        return 0, [end_pos]  # 已经经过BOSS并站在终点上
+    if collected:
+        # 在一个分支上清除已经收集过的资源点，原来的地图不受影响（分支共享邻接表和距离场）
+        env = env.fork()
+        for x, y in collected:
+            if env.get_cell(x, y) in (env.GOLD, env.TRAP):
+                env.set_cell(x, y, env.PATH)
+
+    if mode == 'tree' or (mode == 'auto' and is_tree(env, fields)):
+        best_coins, path = tree_dp_planner(env, start, boss)
+        # 体力降到0时失败，路径（含起点）最多 stamina 个格子
+        if stamina is None or path is None or len(path) <= stamina:
+            if stats is not None:
+                stats["planner"] = 'tree'
+            return best_coins, path
+        if mode == 'tree':
+            print("错误: 树形DP的路线超出了体力限制")
+            return None, None
+        # 不限体力的最优路线走不完，改用按体力剪枝的分支限界
+    if mode == 'bitmask':
+        if stats is not None:
+            stats["planner"] = 'bitmask'
+        return bitmask_dp_planner(env, memory_limit_mb, stats, stamina, start, boss)
+    if mode == 'poi':
+        if stats is not None:
+            stats["planner"] = 'poi'
+        budget = stamina if stamina is not None else DEFAULT_STAMINA
+        incumbent, incumbent_path = _initial_plan(env, start, boss, budget)
+        best_coins, path = poi_planner(env, budget, memory_limit_mb, stats, incumbent, start, boss, time_limit)
+        if incumbent_path is not None and (path is None or best_coins < incumbent):
+            # 搜索提前停止、还没找到比初始方案更好的路线
+            return incumbent, incumbent_path
+        return best_coins, path
+    if stats is not None:
+        stats["planner"] = 'bnb'
+    return branch_and_bound_planner(env, memory_limit_mb, stats, stamina, start, boss, time_limit)
+
+
+def tree_dp_planner(env, start: tuple[int, int] | None = None, boss: bool = False):
+    """
+    无环地图上的树形DP，O(W*H)。
+
+    以起点为根，自底向上算出每棵子树值得绕进去收集的最大净金币（见 map_evaluator），
+    选出金币最多的BOSS后，沿 S → BOSS → E 的必经路线行走，
+    在每个必经格子上依次绕进净收益为正的分支再原路返回。
+    哪些格子的分支必须在经过BOSS之前、不进入BOSS格子地绕，由 route_plan 给出。
+    start、boss 的含义与 dp_planner 相同：从 start 出发时把树的根换到 start 上（见 rooted_fields）。
+    """
+    fields = env.get_fields()
+    if not is_tree(env, fields):
+        print("错误: 地图中存在环路，不能使用树形DP")
+        return None, None
+    best_coins, path = spanning_tree_plan(env, start, boss)
+    if path is None:
+        print("错误: 未找到有效路径")
+    return best_coins, path
+
+
+def spanning_tree_plan(env, start: tuple[int, int] | None = None, boss: bool = False):
+    """
+    只沿起点的BFS树行走的树形DP方案。无环地图上就是最优解；
+    有环的地图上是一条可行路线，金币是最优值的下界（分支限界用它作为初始的最好结果）。
+    没有可行路线时返回 (None, None)。
+
+    从 start 出发时以 start 为根；boss 为真时把根本身当作已经经过的BOSS，
+    这样 route_plan 的第二阶段（不能越过终点）从一开始就生效。
+    """
+    graph = env.get_adjacency()
+    fields = env.get_fields()
+    if start is not None:
+        fields = rooted_fields(env, fields, graph.cell_id(*start))
+    tables = GoldTables(env, fields)
+    if boss:
+        boss_id = fields.start_id
+        tables.boss_ids.add(boss_id)
     else:
-        start_coins = 0
-    
-    start_state = (start_x, start_y, start_boss_flag, start_mask)
-    dp[start_state] = start_coins
-    pre[start_state] = None
+        score = evaluate_map(env, spanning_tree=True, fields=fields)
+        if score is None or score["boss"] is None:
+            return None, None
+        boss_id = graph.cell_id(*score["boss"])
+
+    parent = fields.parent
+    value, best = tables.value, tables.best
+    exit_id = fields.exit_id
+    plan = route_plan(env, tables, boss_id)
+    safe_best = tables.safe[0] if plan["safe_prefix"] else best
+
+    cells = mandatory_cells(fields, boss_id)
+    route = set(cells)
+    # cells 依次是 BOSS → 起点的链，和终点 → 两条链交汇处（不含）的链
+    boss_chain_len = fields.dist_from_start[boss_id] + 1
+    down = cells[:boss_chain_len][::-1]                  # 起点 → BOSS
+    lca = parent[cells[-1]] if len(cells) > boss_chain_len else exit_id
+    up = []                                              # BOSS → 交汇处（不含 BOSS）
+    cell_id = boss_id
+    while cell_id != lca:
+        cell_id = parent[cell_id]
+        up.append(cell_id)
+    to_exit = cells[boss_chain_len:][::-1]               # 交汇处之后 → 终点
+
+    def off_route(cell_id, table):
+        """cell_id 下面不在必经路线上、按 table 计净收益为正的分支。"""
+        return [c for c in tree_children(env, fields, cell_id) if c not in route and table.get(c, 0) > 0]
+
+    path = []
+    def detour(child, table):
+        """绕进 child 所在的分支收集其中（按 table 计）净收益为正的部分，再回到它的父格子。"""
+        # 用显式栈做欧拉遍历：进入每个格子记一次，返回父格子时再记一次
+        path.append(graph.position(child))
+        stack = [(child, iter(off_route(child, table)))]
+        while stack:
+            node, children = stack[-1]
+            for nxt in children:
+                path.append(graph.position(nxt))
+                stack.append((nxt, iter(off_route(nxt, table))))
+                break
+            else:
+                stack.pop()
+                path.append(graph.position(parent[node]))
+
+    def visit(cell_id, table=None):
+        """走到 cell_id；给定 table 时依次绕进它下面按 table 计净收益为正的分支。"""
+        path.append(graph.position(cell_id))
+        if table is not None:
+            for child in off_route(cell_id, table):
+                detour(child, table)
+
+    def needs_boss(child):
+        # 只有经过BOSS之后才能拿全的分支
+        return best.get(child, 0) > max(0, safe_best.get(child, 0))
+
+    prefix = plan["safe_prefix"]
+    if plan["exit_trip"]:
+        # 起点 → 交汇处先只绕不需要经过BOSS的分支，然后去终点下面收集，再回到交汇处
+        for cell_id in down[:prefix]:
+            path.append(graph.position(cell_id))
+            for child in off_route(cell_id, best):
+                if not needs_boss(child):
+                    detour(child, best)
+        for cell_id in to_exit[:-1]:
+            visit(cell_id)
+        visit(exit_id, safe_best)
+        for cell_id in reversed(to_exit[:-1]):
+            visit(cell_id)
+        visit(lca)
+        for cell_id in down[prefix:]:
+            visit(cell_id, best)
+        for cell_id in up:
+            visit(cell_id)
+        # 拿到BOSS后从交汇处往上折返，补上之前跳过的分支
+        climb_cells = down[prefix - 1 - plan["climb"]:prefix][::-1]  # 交汇处 → 最高处
+        for i, cell_id in enumerate(climb_cells):
+            if i:
+                path.append(graph.position(cell_id))
+            for child in off_route(cell_id, best):
+                if needs_boss(child):
+                    detour(child, best)
+        for cell_id in reversed(climb_cells[:-1]):
+            visit(cell_id)
+    else:
+        for i, cell_id in enumerate(down):
+            visit(cell_id, safe_best if i < prefix else best)
+        for cell_id in up:
+            visit(cell_id)  # 去 BOSS 的路上已经绕过了
+    for cell_id in to_exit:
+        # 到达终点即结束，不能再从终点绕出去
+        visit(cell_id, best if cell_id != exit_id else None)
+
+    collected = {graph.cell_id(x, y) for x, y in path}
+    best_coins = sum(value.get(cell_id, 0) for cell_id in collected)
+    return best_coins, path
+
+
+def shortest_route_plan(env, start: tuple[int, int] | None = None, boss: bool = False):
+    """
+    步数最少的通关路线：还没经过BOSS时沿最短路走到“到它的距离 + 它到终点的距离”最小的BOSS，
+    再沿到终点的距离递减的方向走到终点。不考虑金币，任意地图上都是 O(W*H)，
+    用作按体力搜索时的保底方案：它走不完的体力下不存在任何通关路线。
+
+    这条路线在到达选中的BOSS之前不会先经过别的BOSS再到达终点（那样的路线更短），
+    所以第一次在经过BOSS之后到达终点就是路线的最后一格。
+    start、boss 与 dp_planner 相同。没有可行路线时返回 (None, None)。
+    """
+    graph = env.get_adjacency()
+    fields = env.get_fields()
+    start_id = fields.start_id if start is None else graph.cell_id(*start)
+    dist_from_exit = fields.dist_from_exit
+    if dist_from_exit[start_id] < 0:
+        return None, None
+    cells = [start_id]
+    boss_ids = {graph.cell_id(x, y) for x, y in env.positions_of(env.BOSS)}
+    if not boss and start_id not in boss_ids:
+        rooted = rooted_fields(env, fields, start_id)
+        dist, parent = rooted.dist_from_start, rooted.parent
+        target = min(((dist[b] + dist_from_exit[b], b) for b in boss_ids if dist[b] >= 0 and dist_from_exit[b] >= 0),
+                     default=None)
+        if target is None:
+            return None, None
+        chain = []
+        cell_id = target[1]
+        while cell_id != start_id:
+            chain.append(cell_id)
+            cell_id = parent[cell_id]
+        cells.extend(reversed(chain))
+
+    offsets, neighbors = graph.offsets, graph.neighbors
+    cell_id = cells[-1]
+    while cell_id != fields.exit_id:
+        cell_id = next(c for c in neighbors[offsets[cell_id]:offsets[cell_id + 1]]
+                       if dist_from_exit[c] == dist_from_exit[cell_id] - 1)
+        cells.append(cell_id)
+
+    values = {env.GOLD: GOLD_VALUE, env.TRAP: TRAP_VALUE}
+    path = [graph.position(c) for c in cells]
+    best_coins = sum(values.get(env.get_cell(x, y), 0) for x, y in set(path))
+    return best_coins, path
+
+
+def _initial_plan(env, start: tuple[int, int] | None, boss: bool, stamina: int | None):
+    """
+    搜索开始前的可行方案：spanning_tree_plan，它超出体力时换成 shortest_route_plan。
+    两者都走不完时返回 (None, None)。
+    """
+    coins, path = spanning_tree_plan(env, start, boss)
+    if path is None or stamina is None or len(path) <= stamina:
+        return coins, path
+    coins, path = shortest_route_plan(env, start, boss)
+    if path is None or len(path) > stamina:
+        return None, None
+    return coins, path
+
+
+def bitmask_dp_planner(env, memory_limit_mb: float | None = DEFAULT_MEMORY_LIMIT_MB, stats: dict | None = None,
+                       stamina: int | None = None, start: tuple[int, int] | None = None, boss: bool = False):
+    """
+    状态: (cell_id, boss_flag, resource_mask) - 位置编号、是否经过BOSS、资源点收集状态
+
+    位置使用环境邻接表中的整数编号 cell_id = y * width + x，
+    邻居直接从缓存的CSR邻接表读取，不再逐格做边界检查和墙壁比较。
+    每个状态打包成一个整数 (resource_mask << (cell_bits + 1)) | (boss_flag << cell_bits) | cell_id，
+    金币和前驱状态都存放在以这个整数为键的字典里。
+
+    Args:
+        memory_limit_mb (float | None): 状态表的内存上限（按每个状态 STATE_BYTES 字节估算），
+            超出时放弃搜索并返回 (None, None)，为None时不限制。
+        stats (dict | None): 提供时写入搜索的统计信息：
+            states（记录的状态数）、expansions（出队展开的次数）、best_coins（到目前为止的最好结果）、aborted。
+        stamina (int | None): 提供时每个状态额外记录剩余体力，剩余体力不够“（还没经过BOSS时先到BOSS）再到终点”
+            的状态直接丢弃（见 _stamina_need）。广度优先搜索第一次到达某个状态时步数最少，剩余体力也最多，
+            所以不需要重复展开。
+        start, boss: 见 dp_planner，决定搜索的初始状态。
+    """
+    # 获取可行走格子的邻接表
+    graph = env.get_adjacency()
+    offsets, neighbors = graph.offsets, graph.neighbors
+    cell_bits, boss_points, resource_points, start_state, start_coins, end_id = _pack_states(env, graph, start, boss)
+    cell_mask = (1 << cell_bits) - 1
+    boss_bit = 1 << cell_bits
+    max_states = None if memory_limit_mb is None else int(memory_limit_mb * 1024 * 1024 // STATE_BYTES)
+
+    coins = {start_state: start_coins}
+    pre = {start_state: -1}
+    stamina_left, need = _stamina_need(env, start_state, stamina)
     
     # 创建队列并加入起点状态
     queue = collections.deque([start_state])
     
-    # 移动方向: 右, 左, 下, 上
-    directions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-    
     # 记录最佳终点状态
     best_end_state = None
     best_coins = -10**9
+    expansions = 0
+    aborted = False
+    end_state_low = boss_bit | end_id  # 到达终点且已经过BOSS时，状态的低位恰好是这个值
     
     while queue:
         state = queue.popleft()
-        x, y, boss_flag, resource_mask = state
-        current_coins = dp[state]
+        current_coins = coins[state]
+        expansions += 1
         
         # 如果到达终点，检查是否满足BOSS条件并更新最佳解
-        if (x, y) == end_pos and boss_flag == 1:
+        if state & (boss_bit | cell_mask) == end_state_low:
             if current_coins > best_coins:
                 best_coins = current_coins
                 best_end_state = state
             continue
         
-        # 尝试四个方向移动
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            
-            # 检查边界
-            if not (0 <= nx < width and 0 <= ny < height):
-                continue
-                
-            # 跳过墙壁
-            if env.get_cell(nx, ny) == env.WALL:
-                continue
-            
-            # 计算新位置的BOSS标志
-            new_boss_flag = boss_flag
-            if (nx, ny) in boss_points and boss_flag == 0:
-                new_boss_flag = 1
-            
-            # 计算新位置的资源状态和金币变化
-            new_mask = resource_mask
-            coin_delta = 0
-            
+        # 遍历邻接表中的可行走邻居（顺序为 右, 左, 下, 上）
+        carried = state & ~cell_mask  # BOSS标志和资源掩码
+        cell_id = state & cell_mask
+        for next_id in neighbors[offsets[cell_id]:offsets[cell_id + 1]]:
+            new_state = carried | next_id
+            new_coins = current_coins
+            if next_id in boss_points:
+                new_state |= boss_bit
             # 如果新位置是未收集的资源点
-            if (nx, ny) in resource_points:
-                idx, res_type = resource_points[(nx, ny)]
-                # 检查是否已收集过该资源点
-                if not (resource_mask & (1 << idx)):
-                    new_mask |= (1 << idx)
-                    coin_delta = 5 if res_type == env.GOLD else -3
-            
-            new_coins = current_coins + coin_delta
-            new_state = (nx, ny, new_boss_flag, new_mask)
+            if next_id in resource_points:
+                bit, delta = resource_points[next_id]
+                if not state & bit:
+                    new_state |= bit
+                    new_coins += delta
             
             # 如果新状态更优，更新状态
-            if new_state not in dp or new_coins > dp[new_state]:
-                dp[new_state] = new_coins
+            old_coins = coins.get(new_state)
+            if old_coins is None or new_coins > old_coins:
+                if stamina_left is not None:
+                    left = stamina_left[state] - 1
+                    if left <= need(next_id, new_state & boss_bit):
+                        continue  # 剩下的体力走不到终点
+                    stamina_left[new_state] = left
+                coins[new_state] = new_coins
                 pre[new_state] = state
                 queue.append(new_state)
-    
+        if max_states is not None and len(coins) > max_states:
+            aborted = True
+            break
+
+    if stats is not None:
+        stats.update(states=len(coins), expansions=expansions, aborted=aborted,
+                     best_coins=best_coins if best_end_state is not None else None)
+    if aborted:
+        print(f"错误: 状态数超过内存上限 ({memory_limit_mb} MB)，已展开 {expansions} 个状态，放弃搜索")
+        return None, None
     if best_end_state is None:
         print("错误: 未找到有效路径")
         return None, None
     
-    # 回溯重建路径
+    return best_coins, _trace_path(graph, pre, best_end_state, cell_mask)
+
+
+def branch_and_bound_planner(env, memory_limit_mb: float | None = DEFAULT_MEMORY_LIMIT_MB,
+                             stats: dict | None = None, stamina: int | None = None,
+                             start: tuple[int, int] | None = None, boss: bool = False,
+                             time_limit: float | None = None):
+    """
+    位掩码搜索的分支限界版本，状态打包方式与 bitmask_dp_planner 相同，结果也相同。
+
+    每个状态的上界 = 当前金币 + 尚未收集、从起点可达的金币，
+    其中需要再踩陷阱才能进入的区域扣除平摊的陷阱代价（见 region_upper_bound）。
+    状态按上界从大到小出堆（上界相同时优先金币多、较新的状态），
+    一旦到达终点就更新当前最好结果；上界不超过当前最好结果的状态直接丢弃，
+    堆顶的上界也不超过时，剩下的状态都不可能更好，搜索结束。
+
+    搜索开始前先用 spanning_tree_plan 得到一个可行方案作为初始的最好结果
+    （它超出体力时用 shortest_route_plan），所以从一开始就能剪枝；搜索没有找到更好的方案时就返回它。
+
+    stats 除 bitmask_dp_planner 的各项外，还会写入 pruned：因上界被剪掉、没有展开的状态数。
+
+    提供 stamina 时与 bitmask_dp_planner 一样记录剩余体力并丢弃走不到终点的状态；
+    状态不按步数出堆，所以以更多剩余体力再次到达某个状态时要重新入堆，旧的堆项作废。
+    start、boss 与 bitmask_dp_planner 相同。
+
+    状态数超过 memory_limit_mb 对应的数量、或者用时超过 time_limit 秒（为None时不限制）时停止搜索，
+    返回到目前为止最好的结果（至少是初始方案），stats 中的 aborted 为真。
+    """
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    graph = env.get_adjacency()
+    offsets, neighbors = graph.offsets, graph.neighbors
+    cell_bits, boss_points, resource_points, start_state, start_coins, end_id = _pack_states(env, graph, start, boss)
+    cell_mask = (1 << cell_bits) - 1
+    boss_bit = 1 << cell_bits
+    max_states = None if memory_limit_mb is None else int(memory_limit_mb * 1024 * 1024 // STATE_BYTES)
+
+    upper_bound = region_upper_bound(graph, resource_points, start_state & cell_mask, end_id, boss_points, boss_bit)
+
+    coins = {start_state: start_coins}
+    pre = {start_state: -1}
+    stamina_left, need = _stamina_need(env, start_state, stamina)
+    pushed = 0
+    heap = [(-upper_bound(start_state, start_coins), -start_coins, 0, start_state, stamina)]
+    best_end_state = None
+    tree_coins, tree_path = _initial_plan(env, start, boss, stamina)
+    best_coins = tree_coins if tree_path is not None else -10**9
+    expansions = pruned = 0
+    aborted = False
+
+    while heap:
+        neg_bound, _, _, state, entry_left = heapq.heappop(heap)
+        if -neg_bound <= best_coins:
+            pruned += 1 + len(heap)  # 堆里剩下的状态上界都不会更大
+            break
+        current_coins = coins[state]
+        if upper_bound(state, current_coins) != -neg_bound:
+            continue  # 这个状态后来找到了金币更多的走法，这是过时的堆项
+        if stamina_left is not None and entry_left < stamina_left[state]:
+            continue  # 这个状态后来以更多的剩余体力到达过
+        expansions += 1
+        if deadline is not None and expansions % 256 == 0 and time.perf_counter() > deadline:
+            aborted = True
+            break
+
+        carried = state & ~cell_mask
+        cell_id = state & cell_mask
+        for next_id in neighbors[offsets[cell_id]:offsets[cell_id + 1]]:
+            new_state = carried | next_id
+            new_coins = current_coins
+            if next_id in boss_points:
+                new_state |= boss_bit
+            if next_id in resource_points:
+                bit, delta = resource_points[next_id]
+                if not state & bit:
+                    new_state |= bit
+                    new_coins += delta
+
+            bound = upper_bound(new_state, new_coins)
+            if bound <= best_coins:
+                pruned += 1
+                continue
+            old_coins = coins.get(new_state)
+            left = None
+            if stamina_left is not None:
+                left = stamina_left[state] - 1
+                if left <= need(next_id, new_state & boss_bit):
+                    pruned += 1
+                    continue
+                if old_coins is not None and new_coins <= old_coins and left <= stamina_left[new_state]:
+                    continue
+                stamina_left[new_state] = left
+            elif old_coins is not None and new_coins <= old_coins:
+                continue
+            coins[new_state] = new_coins
+            pre[new_state] = state
+            if next_id == end_id and new_state & boss_bit:
+                # 到达终点：游戏结束，不再继续展开，只更新当前最好结果
+                if new_coins > best_coins:
+                    best_coins = new_coins
+                    best_end_state = new_state
+                continue
+            pushed += 1
+            heapq.heappush(heap, (-bound, -new_coins, -pushed, new_state, left))
+        if max_states is not None and len(coins) > max_states:
+            aborted = True
+            break
+
+    found = best_end_state is not None or tree_path is not None
+    if stats is not None:
+        stats.update(states=len(coins), expansions=expansions, pruned=pruned, aborted=aborted,
+                     best_coins=best_coins if found else None)
+    if aborted:
+        print(f"警告: 状态数或用时超过上限（{memory_limit_mb} MB / {time_limit} 秒），已展开 {expansions} 个状态，"
+              f"停止搜索，使用目前最好的路线")
+    if not found:
+        if not aborted:
+            print("错误: 未找到有效路径")
+        return None, None
+    if best_end_state is None:
+        return best_coins, tree_path
+    return best_coins, _trace_path(graph, pre, best_end_state, cell_mask)
+
+
+def _pack_states(env, graph, start: tuple[int, int] | None = None, boss: bool = False):
+    """
+    为位掩码搜索准备打包状态所需的信息。初始状态位于 start（默认为起点），boss 为真时带上BOSS标志。
+
+    Returns:
+        (cell_bits, boss_points, resource_points, start_state, start_coins, end_id)，
+        其中 resource_points 为 {资源点编号: (打包后状态中对应的位, 金币变化)}。
+    """
+    boss_points = {graph.cell_id(x, y) for x, y in env.positions_of(env.BOSS)}
+    resource_delta = {}
+    for x, y in env.positions_of(env.GOLD):
+        resource_delta[graph.cell_id(x, y)] = GOLD_VALUE
+    for x, y in env.positions_of(env.TRAP):
+        resource_delta[graph.cell_id(x, y)] = TRAP_VALUE
+
+    # 按行优先顺序（即编号顺序）编号，保证资源掩码的位序与地图布局一致
+    cell_bits = max(1, (env.width * env.height - 1).bit_length())
+    mask_shift = cell_bits + 1
+    resource_points = {cell_id: (1 << (idx + mask_shift), resource_delta[cell_id])
+                       for idx, cell_id in enumerate(sorted(resource_delta))}
+
+    # 初始化起点状态（如果起点是BOSS或资源点，直接计入）
+    start_id = graph.cell_id(*(start if start is not None else env.find_first(env.START)))
+    end_id = graph.cell_id(*env.find_first(env.EXIT))
+    start_state = start_id
+    start_coins = 0
+    if boss or start_id in boss_points:
+        start_state |= 1 << cell_bits
+    if start_id in resource_points:
+        bit, delta = resource_points[start_id]
+        start_state |= bit
+        start_coins = delta
+    return cell_bits, boss_points, resource_points, start_state, start_coins, end_id
+
+
+def _stamina_need(env, start_state: int, stamina: int | None):
+    """
+    为按体力剪枝准备 (stamina_left, need)。stamina 为None时返回 (None, None)。
+
+    stamina_left 是 {状态: 剩余体力} 的字典，起点状态为 stamina；
+    need(cell_id, boss_flag) 是从该格子出发结束游戏至少还要走的步数：已经过BOSS时是到终点的距离，
+    否则是先到某个BOSS再到终点的距离（见 boss_exit_distances）。体力降到0时游戏失败，
+    所以剩余体力必须严格大于 need，走不到时 need 为无穷大。
+    """
+    if stamina is None:
+        return None, None
+    fields = env.get_fields()
+    dist_from_exit = fields.dist_from_exit
+    to_boss_exit = boss_exit_distances(env, fields)
+
+    def need(cell_id, boss_flag):
+        steps = dist_from_exit[cell_id] if boss_flag else to_boss_exit[cell_id]
+        return steps if steps >= 0 else float('inf')
+
+    return {start_state: stamina}, need
+
+
+def _trace_path(graph, pre: dict, state: int, cell_mask: int) -> list[tuple[int, int]]:
+    """沿前驱表回溯重建路径，把编号还原为(x, y)坐标。"""
     path = []
-    state = best_end_state
-    
-    while state is not None:
-        x, y, _, _ = state
-        path.append((x, y))
+    while state != -1:
+        path.append(graph.position(state & cell_mask))
         state = pre[state]
-    
     path.reverse()
-    return best_coins, path
+    return path
 
 
-def find_optimal_path_dp(env):
-    final_gold, path = dp_planner(env)
+def find_optimal_path_dp(env, stamina: int | None = None):
+    stats = {}
+    final_gold, path = dp_planner(env, stats=stats, stamina=stamina)
+    if "pruned" in stats:
+        print(f"分支限界: 展开 {stats['expansions']} 个状态，剪枝 {stats['pruned']} 个状态")
     if final_gold is not None:
         print(f"计算完成！最大可获得金币: {final_gold}")
         print(f"最优路径: {path}")
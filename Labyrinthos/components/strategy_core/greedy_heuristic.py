@@ -132,10 +132,13 @@ def get_smarter_greedy_move(
     visited_map: Set[Tuple[int, int]],
     current_pos: Tuple[int, int],
     tabu_list: List[Tuple[int, int]], # <-- 新增：禁忌列表
-    bosses_defeated: bool
+    bosses_defeated: bool,
+    fields=None # <-- 新增：预计算的距离场 (MazeFields)，可选
 ) -> Tuple[int, int]:
     """
     一个更智能的贪心算法，结合了禁忌列表和探索欲望来避免死循环。
+
+    提供距离场时，BOSS全部击败后会额外奖励沿迷宫实际路程靠近终点的移动。
     """
     value_map = {
         'G': 50, 'T': -100, 'L': 60, 'B': 40,
@@ -145,6 +148,9 @@ def get_smarter_greedy_move(
 
     best_move = (0, 0)
     max_score = -float('inf')
+    use_exit_distance = bosses_defeated and fields is not None
+    if use_exit_distance:
+        current_distance = fields.distance_to_exit(*current_pos)
 
     # 遍历3x3视野内的8个邻居
     for dy in range(-1, 2):
@@ -168,6 +174,12 @@ def get_smarter_greedy_move(
                 # 给予一个巨大的负分，但不是无穷大，以防无路可走
                 score -= 500 
 
+            # 3. 归途引导：BOSS已清空时，朝终点方向（按实际路程）走的每一步都加分
+            if use_exit_distance:
+                neighbor_distance = fields.distance_to_exit(*neighbor_world_pos)
+                if neighbor_distance >= 0 and current_distance >= 0:
+                    score += 20 * (current_distance - neighbor_distance)
+
             if score > max_score:
                 max_score = score
                 best_move = (dx, dy)
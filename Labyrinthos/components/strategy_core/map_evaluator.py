@@ -0,0 +1,390 @@
+# labyrinthos/components/strategy_core/map_evaluator.py
+
+from array import array
+
+from maze_graph import MazeFields, bfs_tree
+
+# 与 dp_planner 相同的计分：金币 +5，陷阱 -3
+GOLD_VALUE = 5
+TRAP_VALUE = -3
+# 与 Agent 的初始体力一致，每走一步消耗 1
+DEFAULT_STAMINA = 500
+
+
+def is_tree(env, fields) -> bool:
+    """可行走的格子是否构成一棵以起点为根的连通的树（generate_world 生成的地图总是如此）。"""
+    reachable = sum(1 for d in fields.dist_from_start if d >= 0)
+    return env.get_adjacency().num_edges == reachable - 1
+
+
+def tree_gold_table(env, fields, avoid_boss: bool = False):
+    """
+    在以起点为根的搜索树上自底向上计算每个子树值得绕进去收集的最大净金币。
+
+    avoid_boss 为真时不进入任何BOSS格子：BOSS格子的 best 记为0，它下面的部分也不计入父格子。
+    用于经过BOSS之前的阶段——此时经过BOSS再到达终点，游戏会提前结束。
+
+    Returns:
+        (value, best, extra)，都是以单元格编号为键的字典，缺省为0：
+            value[c] 是格子本身的金币变化；
+            best[c] = value[c] + 所有 best 为正的子树之和，即从 c 往下能拿到的最大净金币；
+            extra[c] 是为拿到 best[c] 需要在 c 以下往返的步数。
+    """
+    parent, dist = fields.parent, fields.dist_from_start
+    width = env.width
+    value = {}
+    for x, y in env.positions_of(env.GOLD):
+        value[y * width + x] = GOLD_VALUE
+    for x, y in env.positions_of(env.TRAP):
+        value[y * width + x] = TRAP_VALUE
+
+    # 按到起点的距离分桶，从远到近处理就是自底向上（O(n)，不需要排序）
+    buckets = []
+    for cell_id, d in enumerate(dist):
+        if d >= 0:
+            while len(buckets) <= d:
+                buckets.append([])
+            buckets[d].append(cell_id)
+
+    best = dict(value)
+    extra = {}
+    bosses = {y * width + x for x, y in env.positions_of(env.BOSS)} if avoid_boss else set()
+    for bucket in reversed(buckets):
+        for cell_id in bucket:
+            if cell_id in bosses:
+                best.pop(cell_id, None)
+                extra.pop(cell_id, None)
+                continue
+            gain = best.get(cell_id, 0)
+            if gain > 0 and parent[cell_id] >= 0:
+                p = parent[cell_id]
+                best[p] = best.get(p, 0) + gain
+                extra[p] = extra.get(p, 0) + extra.get(cell_id, 0) + 2
+    return value, best, extra
+
+
+def mandatory_cells(fields, boss_id: int) -> list[int]:
+    """S → BOSS → E 这条必经路线经过的所有格子（无环迷宫中就是两条到根的链的并集）。"""
+    parent = fields.parent
+    cells = []
+    seen = set()
+    cell_id = boss_id
+    while cell_id != -1:
+        cells.append(cell_id)
+        seen.add(cell_id)
+        cell_id = parent[cell_id]
+    cell_id = fields.exit_id
+    while cell_id not in seen:
+        cells.append(cell_id)
+        cell_id = parent[cell_id]
+    return cells
+
+
+def exit_on_boss_branch(fields, boss_id: int) -> bool:
+    """终点是否在从起点到该BOSS的树上路径上。"""
+    dist_from_start = fields.dist_from_start
+    return dist_from_start[fields.exit_id] + fields.dist_from_exit[boss_id] == dist_from_start[boss_id]
+
+
+class GoldTables:
+    """一张地图的 tree_gold_table 结果；不进入BOSS格子的版本（safe_best, safe_extra）在第一次用到时才计算。"""
+
+    def __init__(self, env, fields):
+        self.env = env
+        self.fields = fields
+        self.value, self.best, self.extra = tree_gold_table(env, fields)
+        self.boss_ids = {y * env.width + x for x, y in env.positions_of(env.BOSS)}
+        self._safe = None
+
+    @property
+    def safe(self) -> tuple[dict, dict]:
+        if self._safe is None:
+            _, safe_best, safe_extra = tree_gold_table(self.env, self.fields, avoid_boss=True)
+            self._safe = (safe_best, safe_extra)
+        return self._safe
+
+
+def route_plan(env, tables: GoldTables, boss_id: int) -> dict | None:
+    """
+    以 boss_id 作为第一个经过的BOSS时，无环地图上的最优方案。
+
+    游戏分为两个阶段：经过第一个BOSS之前可以自由经过终点，但不能进入BOSS格子；
+    经过BOSS之后第一次到达终点游戏就结束，所以不能再越过终点。
+
+    Returns:
+        dict | None: {"gold", "steps", "safe_prefix", "exit_trip", "climb"}；
+            steps 是必经路线之外的绕路步数；
+            沿 S → BOSS 行走时，前 safe_prefix 个格子的分支按 safe_best 绕（不进入BOSS格子）；
+            exit_trip 为真时，先在交汇处去一趟终点下面的分支（此时终点不在 S → BOSS 段上），
+            交汇处及以上、必须经过BOSS才能拿全的分支留到拿到BOSS、回到交汇处之后再往上折返 climb 格补上。
+        终点之前的必经路线上已经有别的BOSS时返回None，这种情况由那个BOSS的方案覆盖。
+    """
+    fields = tables.fields
+    parent, dist_from_start = fields.parent, fields.dist_from_start
+    value, best, extra, boss_ids = tables.value, tables.best, tables.extra, tables.boss_ids
+    exit_id = fields.exit_id
+    cells = mandatory_cells(fields, boss_id)
+    boss_chain = cells[:dist_from_start[boss_id] + 1]  # BOSS → 起点
+
+    if exit_on_boss_branch(fields, boss_id):
+        # 先经过 E，到 BOSS 后再折回 E：E 及其以上的格子都在拿到BOSS之前经过
+        split = dist_from_start[boss_id] - dist_from_start[exit_id]
+        lower, upper = boss_chain[:split], boss_chain[split:]
+        if any(c in boss_ids for c in upper):
+            return None
+        safe_best, safe_extra = tables.safe
+        # 上段按 safe 表、下段按完整的表计算，同样减去被父格子重复计算的必经子节点
+        gold = sum(safe_best.get(c, 0) for c in upper) + sum(best.get(c, 0) for c in lower)
+        steps = sum(safe_extra.get(c, 0) for c in upper) + sum(extra.get(c, 0) for c in lower)
+        for c in lower[:-1]:
+            if best.get(c, 0) > 0:
+                gold -= best[c]
+                steps -= extra.get(c, 0) + 2
+        for c in [lower[-1]] + upper[:-1]:
+            if safe_best.get(c, 0) > 0:
+                gold -= safe_best[c]
+                steps -= safe_extra.get(c, 0) + 2
+        return {"gold": gold, "steps": steps, "safe_prefix": len(upper), "exit_trip": False, "climb": 0}
+
+    # sum(best) 里每个必经格子的正收益子树被父格子重复算了一次，减掉即可
+    start_id = fields.start_id
+    gold = sum(best.get(c, 0) for c in cells)
+    steps = sum(extra.get(c, 0) for c in cells)
+    for c in cells:
+        if c != start_id and best.get(c, 0) > 0:
+            gold -= best[c]
+            steps -= extra.get(c, 0) + 2
+    # 拿到BOSS之后到达 E 游戏就结束了，不能再进入 E 下面的分支
+    gold -= best.get(exit_id, 0) - value.get(exit_id, 0)
+    steps -= extra.get(exit_id, 0)
+    plan = {"gold": gold, "steps": steps, "safe_prefix": 0, "exit_trip": False, "climb": 0}
+
+    # 如果从起点到 E 的路上没有BOSS，可以在拿到BOSS之前先去 E 下面不含BOSS的分支
+    lca = parent[cells[-1]]
+    lca_depth = dist_from_start[lca]
+    above = boss_chain[len(boss_chain) - lca_depth - 1:]  # 交汇处 → 起点
+    if any(c in boss_ids for c in above) or any(c in boss_ids for c in cells[len(boss_chain):]):
+        return plan
+    safe_best, safe_extra = tables.safe
+    gain = safe_best.get(exit_id, 0) - value.get(exit_id, 0)
+    if gain <= 0:
+        return plan
+    route = set(cells)
+    climb = 0
+    for c in above:
+        if any(child not in route and best.get(child, 0) > max(0, safe_best.get(child, 0))
+               for child in tree_children(env, fields, c)):
+            climb = lca_depth - dist_from_start[c]
+    plan.update(gold=gold + gain,
+                steps=steps + safe_extra.get(exit_id, 0) + 2 * (dist_from_start[exit_id] - lca_depth) + 2 * climb,
+                safe_prefix=lca_depth + 1, exit_trip=True, climb=climb)
+    return plan
+
+
+def rooted_fields(env, fields: MazeFields, start_id: int) -> MazeFields:
+    """
+    把距离场的根换成 start_id（例如智能体当前所在的格子），用于从起点以外的地方重新规划。
+
+    到终点的距离与根无关，直接沿用 fields 中的结果，只重新做一次以 start_id 为根的广度优先搜索；
+    start_id 就是原来的起点时直接返回 fields。
+    """
+    if start_id == fields.start_id:
+        return fields
+    dist_from_start, parent = bfs_tree(env.get_adjacency(), start_id)
+    return MazeFields(env.width, env.height, start_id, fields.exit_id, dist_from_start, fields.dist_from_exit, parent)
+
+
+def tree_children(env, fields, cell_id: int) -> list[int]:
+    """cell_id 在以起点为根的搜索树上的子节点。"""
+    graph = env.get_adjacency()
+    parent = fields.parent
+    return [c for c in graph.neighbors[graph.offsets[cell_id]:graph.offsets[cell_id + 1]] if parent[c] == cell_id]
+
+
+def evaluate_map(env, stamina: int = DEFAULT_STAMINA, spanning_tree: bool = False,
+                 fields: MazeFields | None = None) -> dict | None:
+    """
+    线性时间地评估一张无环地图：必经路线的长度，以及 dp_planner 意义下的最优金币。
+
+    无环迷宫中从 S 经过某个 BOSS 到 E 的必经路线是唯一的，最优方案就是在必经路线上
+    绕进所有净收益为正、并且按游戏规则能够进入的分支（见 route_plan）。
+    这里的最优金币不考虑体力限制，与 dp_planner 的结果一致。
+    spanning_tree 为真时，有环的地图也按起点的BFS树（只走树上的边）评估，
+    得到的是一个可行方案，金币是真实最优值的下界。
+    fields 默认为 env.get_fields()；传入 rooted_fields 的结果时，从其他格子出发评估。
+
+    Returns:
+        dict | None: {"best_gold", "route_length", "plan_length", "winnable", "boss"}，
+        其中 route_length 是必经路线长度，plan_length 是加上绕路之后的总步数，
+        winnable 表示必经路线能否在体力耗尽之前走完（与 dp_planner 相同，步数必须小于 stamina）；地图不是连通的树或缺少起点终点时返回None。
+    """
+    if fields is None:
+        fields = env.get_fields()
+    if fields is None or fields.dist_from_start[fields.exit_id] < 0:
+        return None
+    if not spanning_tree and not is_tree(env, fields):
+        return None  # 有环或存在不连通的区域，不能用树上的方法评估
+
+    width = env.width
+    dist_from_start, dist_from_exit = fields.dist_from_start, fields.dist_from_exit
+    tables = GoldTables(env, fields)
+
+    result = None
+    for bx, by in env.positions_of(env.BOSS):
+        boss_id = by * width + bx
+        if dist_from_start[boss_id] < 0:
+            continue
+        plan = route_plan(env, tables, boss_id)
+        if plan is None:
+            continue
+        gold, steps = plan["gold"], plan["steps"]
+        route_length = dist_from_start[boss_id] + dist_from_exit[boss_id]
+        score = {
+            "best_gold": gold,
+            "route_length": route_length,
+            "plan_length": route_length + steps,
+            "winnable": route_length < stamina,
+            "boss": (bx, by),
+        }
+        if result is None or (gold, -route_length) > (result["best_gold"], -result["route_length"]):
+            result = score
+
+    if result is None:
+        return {"best_gold": None, "route_length": None, "plan_length": None, "winnable": False, "boss": None}
+    return result
+
+
+def region_upper_bound(graph, resource_points: dict, start_id: int, end_id: int, boss_points: set, boss_bit: int):
+    """
+    构造分支限界用的上界函数 upper_bound(state, coins)。
+
+    state 是已收集资源的位掩码（可以带有其他位），resource_points 为 {资源点编号: (对应的位, 金币变化)}，
+    boss_bit 中任意一位为1就表示已经经过BOSS。
+
+    把陷阱以外的可行走格子划分成若干连通区域，相邻的陷阱格子合成一个“关口”。
+    踩过某个关口里的陷阱之后，与它相邻的区域都可以免费往返；否则要进入一个新区域，
+    至少要踩一个相邻关口的陷阱。一个与 k 个区域相邻的关口第一次踩上时，
+    除了来时的区域最多再打开 k-1 个新区域，所以把它的代价平摊给每个新区域 |TRAP_VALUE|/(k-1)，
+    未打开的区域按“剩余金币 - 平摊代价”（不低于0）计入上界，已打开的区域按剩余金币全额计入。
+    终点所在的区域、以及（还没经过BOSS时）至少一个BOSS所在的区域必须打开，
+    它们的平摊代价即使超过区域内的金币也要扣除。
+    """
+    offsets, neighbors = graph.offsets, graph.neighbors
+    traps = {cell_id for cell_id, (_, delta) in resource_points.items() if delta < 0}
+
+    def flood(seed, inside):
+        component, stack = {seed}, [seed]
+        while stack:
+            cell_id = stack.pop()
+            for nxt in neighbors[offsets[cell_id]:offsets[cell_id + 1]]:
+                if nxt not in component and inside(nxt):
+                    component.add(nxt)
+                    stack.append(nxt)
+        return component
+
+    # 从起点出发能到达的陷阱以外的区域，以及陷阱组成的关口
+    region_of, regions, gates = {}, [], []
+    gate_of = {}
+    pending = [start_id]
+    while pending:
+        seed = pending.pop()
+        if seed in traps:
+            if seed in gate_of:
+                continue
+            gate = flood(seed, lambda c: c in traps)
+            for cell_id in gate:
+                gate_of[cell_id] = len(gates)
+            gates.append(gate)
+            pending.extend(nxt for cell_id in gate for nxt in neighbors[offsets[cell_id]:offsets[cell_id + 1]]
+                           if nxt not in traps)
+        elif seed not in region_of:
+            region = flood(seed, lambda c: c not in traps)
+            for cell_id in region:
+                region_of[cell_id] = len(regions)
+            regions.append(region)
+            pending.extend(nxt for cell_id in region for nxt in neighbors[offsets[cell_id]:offsets[cell_id + 1]]
+                           if nxt in traps)
+
+    # 每个区域：区域内金币的掩码、相邻关口里所有陷阱的掩码、进入它的最小平摊代价
+    region_gold = [0] * len(regions)
+    for cell_id, (bit, delta) in resource_points.items():
+        if delta > 0 and cell_id in region_of:
+            region_gold[region_of[cell_id]] |= bit
+    region_traps = [0] * len(regions)
+    region_cost = [float('inf')] * len(regions)
+    for gate in gates:
+        adjacent = {region_of[nxt] for cell_id in gate for nxt in neighbors[offsets[cell_id]:offsets[cell_id + 1]]
+                    if nxt in region_of}
+        gate_mask = 0
+        for cell_id in gate:
+            gate_mask |= resource_points[cell_id][0]
+        for r in adjacent:
+            region_traps[r] |= gate_mask
+            if len(adjacent) > 1:
+                region_cost[r] = min(region_cost[r], -TRAP_VALUE / (len(adjacent) - 1))
+    start_region = region_of.get(start_id)
+    if start_region is not None:
+        region_cost[start_region] = 0
+    exit_region = region_of.get(end_id)
+    boss_regions = {region_of[cell_id] for cell_id in boss_points if cell_id in region_of}
+    # 只有含金币或者必须打开的区域对上界有影响
+    items = [(r, region_gold[r], region_traps[r], region_cost[r]) for r in range(len(regions))
+             if region_gold[r] or r == exit_region or r in boss_regions]
+
+    def upper_bound(state, state_coins):
+        bound = state_coins
+        boss_penalty = 0 if state & boss_bit else float('inf')
+        for r, gold_bits, trap_bits, cost in items:
+            remaining = GOLD_VALUE * (gold_bits & ~state).bit_count()
+            if cost == 0 or state & trap_bits:
+                bound += remaining
+                if r in boss_regions:
+                    boss_penalty = 0
+            elif r == exit_region:
+                bound += remaining - cost
+                if r in boss_regions:
+                    boss_penalty = 0
+            else:
+                bound += max(remaining - cost, 0)
+                if r in boss_regions:
+                    # 必须打开这个BOSS区域时，比按可选区域计算多出的代价
+                    boss_penalty = min(boss_penalty, max(cost - remaining, 0))
+        return bound - boss_penalty
+
+    return upper_bound
+
+
+def boss_exit_distances(env, fields):
+    """
+    每个格子先走到某个BOSS、再从BOSS走到终点的最少步数，不可达的格子为 -1。
+
+    相当于以每个BOSS为源点、初始距离为它到终点的距离做一次多源广度优先搜索，
+    按体力剪枝时用作“还没经过BOSS”的状态到结束至少还要走的步数。
+    """
+    graph = env.get_adjacency()
+    offsets, neighbors = graph.offsets, graph.neighbors
+    dist_from_exit = fields.dist_from_exit
+    dist = array('i', [-1]) * (graph.width * graph.height)
+    sources = sorted((dist_from_exit[graph.cell_id(x, y)], graph.cell_id(x, y))
+                     for x, y in env.positions_of(env.BOSS))
+    sources = [(d, boss_id) for d, boss_id in sources if d >= 0]
+    frontier, i, d = [], 0, 0
+    while frontier or i < len(sources):
+        if not frontier:
+            d = sources[i][0]
+        # 初始距离等于当前层的BOSS在这一层加入
+        while i < len(sources) and sources[i][0] == d:
+            boss_id = sources[i][1]
+            i += 1
+            if dist[boss_id] < 0:
+                dist[boss_id] = d
+                frontier.append(boss_id)
+        next_frontier = []
+        for u in frontier:
+            for v in neighbors[offsets[u]:offsets[u + 1]]:
+                if dist[v] < 0:
+                    dist[v] = d + 1
+                    next_frontier.append(v)
+        frontier = next_frontier
+        d += 1
+    return dist
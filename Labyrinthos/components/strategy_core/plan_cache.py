@@ -0,0 +1,119 @@
+# labyrinthos/components/strategy_core/plan_cache.py
+
+import os
+import sys
+import weakref
+from collections import OrderedDict
+
+# 添加项目根目录到模块搜索路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from environment import Environment, CompactEnvironment
+from tiled_environment import TiledEnvironment
+
+# 默认最多缓存的规划结果条数
+DEFAULT_CACHE_SIZE = 64
+# 网格指纹取模用的素数（2**127 - 1）
+FINGERPRINT_PRIME = (1 << 127) - 1
+
+
+def grid_fingerprint(env) -> tuple[int, int, int]:
+    """
+    整张网格（连同尺寸）的指纹 (width, height, h)：内容相同的两张地图指纹相同。
+
+    把按行排列的单元格编码看成一个以 256 为底的大整数，h 是它对 FINGERPRINT_PRIME 取模的结果。
+    这样单个格子的修改只需要 update_fingerprint 在 h 上加减一项，不用重新扫描整张网格。
+    """
+    if isinstance(env, CompactEnvironment):
+        cells = env.cells
+    elif isinstance(env, TiledEnvironment):
+        cells = b''.join(row for _, row in env.iter_rows())
+    else:
+        codes = Environment.CELL_CODES
+        cells = bytes(codes[cell] for row in env.grid for cell in row)
+    return env.width, env.height, int.from_bytes(cells, 'little') % FINGERPRINT_PRIME
+
+
+def update_fingerprint(fingerprint: tuple[int, int, int], changes) -> tuple[int, int, int]:
+    """按 changes_since 返回的单元格修改 [(x, y, 旧元素, 新元素), ...] 更新 grid_fingerprint 的结果。"""
+    width, height, h = fingerprint
+    codes = Environment.CELL_CODES
+    for x, y, old, new in changes:
+        h += (codes[new] - codes[old]) * pow(256, y * width + x, FINGERPRINT_PRIME)
+    return width, height, h % FINGERPRINT_PRIME
+
+
+class PlanCache:
+    """
+    规划结果的进程内LRU缓存。
+
+    键为 (地图指纹, 出发位置, 是否已经过BOSS, 已收集的资源点, 其余规划参数)，
+    值为规划器返回的 (best_coins, path)。每个环境的指纹只完整计算一次，同时记下当时的修改序号；
+    之后按 changes_since 取出的 set_cell 修改逐格更新（见 update_fingerprint），
+    只有错过了修改（日志溢出或整张网格被替换）时才重新计算。
+    所以地图没有变化时一次查询只是几次字典查找；地图改回原样时，之前的结果仍然可以命中。
+    缓存只以弱引用记录环境，不会让不再使用的环境一直留在内存里。
+
+    hits / misses 分别记录命中和未命中的次数。
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CACHE_SIZE):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._fingerprints = weakref.WeakKeyDictionary()  # 环境 -> (修改序号, 指纹)，不引用环境本身
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def fingerprint(self, env) -> bytes:
+        """返回环境当前的地图指纹，自上次查询以来没有修改时直接使用缓存的值。"""
+        seq = env.journal_seq
+        tracked = self._fingerprints.get(env)
+        if tracked is not None:
+            if tracked[0] == seq:
+                return tracked[1]
+            changes = env.changes_since(tracked[0])
+            if changes is not None:
+                fingerprint = update_fingerprint(tracked[1], changes)
+                self._fingerprints[env] = (seq, fingerprint)
+                return fingerprint
+        fingerprint = grid_fingerprint(env)
+        self._fingerprints[env] = (seq, fingerprint)
+        return fingerprint
+
+    def get_or_plan(self, env, plan, position: tuple[int, int] | None, boss: bool = False,
+                    collected=(), **options):
+        """
+        查询缓存，未命中时调用 plan() 计算并存入缓存。
+
+        Args:
+            plan: 不带参数的可调用对象，返回 (best_coins, path)。
+            position, boss, collected: 出发时的位置、是否已经过BOSS、已经收集过的资源点坐标。
+            options: 其余影响结果的规划参数（例如 stamina、mode），一并计入键。
+
+        Returns:
+            (best_coins, path)；path 是新的列表，调用方可以随意修改。
+        """
+        key = (self.fingerprint(env), position, bool(boss), frozenset(collected), tuple(sorted(options.items())))
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            best_coins, path = plan()
+            result = (best_coins, tuple(path) if path is not None else None)
+            self._entries[key] = result
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)  # 淘汰最久没有用到的结果
+        best_coins, path = result
+        return best_coins, list(path) if path is not None else None
+
+    def clear(self):
+        """清空缓存的结果和计数。"""
+        self._entries.clear()
+        self._fingerprints.clear()
+        self.hits = self.misses = 0
@@ -0,0 +1,267 @@
+# labyrinthos/components/strategy_core/poi_planner.py
+
+import heapq
+import os
+import sys
+import time
+
+# 添加项目根目录到模块搜索路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from components.strategy_core.map_evaluator import (GOLD_VALUE, TRAP_VALUE, DEFAULT_STAMINA, region_upper_bound,
+                                                    boss_exit_distances)
+
+# 子集DP中每个 (掩码, 所在兴趣点) 标签的估计内存
+LABEL_BYTES = 150
+# 子集DP默认的搜索时间上限（秒）。兴趣点较多时（例如 31x31 的困难地图有四十多个）完整搜索要几分钟，
+# 超时后返回目前找到的最好路线
+DEFAULT_TIME_LIMIT = 5.0
+INF = float('inf')
+
+
+class PoiGraph:
+    """
+    兴趣点之间的距离表：节点 0 是起点（或指定的出发格子 start），1 是终点，之后依次是各个BOSS和各个金币/陷阱。
+    出发格子本身的BOSS或资源点视为出发时已经拿到，记在 start_boss / start_value 中，不再作为节点。
+
+    两点之间的“一段路”不经过其他兴趣点（经过就等于访问了它），
+    所以每个兴趣点各在走廊收缩图（env.get_junction_graph()）上做一次 Dijkstra，
+    到达其他兴趣点时只记录距离、不再继续展开。兴趣点都是收缩图的节点，
+    只有出发格子可能位于走廊中间，它经由走廊两端的节点连入。
+    需要穿过已访问的兴趣点时，由子集DP把它当作中转点处理。
+    grid_dist 是不受兴趣点限制的最短距离，用作剪枝时的下界。
+    """
+
+    def __init__(self, env, start: tuple[int, int] | None = None):
+        graph = env.get_adjacency()
+        self.graph = graph
+        width = env.width
+        start = start if start is not None else env.find_first(env.START)
+        end = env.find_first(env.EXIT)
+        start_id = start[1] * width + start[0]
+        self.cells = [start_id, end[1] * width + end[0]]
+        self.values = [0, 0]
+        self.num_bosses = 0
+        self.start_boss = False
+        self.start_value = 0
+        for x, y in sorted(env.positions_of(env.BOSS), key=lambda p: (p[1], p[0])):
+            if y * width + x == start_id:
+                self.start_boss = True
+                continue
+            self.cells.append(y * width + x)
+            self.values.append(0)
+            self.num_bosses += 1
+        items = [(y * width + x, GOLD_VALUE) for x, y in env.positions_of(env.GOLD)]
+        items += [(y * width + x, TRAP_VALUE) for x, y in env.positions_of(env.TRAP)]
+        for cell_id, value in sorted(items):
+            if cell_id == start_id:
+                self.start_value = value
+                continue
+            self.cells.append(cell_id)
+            self.values.append(value)
+
+        junctions = env.get_junction_graph()
+        self.junctions = junctions
+        node_of = junctions.node_of
+        stops = {node_of[c] for c in self.cells if c in node_of}
+        # 出发格子不是节点时，其他兴趣点只能经由它所在走廊两端的节点到达它
+        start_anchors = [] if start_id in node_of else junctions.anchors(start_id)
+        self._pre = []
+        self._to_start = {}  # 兴趣点 -> 它到出发格子的一段路最后经过的 (节点, 走廊)
+        self.dist = []
+        self.grid_dist = []
+        for i, source in enumerate(self.cells):
+            source_node = node_of.get(source)
+            dist, pre = junctions.dijkstra(source, stops)
+            plain, _ = junctions.dijkstra(source)
+            self._pre.append(pre)
+            row, grid_row = [], []
+            for c in self.cells:
+                if c == source:
+                    row.append(0)
+                    grid_row.append(0)
+                elif c in node_of:
+                    row.append(dist.get(node_of[c], INF))
+                    grid_row.append(plain.get(node_of[c], INF))
+                else:
+                    # 经过的节点是别的兴趣点时，这段路已经访问了它，不算一段路
+                    legs = [(dist[a] + len(corridor), a, corridor) for a, corridor in start_anchors
+                            if a in dist and (a not in stops or a == source_node)]
+                    best = min(legs, key=lambda leg: leg[0], default=(INF, None, None))
+                    row.append(best[0])
+                    self._to_start[i] = best[1:]
+                    grid_row.append(min((plain[a] + len(corridor) for a, corridor in start_anchors if a in plain),
+                                        default=INF))
+            self.dist.append(row)
+            self.grid_dist.append(grid_row)
+
+    def leg_path(self, i: int, j: int) -> list[tuple[int, int]]:
+        """从兴趣点 i 到兴趣点 j 的一段路经过的格子（不含 i，含 j）。"""
+        junctions, target = self.junctions, self.cells[j]
+        node = junctions.node_of.get(target)
+        if node is not None:
+            cells = junctions.expand_path(self._pre[i], node)
+        else:
+            # 先到出发格子所在走廊一端的节点，再沿走廊反向走到出发格子
+            node, corridor = self._to_start[i]
+            cells = junctions.expand_path(self._pre[i], node) + corridor[-2::-1] + [target]
+        return [self.graph.position(c) for c in cells]
+
+
+def poi_planner(env, stamina: int = DEFAULT_STAMINA, memory_limit_mb: float | None = None,
+                stats: dict | None = None, incumbent: int | None = None,
+                start: tuple[int, int] | None = None, boss: bool = False,
+                time_limit: float | None = DEFAULT_TIME_LIMIT):
+    """
+    只在兴趣点（S、E、BOSS、金币、陷阱）上做子集DP的规划器。
+
+    先用 PoiGraph 算出兴趣点两两之间的距离（与格子数成多项式关系），
+    再对 (已访问的兴趣点集合, 当前兴趣点) 求最短步数（组合部分只取决于兴趣点的个数）：
+    同一个集合内允许经过已访问的点中转（不再计分），用一次Dijkstra求出；
+    访问新的点时集合变大，所以按掩码从小到大处理即可。金币只取决于集合，
+    因此每个标签只需保存最短步数。体力降到0时游戏失败，整条路线最多走 stamina-1 步，
+    下界“当前步数 + 到终点的距离”（还没经过BOSS时是先到BOSS再到终点的距离）超过这个预算的标签直接丢弃。
+
+    集合的金币上界（region_upper_bound，以及预算内还来得及收集的金币）
+    低于已知最好结果时整个集合不再展开。incumbent 是已知可行方案的金币数
+    （例如步数在预算内的 spanning_tree_plan），用来从一开始就剪枝。
+    start、boss 的含义与 dp_planner 相同。
+
+    组合部分随兴趣点个数指数增长，所以搜索有两个上限：标签数超过 memory_limit_mb 对应的数量，
+    或者用时超过 time_limit 秒（为None时不限制）时停止搜索，返回到目前为止找到的最好路线，
+    stats 中的 aborted 为真。这时的结果不一定最优，也可能不如 incumbent。
+
+    Returns:
+        (best_coins, path)，与 dp_planner 相同；体力内无法经过BOSS到达终点、
+        或者提前停止时还没有找到任何路线时为 (None, None)。
+    """
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    fields = env.get_fields()
+    if fields is None or fields.dist_from_start[fields.exit_id] < 0:
+        print("错误: 未找到有效路径")
+        return None, None
+    poi = PoiGraph(env, start)
+    dist, grid_dist, values, cells = poi.dist, poi.grid_dist, poi.values, poi.cells
+    k = len(cells)
+    # 从每个兴趣点出发结束游戏至少还要走的步数：已经过BOSS / 还没经过BOSS
+    to_exit = [fields.dist_from_exit[c] if fields.dist_from_exit[c] >= 0 else INF for c in cells]
+    to_boss_exit = [d if d >= 0 else INF for d in (boss_exit_distances(env, fields)[c] for c in cells)]
+    max_steps = stamina - 1
+    max_labels = None if memory_limit_mb is None else int(memory_limit_mb * 1024 * 1024 // LABEL_BYTES)
+
+    # 兴趣点 i >= 2 对应掩码的第 i-2 位；上界与 branch_and_bound_planner 相同，只看已收集的集合
+    boss_mask = (1 << poi.num_bosses) - 1
+    start_mask = 0
+    if boss or poi.start_boss:
+        # 出发时已经经过BOSS：用所有节点之外的一位表示，地图上没有剩余的BOSS时也成立
+        start_mask = 1 << (k - 2)
+        boss_mask |= start_mask
+    first_item = 2 + poi.num_bosses
+    upper_bound = region_upper_bound(poi.graph, {cells[i]: (1 << (i - 2), values[i]) for i in range(first_item, k)},
+                                     cells[0], cells[1], set(cells[2:first_item]), boss_mask)
+
+    layers = {start_mask: {0: 0}}  # 掩码 -> {兴趣点: 最短步数}
+    coins_of = {start_mask: poi.start_value}
+    pre = {}              # (掩码 * k + 兴趣点) -> 前一个标签，同样打包成整数
+    heap = [start_mask]
+    best = None           # (金币, -步数, 最后的标签)
+    floor = incumbent if incumbent is not None else -INF
+    expanded = pruned = labels = 0
+    aborted = False
+
+    while heap:
+        if deadline is not None and time.perf_counter() > deadline:
+            aborted = True
+            break
+        mask = heapq.heappop(heap)
+        layer = layers.pop(mask)
+        coins = coins_of.pop(mask)
+        if upper_bound(mask, coins) < floor:
+            pruned += 1
+            continue
+        has_boss = mask & boss_mask
+
+        # 在同一个集合内经过已访问的点中转：出发点总是可以经过（除非它就是终点），终点只在还没经过BOSS时可以经过
+        transit = ([] if has_boss else [0, 1]) if cells[0] == cells[1] else [0] + ([] if has_boss else [1])
+        transit += [i for i in range(2, k) if mask >> (i - 2) & 1]
+        settled = {}
+        queue = [(length, node) for node, length in layer.items()]
+        heapq.heapify(queue)
+        while queue:
+            length, u = heapq.heappop(queue)
+            if u in settled:
+                continue
+            settled[u] = length
+            du = dist[u]
+            for v in transit:
+                nl = length + du[v]
+                if v not in settled and nl < layer.get(v, INF):
+                    layer[v] = nl
+                    pre[mask * k + v] = mask * k + u
+                    heapq.heappush(queue, (nl, v))
+
+        # 剩下的金币里，预算内还能去收集再赶到终点的才计入上界（也可能在经过BOSS之后才去收集）
+        if floor > -INF:
+            reachable = sum(1 for j in range(first_item, k)
+                            if values[j] > 0 and not mask >> (j - 2) & 1
+                            and any(length + grid_dist[u][j] + to_exit[j] <= max_steps
+                                    for u, length in settled.items()))
+            if coins + GOLD_VALUE * reachable < floor:
+                pruned += 1
+                continue
+        expanded += 1
+
+        for u, length in settled.items():
+            du = dist[u]
+            if has_boss:
+                total = length + du[1]
+                if total <= max_steps and (best is None or (coins, -total) > best[:2]):
+                    best = (coins, -total, mask * k + u)
+                    floor = max(floor, coins)
+            for j in range(2, k):
+                bit = 1 << (j - 2)
+                if mask & bit:
+                    continue
+                nl = length + du[j]
+                new_mask = mask | bit
+                # 访问 j 时还没经过BOSS的话，之后必须先去BOSS再到终点
+                if nl + (to_exit[j] if new_mask & boss_mask else to_boss_exit[j]) > max_steps:
+                    continue
+                target = layers.get(new_mask)
+                if target is None:
+                    target = layers[new_mask] = {}
+                    coins_of[new_mask] = coins + values[j]
+                    heapq.heappush(heap, new_mask)
+                if nl < target.get(j, INF):
+                    if j not in target:
+                        labels += 1
+                    target[j] = nl
+                    pre[new_mask * k + j] = mask * k + u
+        if max_labels is not None and labels > max_labels:
+            aborted = True
+            break
+
+    if stats is not None:
+        stats.update(points=k, expanded=expanded, pruned=pruned, labels=labels, aborted=aborted,
+                     best_coins=best[0] if best is not None else None)
+    if aborted:
+        print(f"警告: 标签数或用时超过上限（{memory_limit_mb} MB / {time_limit} 秒），停止搜索，使用目前最好的路线")
+    if best is None:
+        if not aborted:
+            print("错误: 体力范围内没有经过BOSS到达终点的路线")
+        return None, None
+
+    # 沿前驱标签回溯出兴趣点序列，再把每一段展开成格子路径
+    nodes = [1]
+    label = best[2]
+    while True:
+        nodes.append(label % k)
+        if label not in pre:
+            break
+        label = pre[label]
+    nodes.reverse()
+    path = [poi.graph.position(cells[0])]
+    for i, j in zip(nodes, nodes[1:]):
+        path.extend(poi.leg_path(i, j))
+    return best[0], path
@@ -0,0 +1,123 @@
+# labyrinthos/components/strategy_core/replanner.py
+
+import os
+import sys
+
+# 添加项目根目录到模块搜索路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from components.strategy_core.dp_planner import dp_planner
+from components.strategy_core.map_evaluator import GOLD_VALUE, TRAP_VALUE
+from components.strategy_core.poi_planner import DEFAULT_TIME_LIMIT
+from components.strategy_core.plan_cache import PlanCache
+
+# Replanner 默认共用的规划结果缓存，地图、出发状态和参数都相同时直接返回上次的结果
+PLAN_CACHE = PlanCache()
+
+
+class Replanner:
+    """
+    从智能体当前所在的格子重新规划（见 dp_planner 的 start / boss / collected 参数）。
+
+    上一次的结果会保留下来。智能体沿着这条路线走到第 i 步时，如果此后地图上的变化
+    都只是路线前 i 步经过的金币、陷阱、机关、BOSS 被拿走（变成通路），
+    并且BOSS标志、已收集的资源点和剩余体力都与沿路线走过来的情况一致，
+    那么剩下的 path[i:] 仍然是最优的（最优路线的后半段也是最优的），直接返回它，不需要重新搜索。
+    其余情况（走偏了、地图有别的修改等）才完整地重新规划，完整规划的结果也经过 PLAN_CACHE。
+    完整规划受 time_limit 限制（见 dp_planner），在游戏循环中调用也不会长时间卡住。
+
+    reused / replanned 分别记录直接沿用上次结果和完整重新规划的次数。
+    """
+
+    def __init__(self, env, mode: str = 'auto', cache=PLAN_CACHE, time_limit: float | None = DEFAULT_TIME_LIMIT):
+        self.env = env
+        self.mode = mode
+        self.time_limit = time_limit
+        self.cache = cache
+        self.reused = 0
+        self.replanned = 0
+        self._plan = None
+
+    def replan(self, position: tuple[int, int], boss: bool = False, collected=(),
+               stamina: int | None = None):
+        """
+        从 position 出发规划到终点的最大金币路线。
+
+        Returns:
+            (best_coins, path)：best_coins 是从 position 开始还能得到的金币，path 以 position 开头；
+            没有可行路线时为 (None, None)。
+        """
+        collected = frozenset(collected)
+        result = self._reuse(position, boss, collected, stamina)
+        if result is not None:
+            self.reused += 1
+            return result
+
+        self.replanned += 1
+        env, mode, time_limit = self.env, self.mode, self.time_limit
+        best_coins, path = self.cache.get_or_plan(
+            env, lambda: dp_planner(env, mode, stamina=stamina, start=position, boss=boss, collected=collected,
+                                    time_limit=time_limit),
+            position, boss, collected, stamina=stamina, mode=mode, time_limit=time_limit)
+        self._plan = None
+        if path is not None:
+            self._plan = {
+                "path": tuple(path),
+                "coins": best_coins,
+                "boss": bool(boss),
+                "collected": collected,
+                "stamina": stamina,
+                "kinds": {cell: env.get_cell(*cell) for cell in set(path)},  # 规划时路线上各格子的内容
+                "cursor": env.journal_cursor(),
+                "removed": set(),  # 规划之后被拿走的格子
+                "index": 0,
+            }
+        return best_coins, path
+
+    def _reuse(self, position, boss, collected, stamina):
+        """能沿用上一次的路线时返回 (剩余金币, 剩下的路线)，否则返回None。"""
+        plan = self._plan
+        if plan is None:
+            return None
+        env = self.env
+        changes = plan["cursor"].poll()
+        if changes is None:
+            self._plan = None
+            return None
+        kinds = plan["kinds"]
+        for x, y, old, new in changes:
+            # 只允许路线上的东西被拿走
+            if new != env.PATH or old not in (env.GOLD, env.TRAP, env.LOCKER, env.BOSS) or kinds.get((x, y)) != old:
+                self._plan = None
+                return None
+            plan["removed"].add((x, y))
+
+        path = plan["path"]
+        if (stamina is None) != (plan["stamina"] is None):
+            return None
+        if stamina is not None:
+            # 每走一步消耗1点体力，所以走到了第几步是确定的；路线多次经过同一格子时也不会认错
+            i = plan["stamina"] - stamina
+            if not plan["index"] <= i < len(path) or path[i] != position:
+                return None  # 剩余体力与按路线走过来的不一致，原来的最优性不再成立
+        else:
+            try:
+                i = path.index(position, plan["index"])
+            except ValueError:
+                return None
+        walked = set(path[:i + 1])
+        if not plan["removed"] <= walked:
+            return None
+        passed_boss = plan["boss"] or any(kinds[cell] == env.BOSS for cell in walked)
+        if bool(boss) != passed_boss:
+            return None
+
+        # 走过的资源点都算已经拿到；调用方给出的 collected 加上已经从地图上消失的，应当恰好是这些
+        values = {env.GOLD: GOLD_VALUE, env.TRAP: TRAP_VALUE}
+        gained = {cell for cell in walked if kinds[cell] in values} - plan["collected"]
+        removed_items = {cell for cell in plan["removed"] if kinds[cell] in values}
+        if collected | removed_items != plan["collected"] | gained:
+            return None
+        plan["index"] = i
+        return plan["coins"] - sum(values[kinds[cell]] for cell in gained), list(path[i:])
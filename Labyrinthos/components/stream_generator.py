@@ -0,0 +1,197 @@
+# labyrinthos/components/stream_generator.py
+import sys
+import os
+import math
+import random
+
+# 添加项目根目录到模块搜索路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from environment import Environment
+from mapped_environment import MAZE_MAGIC, MAZE_TRAILER
+from components.world_generator import calculate_element_counts, assign_element_positions
+
+_WALL = Environment.CELL_CODES[Environment.WALL]
+_PATH = Environment.CELL_CODES[Environment.PATH]
+
+
+def eller_rows(width: int, height: int, rng=random):
+    """
+    用 Eller 算法逐行生成完美迷宫，依次产出每一行的单元格编码（bytes）。
+
+    迷宫的“房间”位于奇数坐标上，与分治法生成的迷宫使用同一套格点。
+    任意时刻只保存当前一行房间所属的集合编号，内存为 O(width)，与高度无关。
+    """
+    cols, rows = (width - 1) // 2, (height - 1) // 2
+    yield bytes(width)  # 顶部边界全是墙
+    if cols == 0 or rows == 0:
+        for _ in range(height - 1):
+            yield bytes(width)
+        return
+
+    sets = list(range(cols))
+    for r in range(rows):
+        last = r == rows - 1
+        # 集合编号都小于 2 * cols，每行重新建立一个并查集
+        parent = list(range(2 * cols))
+
+        def find(a):
+            while parent[a] != a:
+                parent[a] = parent[parent[a]]
+                a = parent[a]
+            return a
+
+        # 1. 随机打通右侧的墙，合并属于不同集合的相邻房间；最后一行必须全部合并
+        row = bytearray(width)
+        row[1] = _PATH
+        for i in range(cols - 1):
+            a, b = find(sets[i]), find(sets[i + 1])
+            if a != b and (last or rng.random() < 0.5):
+                parent[b] = a
+                row[2 * i + 2] = _PATH
+            row[2 * i + 3] = _PATH
+        yield bytes(row)
+        if last:
+            break
+
+        # 2. 每个集合至少向下打通一个房间，保证所有集合最终连通
+        labels = [find(s) for s in sets]
+        members = {}
+        for i, label in enumerate(labels):
+            members.setdefault(label, []).append(i)
+        below = bytearray(width)
+        down = bytearray(cols)
+        for cells in members.values():
+            opened = False
+            for i in cells:
+                if rng.random() < 0.5:
+                    down[i] = 1
+                    opened = True
+            if not opened:
+                down[rng.choice(cells)] = 1
+        for i in range(cols):
+            if down[i]:
+                below[2 * i + 1] = _PATH
+        yield bytes(below)
+
+        # 3. 向下打通的房间继承集合编号，其余房间各自成为新集合；重新编号保持编号范围不变
+        renumber = {}
+        sets = []
+        for i in range(cols):
+            if down[i]:
+                sets.append(renumber.setdefault(labels[i], len(renumber)))
+            else:
+                sets.append(None)
+        next_id = len(renumber)
+        for i in range(cols):
+            if sets[i] is None:
+                sets[i] = next_id
+                next_id += 1
+
+    # 底部边界以及偶数尺寸时多出来的行
+    for _ in range(height - 2 * rows):
+        yield bytes(width)
+
+
+class _Reservoir:
+    """
+    在一遍扫描中从所有通路格子里等概率地抽取 k 个位置（Algorithm L 蓄水池抽样）。
+
+    只有下一次替换落在某一行时才逐个查找这一行的通路格子，其余行只做一次计数。
+    """
+
+    def __init__(self, k: int, rng=random):
+        self.k = k
+        self.rng = rng
+        self.items = []
+        self.seen = 0           # 已经扫描过的通路格子数量
+        self.next_index = k - 1  # 下一个要放入蓄水池的通路格子序号（_advance 之后才有效）
+        self.w = 1.0
+        if k > 0:
+            self._advance()
+        else:
+            self.next_index = math.inf
+
+    def _random(self) -> float:
+        return 1.0 - self.rng.random()  # 取值在 (0, 1]，避免 log(0)
+
+    def _advance(self):
+        """按 Algorithm L 计算下一个被选中的序号。"""
+        self.w *= math.exp(math.log(self._random()) / self.k)
+        if self.w >= 1.0:
+            self.next_index = math.inf
+            return
+        self.next_index += int(math.log(self._random()) / math.log(1.0 - self.w)) + 1
+
+    def offer_row(self, y: int, row: bytes):
+        """把一行中的通路格子提供给蓄水池。"""
+        count = row.count(_PATH)
+        end = self.seen + count
+        if count == 0 or (len(self.items) >= self.k and self.next_index >= end):
+            self.seen = end
+            return
+        x = row.find(_PATH)
+        index = self.seen
+        while x != -1:
+            if len(self.items) < self.k:
+                self.items.append((x, y))
+            elif index == self.next_index:
+                self.items[self.rng.randrange(self.k)] = (x, y)
+                self._advance()
+            index += 1
+            if len(self.items) >= self.k and self.next_index >= end:
+                break
+            x = row.find(_PATH, x + 1)
+        self.seen = end
+
+
+def stream_maze_to_file(filepath: str, width: int, height: int, difficulty: str = '简单', seed: int | None = None) -> dict:
+    """
+    逐行生成一张完美迷宫并直接写入二进制 .maze 文件，内存与迷宫高度无关。
+
+    完美迷宫的通路格子数只取决于尺寸，所以元素数量可以事先算出；
+    元素位置在写出各行的同时用蓄水池抽样选出，最后按偏移量直接改写文件中的对应字节。
+    蓄水池本身的大小等于元素总数。
+
+    Args:
+        filepath (str): 输出文件路径，可以用 MappedEnvironment 或游戏的地图加载直接打开。
+        width (int): 迷宫的宽度。
+        height (int): 迷宫的高度。
+        difficulty (str): 难度，决定元素数量。
+        seed (int | None): 随机种子，为None时使用全局的 random 模块。
+
+    Returns:
+        dict: 各元素实际放置的数量。
+    """
+    rng = random if seed is None else random.Random(seed)
+    cols, rows = (width - 1) // 2, (height - 1) // 2
+    total_paths = max(0, 2 * cols * rows - 1)
+    num_gold, num_traps, num_lockers, num_boss = calculate_element_counts(total_paths, difficulty)
+    reservoir = _Reservoir(min(total_paths, 2 + num_gold + num_traps + num_lockers + num_boss), rng)
+
+    with open(filepath, 'wb') as f:
+        for y, row in enumerate(eller_rows(width, height, rng)):
+            f.write(row)
+            reservoir.offer_row(y, row)
+        f.write(MAZE_TRAILER.pack(MAZE_MAGIC, width, height))
+
+        counts = {}
+        codes = Environment.CELL_CODES
+        for x, y, element in assign_element_positions(reservoir.items, num_gold, num_traps, num_lockers, num_boss, rng):
+            f.seek(y * width + x)
+            f.write(bytes([codes[element]]))
+            counts[element] = counts.get(element, 0) + 1
+    return counts
+
+
+def main():
+    # 用法: python stream_generator.py 输出文件 宽度 高度 [种子]
+    filepath, width, height = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    counts = stream_maze_to_file(filepath, width, height, seed=seed)
+    print(f"迷宫已写入 {filepath}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,17 @@
 import sys
 import os
 import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # 添加项目根目录到模块搜索路径
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
-from environment import Environment
-from io_handler import load_maze_from_json
+from environment import Environment, CompactEnvironment
+from maze_graph import bfs_distances
+from components.maze_generators import carve_with
+from io_handler import MAPS_DIR, load_maze_from_json, attach_saved_fields
+from components.strategy_core.map_evaluator import evaluate_map, DEFAULT_STAMINA
 
 
 def load_world_from_file(env: Environment, filename: str) -> bool:
@@ -36,61 +40,269 @@ def load_world_from_file(env: Environment, filename: str) -> bool:
     env.width = width
     env.height = height
     env.grid = grid
+    attach_saved_fields(env, os.path.join(MAPS_DIR, filename))
     
     return True
 
+# 面积不小于该值的子区域拥有由父区域派生的独立随机数生成器，
+# 它们的生成结果与处理顺序无关，可以交给其他进程并行生成
+SEED_SPLIT_AREA = 64 * 64
+# 迷宫面积小于该值时不值得启动进程池
+PARALLEL_MIN_AREA = 512 * 512
+# generate_world_steps 每次 yield 之间最多执行的分割次数
+GENERATION_STEP_BUDGET = 256
+
 # --- 主生成函数，现在只生成无环迷宫 ---
-def generate_world(env: Environment,difficulty:str):
+def generate_world(env: Environment,difficulty:str, seed: int | None = None, workers: int = 1,
+                   algorithm: str = 'recursive_division'):
     """
-    主函数，使用分治法生成一个完美的、无环的迷宫。
+    主函数，生成一个完美的、无环的迷宫（默认使用分治法）。
     任意两点之间有且只有一条通路。
+
+    Args:
+        env (Environment): 要生成迷宫的环境。
+        difficulty (str): 难度，'简单' 或 '困难'。
+        seed (int | None): 随机种子。给定时同一个种子总是生成同一张地图（与 workers 无关）；
+            为None时沿用全局的 random 模块。
+        workers (int): 给定种子时用于并行生成子区域的进程数（只有分治法支持）。
+        algorithm (str): 生成算法的名称，见 MAZE_GENERATORS。
     """
-    # 1. 初始化迷宫内部为通路，这是“在空白区域建墙”的前提
-    for y in range(1, env.height - 1):
-        for x in range(1, env.width - 1):
-            env.set_cell(x, y, env.PATH)
+    if seed is None:
+        rng = element_rng = None
+    else:
+        rng = random.Random(seed)
+        element_rng = random.Random(rng.getrandbits(64))
 
-    # 2. 使用能保证无环的分治法来建造墙壁
-    _recursive_division_perfect(env, 0, 0, env.width-1, env.height-1)
+    # 1~2. 雕刻出无环的迷宫
+    if algorithm == 'recursive_division':
+        carve_perfect_maze(env, rng, workers)
+    else:
+        carve_with(env, algorithm, rng)
     
     # 3. 计算并放置元素
-    _calculate_and_place_elements(env,difficulty)
+    _calculate_and_place_elements(env,difficulty, element_rng or random)
+
+def generate_world_steps(env: Environment, difficulty: str, seed: int | None = None,
+                         algorithm: str = 'recursive_division', budget: int = GENERATION_STEP_BUDGET):
+    """
+    分步执行的 generate_world，供界面逐帧推进，避免生成大地图时窗口卡死。
+
+    每执行 budget 次分割就 yield 一次当前进度（0.0 ~ 1.0），最后一次 yield 1.0。
+    同样的参数生成的地图与 generate_world(..., workers=1) 完全相同。
+    分治法以外的算法不能拆分，会在一步之内雕刻完成。
+    """
+    if seed is None:
+        rng = element_rng = None
+    else:
+        rng = random.Random(seed)
+        element_rng = random.Random(rng.getrandbits(64))
+
+    carve_share = 0.9  # 雕刻迷宫占总进度的比例，剩下的是放置元素
+    yield 0.0
+    if algorithm == 'recursive_division':
+        env.fill_rect(1, 1, env.width - 1, env.height - 1, env.PATH)
+        for progress in _division_steps(env, rng, budget):
+            yield progress * carve_share
+    else:
+        carve_with(env, algorithm, rng)
+    yield carve_share
+
+    _calculate_and_place_elements(env, difficulty, element_rng or random)
+    yield 1.0
+
+def generate_calibrated_world(env: Environment, difficulty: str, gold_band: tuple[int, int] | None = None,
+                              stamina: int = DEFAULT_STAMINA, seed: int | None = None, max_attempts: int = 200,
+                              algorithm: str = 'recursive_division') -> dict | None:
+    """
+    生成一张经过校准的地图：保证必经路线（S → BOSS → E）能在 stamina 步内走完，
+    并且（给定 gold_band 时）最优金币落在 [lo, hi] 区间内。
+
+    迷宫只雕刻一次，之后反复重新放置元素，用 map_evaluator 在线性时间内评估，直到满足要求。
+
+    Args:
+        gold_band (tuple[int, int] | None): 最优金币的目标区间（含两端），为None时不限制。
+        stamina (int): 可用的体力（步数）。
+        max_attempts (int): 最多放置多少次元素。
+
+    Returns:
+        dict | None: 满足要求的那次放置的评估结果（见 evaluate_map）；
+        所有尝试都失败时返回None，此时地图上保留最后一次的放置结果。
+    """
+    if seed is None:
+        rng = None
+        element_rng = random
+    else:
+        rng = random.Random(seed)
+        element_rng = random.Random(rng.getrandbits(64))
+
+    if algorithm == 'recursive_division':
+        carve_perfect_maze(env, rng, workers=1)
+    else:
+        carve_with(env, algorithm, rng)
+
+    all_paths = env.get_all_paths()
+    num_gold, num_traps, num_lockers, num_boss = calculate_element_counts(len(all_paths), difficulty)
+    print(f"--- 地图生成参数 (校准模式) ---")
+    print(f"尺寸: {env.width}x{env.height}, BOSS: {num_boss}, 机关: {num_lockers}, 金币: {num_gold}, 陷阱: {num_traps}")
+
+    for attempt in range(1, max_attempts + 1):
+        if attempt > 1:
+            # 把上一次放置的元素还原成通路；墙体不变，邻接表缓存可以继续使用
+            for element in env.INDEXED_ELEMENTS:
+                for x, y in list(env.positions_of(element)):
+                    env.set_cell(x, y, env.PATH)
+        _place_elements(env, list(all_paths), num_gold, num_traps, num_lockers, num_boss, element_rng)
+        score = evaluate_map(env, stamina)
+        if score is None or not score["winnable"]:
+            continue
+        if gold_band is not None and not gold_band[0] <= score["best_gold"] <= gold_band[1]:
+            continue
+        score["attempts"] = attempt
+        return score
+
+    print(f"警告: {max_attempts} 次放置后仍未满足校准要求。")
+    return None
+
+def carve_perfect_maze(env: Environment, rng: random.Random | None = None, workers: int = 1):
+    """只生成迷宫的墙壁和通路，不放置任何元素。给定 rng 时使用可复现、可并行的分区随机数。"""
+    # 1. 初始化迷宫内部为通路，这是“在空白区域建墙”的前提
+    env.fill_rect(1, 1, env.width - 1, env.height - 1, env.PATH)
+
+    # 2. 使用能保证无环的分治法来建造墙壁
+    if rng is None:
+        _recursive_division_perfect(env, 0, 0, env.width-1, env.height-1)
+    elif workers > 1 and env.width * env.height >= PARALLEL_MIN_AREA:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunk_area = max(SEED_SPLIT_AREA, env.width * env.height // (workers * 4))
+            _seeded_division(env, 0, 0, env.width-1, env.height-1, rng, executor, chunk_area)
+    else:
+        _seeded_division(env, 0, 0, env.width-1, env.height-1, rng)
 
 # --- 核心的完美迷宫生成算法 ---
-def _recursive_division_perfect(env: Environment, x: int, y: int, width: int, height: int):
+def _divide(env: Environment, x: int, y: int, width: int, height: int, rng) -> tuple:
     """
-    一个精确的分治算法，用于生成完美的、无环的迷宫。
+    在区域内建一道留有一个通道的墙，返回分出的两个子区域 (前一半, 后一半)。
+
+    区域太小无法再分时返回空元组。rng 可以是 random 模块本身或一个 random.Random 实例。
+    每道墙以通道为界分成两段，通过 fill_rect 整段写入（CompactEnvironment 上是切片赋值）。
     """
     if width < 3 or height < 3:
-        return
+        return ()
 
     is_horizontal = height > width
     if height == width:
-        is_horizontal = random.choice([True, False])
+        is_horizontal = rng.choice([True, False])
 
+    wall = env.WALL
     if is_horizontal:
-        wall_y = y + random.randrange(2, height, 2)
-        passage_x = x + random.randrange(1, width, 2)
-        for i in range(x, x + width + 1):
-            if i != passage_x:
-                env.set_cell(i, wall_y, env.WALL)
-        _recursive_division_perfect(env, x, y, width, wall_y - y)
-        _recursive_division_perfect(env, x, wall_y, width, height - (wall_y - y))
+        wall_y = y + rng.randrange(2, height, 2)
+        passage_x = x + rng.randrange(1, width, 2)
+        env.fill_rect(x, wall_y, passage_x, wall_y + 1, wall)
+        env.fill_rect(passage_x + 1, wall_y, x + width + 1, wall_y + 1, wall)
+        return (x, y, width, wall_y - y), (x, wall_y, width, height - (wall_y - y))
     else:
-        wall_x = x + random.randrange(2, width, 2)
-        passage_y = y + random.randrange(1, height, 2)
-        for i in range(y, y + height + 1):
-            if i != passage_y:
-                env.set_cell(wall_x, i, env.WALL)
-        _recursive_division_perfect(env, x, y, wall_x - x, height)
-        _recursive_division_perfect(env, wall_x, y, width - (wall_x - x), height)
+        wall_x = x + rng.randrange(2, width, 2)
+        passage_y = y + rng.randrange(1, height, 2)
+        env.fill_rect(wall_x, y, wall_x + 1, passage_y, wall)
+        env.fill_rect(wall_x, passage_y + 1, wall_x + 1, y + height + 1, wall)
+        return (x, y, wall_x - x, height), (wall_x, y, width - (wall_x - x), height)
+
+def _recursive_division_perfect(env: Environment, x: int, y: int, width: int, height: int):
+    """
+    一个精确的分治算法，用于生成完美的、无环的迷宫。
+
+    用显式的工作栈代替递归，不受Python递归深度限制。
+    子区域按“先前一半、后后一半”的顺序出栈，随机数的消耗顺序与递归写法完全相同，
+    因此同一个随机种子生成的迷宫也完全相同。
+    """
+    stack = [(x, y, width, height)]
+    while stack:
+        # 后入栈的先处理
+        stack.extend(reversed(_divide(env, *stack.pop(), random)))
+
+def _seeded_division(env: Environment, x: int, y: int, width: int, height: int, rng: random.Random,
+                     executor: ProcessPoolExecutor | None = None, chunk_area: int = 0):
+    """
+    使用分区随机数的分治算法。
+
+    面积不小于 SEED_SPLIT_AREA 的子区域在分割时就从父区域的随机数生成器派生出自己的生成器，
+    更小的子区域与父区域共用一个生成器、按固定顺序依次处理。
+    因此每个拥有独立生成器的区域，其结果只取决于自己的种子和大小；
+    提供 executor 时，这样的区域一旦面积不超过 chunk_area 就交给其他进程生成，再拼接回来。
+    """
+    stack = [(x, y, width, height, rng, True)]
+    futures = {}
+    while stack:
+        x, y, width, height, rng, owns_rng = stack.pop()
+        if executor is not None and owns_rng and width * height <= chunk_area and width >= 3 and height >= 3:
+            futures[executor.submit(_carve_region, width, height, rng)] = (x, y, width)
+            continue
+        stack.extend(reversed(_seeded_children(env, x, y, width, height, rng)))
+
+    for future in as_completed(futures):
+        x, y, width = futures[future]
+        env.paste(x + 1, y + 1, width - 1, future.result())
+
+def _seeded_children(env: Environment, x: int, y: int, width: int, height: int, rng: random.Random) -> list:
+    """分割一个区域，面积不小于 SEED_SPLIT_AREA 的子区域从 rng 派生出自己的生成器。"""
+    children = []
+    for cx, cy, cw, ch in _divide(env, x, y, width, height, rng):
+        if cw * ch >= SEED_SPLIT_AREA:
+            children.append((cx, cy, cw, ch, random.Random(rng.getrandbits(64)), True))
+        else:
+            children.append((cx, cy, cw, ch, rng, False))
+    return children
+
+def _division_steps(env: Environment, rng: random.Random | None, budget: int):
+    """
+    整张地图分治的分步版本：每执行 budget 次分割 yield 一次已完成的面积比例。
+
+    rng 为None时与 _recursive_division_perfect 一样使用全局 random 模块，
+    否则与顺序执行的 _seeded_division 结果相同。不能再分的区域计为完成，
+    所有这样的区域恰好铺满整个内部，所以比例最终会到达 1。
+    """
+    total = (env.width - 1) * (env.height - 1)
+    done = 0
+    stack = [(0, 0, env.width - 1, env.height - 1, rng, True)]
+    steps = 0
+    while stack:
+        x, y, width, height, region_rng, _ = stack.pop()
+        if region_rng is None:
+            children = [child + (None, False) for child in _divide(env, x, y, width, height, random)]
+        else:
+            children = _seeded_children(env, x, y, width, height, region_rng)
+        if not children:
+            done += width * height
+        stack.extend(reversed(children))
+        steps += 1
+        if steps % budget == 0:
+            yield done / total
+
+def _carve_region(width: int, height: int, rng: random.Random) -> bytes:
+    """
+    在子进程中独立生成一个区域，返回其内部（不含四周边界）的单元格编码，按行排列。
+
+    区域边界上的墙和通道由父区域负责，这里只决定内部的结构，所以只返回内部。
+    """
+    local = CompactEnvironment(width + 1, height + 1)
+    local.fill_rect(1, 1, width, height, local.PATH)
+    _seeded_division(local, 0, 0, width, height, rng)
+    cells = local.cells
+    return b''.join(cells[y * (width + 1) + 1:y * (width + 1) + width] for y in range(1, height))
 
 # --- 元素计算与放置部分 ---
-def _calculate_and_place_elements(env: Environment,difficulty:str):
-    """统一计算并放置迷宫元素"""
-    total_paths = len(env.get_all_paths())
-    maze_area = env.width * env.height
+def _calculate_and_place_elements(env: Environment,difficulty:str, rng=random):
+    """统一计算并放置迷宫元素。rng 用于打乱放置位置，默认使用全局的 random 模块。"""
+    all_paths = env.get_all_paths()
+    num_gold, num_traps, num_lockers, num_boss = calculate_element_counts(len(all_paths), difficulty)
     
+    print(f"--- 地图生成参数 (无环模式) ---")
+    print(f"尺寸: {env.width}x{env.height}, BOSS: {num_boss}, 机关: {num_lockers}, 金币: {num_gold}, 陷阱: {num_traps}")
+    
+    _place_elements(env, all_paths, num_gold, num_traps, num_lockers, num_boss, rng)
+
+def calculate_element_counts(total_paths: int, difficulty: str) -> tuple[int, int, int, int]:
+    """根据通路格子数和难度计算各元素的数量，返回 (金币, 陷阱, 机关, BOSS)。"""
     if difficulty=='简单':
         # if maze_area < 25*25: num_boss = 1
         # elif maze_area < 50*50: num_boss = 2
@@ -126,40 +338,76 @@ def _calculate_and_place_elements(env: Environment,difficulty:str):
         else:
             num_gold = max(1, total_paths // 100)
             num_traps = max(1, total_paths // 150)
-    
-    print(f"--- 地图生成参数 (无环模式) ---")
-    print(f"尺寸: {env.width}x{env.height}, BOSS: {num_boss}, 机关: {num_lockers}, 金币: {num_gold}, 陷阱: {num_traps}")
-    
-    _place_elements(env, num_gold, num_traps, num_lockers, num_boss)
+    return num_gold, num_traps, num_lockers, num_boss
 
-def _place_elements(env: Environment, num_gold: int, num_traps: int, num_lockers: int, num_boss: int):
-    """在迷宫通路中放置游戏元素"""
-    all_paths = env.get_all_paths()
+def _place_elements(env: Environment, all_paths: list[tuple[int, int]], num_gold: int, num_traps: int,
+                    num_lockers: int, num_boss: int, rng=random):
+    """
+    在迷宫通路中放置游戏元素。all_paths 是调用方已经扫描出的通路格子，会被打乱并消耗。
+
+    起点随机选取后，从起点做一次广度优先搜索：终点取沿迷宫实际路程最远的格子，
+    其余元素只放在从起点可达的格子上。整个过程只需要 O(通路格子数)。
+    """
     if not all_paths: return
     
     total_elements_needed = 2 + num_gold + num_traps + num_lockers + num_boss
     if len(all_paths) < total_elements_needed:
-        shortage = total_elements_needed - len(all_paths)
-        removed_traps = min(num_traps, shortage); num_traps -= removed_traps; shortage -= removed_traps
-        removed_gold = min(num_gold, shortage); num_gold -= removed_gold
         print(f"警告: 通路不足，元素数量已自动减少。")
 
-    random.shuffle(all_paths)
+    rng.shuffle(all_paths)
     start_pos = all_paths.pop()
     env.set_cell(start_pos[0], start_pos[1], env.START)
+
+    width = env.width
+    dist = bfs_distances(env.get_adjacency(), start_pos[1] * width + start_pos[0])
+    candidates = [pos for pos in all_paths if dist[pos[1] * width + pos[0]] >= 0]
+    if candidates:
+        # 用末尾元素覆盖终点所在的位置，O(1) 地把它移出候选列表
+        i = max(range(len(candidates)), key=lambda i: dist[candidates[i][1] * width + candidates[i][0]])
+        exit_pos = candidates[i]
+        candidates[i] = candidates[-1]
+        candidates.pop()
+        env.set_cell(exit_pos[0], exit_pos[1], env.EXIT)
+
+    for x, y, element in _assign_remaining(candidates, num_gold, num_traps, num_lockers, num_boss):
+        env.set_cell(x, y, element)
+
+def assign_element_positions(candidates: list[tuple[int, int]], num_gold: int, num_traps: int, num_lockers: int,
+                             num_boss: int, rng=random) -> list[tuple[int, int, str]]:
+    """
+    从候选通路格子中为各元素挑选位置，返回 [(x, y, 元素), ...]。会打乱并消耗 candidates。
+
+    用于拿不到整张网格的场合（例如逐行生成）：起点随机选取，终点取离起点曼哈顿距离最远的候选格子，
+    其余元素依次随机分配；候选格子不够时，陷阱最先被减少，其次是金币。
+    """
+    assignments = []
+    if not candidates:
+        return assignments
+
+    rng.shuffle(candidates)
+    start_pos = candidates.pop()
+    assignments.append((*start_pos, Environment.START))
     
-    exit_pos = max(all_paths, key=lambda pos: abs(pos[0]-start_pos[0]) + abs(pos[1]-start_pos[1]), default=None)
+    exit_pos = max(candidates, key=lambda pos: abs(pos[0]-start_pos[0]) + abs(pos[1]-start_pos[1]), default=None)
     if exit_pos:
-        env.set_cell(exit_pos[0], exit_pos[1], env.EXIT)
-        all_paths.remove(exit_pos)
+        assignments.append((*exit_pos, Environment.EXIT))
+        candidates.remove(exit_pos)
+    
+    assignments.extend(_assign_remaining(candidates, num_gold, num_traps, num_lockers, num_boss))
+    return assignments
+
+def _assign_remaining(candidates: list[tuple[int, int]], num_gold: int, num_traps: int, num_lockers: int,
+                      num_boss: int) -> list[tuple[int, int, str]]:
+    """起点和终点之外的元素依次从（已打乱的）候选列表末尾取位置。"""
+    assignments = []
     
     def place_element(element_char, count):
         for _ in range(count):
-            if all_paths:
-                env.set_cell(*all_paths.pop(), element_char)
+            if candidates:
+                assignments.append((*candidates.pop(), element_char))
     
-    place_element(env.BOSS, num_boss)
-    place_element(env.LOCKER, num_lockers)
-    place_element(env.GOLD, num_gold)
-    place_element(env.TRAP, num_traps)
-
+    place_element(Environment.BOSS, num_boss)
+    place_element(Environment.LOCKER, num_lockers)
+    place_element(Environment.GOLD, num_gold)
+    place_element(Environment.TRAP, num_traps)
+    return assignments
@@ -1,5 +1,11 @@
 # labyrinthos/environment.py
 
+import copy
+from collections import deque
+from itertools import islice
+
+from maze_graph import GridGraph, JunctionGraph, MazeFields, build_grid_graph, build_junction_graph, build_maze_fields
+
 class Environment:
     """
     代表游戏世界，包括迷宫布局和其中的所有元素。
@@ -16,6 +22,17 @@ class Environment:
     LOCKER = 'L'    # 机关（谜题）
     BOSS = 'B'      # 最终BOSS
 
+    # 紧凑存储使用的小整数编码：CELL_CHARS[code] 即对应的元素字符。
+    # 墙壁的编码为0，这样全零的缓冲区就是一整块墙壁。
+    CELL_CHARS = '# SEGTLB'
+    CELL_CODES = {char: code for code, char in enumerate(CELL_CHARS)}
+
+    # 位置索引所覆盖的元素（墙壁和通路数量太多，不做索引）
+    INDEXED_ELEMENTS = (START, EXIT, GOLD, TRAP, LOCKER, BOSS)
+
+    # 修改日志最多保留的条目数，落后更多的读者需要整体重新扫描
+    JOURNAL_SIZE = 4096
+
     def __init__(self, width: int, height: int):
         """
         初始化环境。
@@ -30,10 +47,200 @@ class Environment:
             
         self.width = width
         self.height = height
+
+        # 元素类型 -> 位置集合 的索引，第一次查询时才建立，之后由 set_cell 实时维护
+        self._positions = None
+        # 可行走格子的邻接表缓存，墙壁发生变化时失效
+        self._adjacency = None
+        # 走廊收缩图缓存，任何单元格发生变化时失效
+        self._junctions = None
+        # S、E 距离场缓存，墙壁或起点、终点发生变化时失效
+        self._fields = None
+        # 单元格修改日志：条目为 (x, y, 旧元素, 新元素)，最后一条的序号为 _journal_seq
+        self._journal = deque(maxlen=self.JOURNAL_SIZE)
+        self._journal_seq = 0
         
         # 将网格初始化为一整块墙壁。
         # 后续的生成器算法会在这上面“雕刻”出路径。
-        self.grid = [[self.WALL for _ in range(width)] for _ in range(height)]
+        self._init_storage()
+
+    def _init_storage(self):
+        """分配一整块墙壁的网格存储。子类可以重写它来换用别的存储方式。"""
+        self.grid = [[self.WALL for _ in range(self.width)] for _ in range(self.height)]
+
+    @property
+    def grid(self) -> list[list[str]]:
+        """list-of-lists 形式的网格。请通过 set_cell 修改单元格，否则位置索引不会更新。"""
+        return self._grid
+
+    @grid.setter
+    def grid(self, grid: list[list[str]]):
+        """用字符网格整体替换当前内容，尺寸以传入的网格为准（与其他存储方式一致）。"""
+        self._grid = grid
+        self.height = len(grid)
+        self.width = len(grid[0]) if grid else 0
+        # 写时复制：None 表示网格独占；否则只有集合中的行是自己的副本，其余行仍与其他分支共享
+        self._owned_rows = None
+        self._on_grid_replaced()
+
+    def _on_grid_replaced(self):
+        """整张网格被替换后调用，丢弃所有由网格内容派生出的缓存。"""
+        self._positions = None
+        self._adjacency = None
+        self._junctions = None
+        self._fields = None
+        self._reset_journal()
+
+    def _reset_journal(self):
+        """清空修改日志并推进序号，使所有读者都认为自己错过了修改，需要整体重新扫描。"""
+        self._journal.clear()
+        self._journal_seq += 1
+
+    def _cell_changed(self, x: int, y: int, old: str, new: str):
+        """单元格内容确实发生变化时由 set_cell 调用：记录日志并丢弃受影响的缓存。"""
+        self._journal.append((x, y, old, new))
+        self._journal_seq += 1
+        self._junctions = None
+        if (old == self.WALL) != (new == self.WALL):
+            self._adjacency = None
+            self._fields = None
+        elif old in (self.START, self.EXIT) or new in (self.START, self.EXIT):
+            self._fields = None
+
+    @property
+    def journal_seq(self) -> int:
+        """最近一次修改的序号，每次单元格变化加1。"""
+        return self._journal_seq
+
+    def changes_since(self, seq: int) -> list[tuple[int, int, str, str]] | None:
+        """
+        返回序号 seq 之后的所有单元格修改，按发生顺序排列。
+
+        Returns:
+            [(x, y, 旧元素, 新元素), ...]；需要的条目已经被挤出日志
+            （或整张网格被替换过）时返回None，调用方应整体重新扫描。
+        """
+        missed = self._journal_seq - seq
+        if missed < 0 or missed > len(self._journal):
+            return None
+        return list(islice(self._journal, len(self._journal) - missed, None))
+
+    def journal_cursor(self) -> 'JournalCursor':
+        """为一个新的读者创建游标，从当前时刻开始读取修改。"""
+        return JournalCursor(self)
+
+    def _build_position_index(self) -> dict[str, set[tuple[int, int]]]:
+        """扫描整张网格，建立元素位置索引。"""
+        positions = {element: set() for element in self.INDEXED_ELEMENTS}
+        for y, row in enumerate(self._grid):
+            for x, cell in enumerate(row):
+                if cell in positions:
+                    positions[cell].add((x, y))
+        return positions
+
+    def _update_position_index(self, x: int, y: int, old: str, new: str):
+        """单元格从 old 变为 new 时，同步更新位置索引。"""
+        positions = self._positions
+        if old == new:
+            return
+        if old in positions:
+            positions[old].discard((x, y))
+        if new in positions:
+            positions[new].add((x, y))
+
+    def positions_of(self, element: str) -> set[tuple[int, int]]:
+        """
+        返回某种元素当前所在的全部位置。
+
+        返回的是内部索引集合本身（O(1)），请勿修改；如需在遍历时调用 set_cell，请先复制一份。
+        """
+        if element not in self.INDEXED_ELEMENTS:
+            raise ValueError(f"元素 {element!r} 不在位置索引中。")
+        if self._positions is None:
+            self._positions = self._build_position_index()
+        return self._positions[element]
+
+    def count(self, element: str) -> int:
+        """返回某种元素当前的数量。"""
+        return len(self.positions_of(element))
+
+    def find_first(self, element: str) -> tuple[int, int] | None:
+        """返回某种元素的任意一个位置，不存在时返回None。"""
+        return next(iter(self.positions_of(element)), None)
+
+    def walkable_mask(self) -> bytearray:
+        """返回按 y * width + x 排列的可行走掩码，1 表示可行走，0 表示墙壁。"""
+        wall = self.WALL
+        return bytearray(cell != wall for row in self._grid for cell in row)
+
+    def get_adjacency(self) -> GridGraph:
+        """
+        返回可行走格子的压缩邻接表（CSR）。
+
+        结果会被缓存，只有通过 set_cell 把墙壁改成通路（或反过来）时才会重建。
+        """
+        if self._adjacency is None:
+            self._adjacency = build_grid_graph(self.width, self.height, self.walkable_mask())
+        return self._adjacency
+
+    def get_junction_graph(self) -> JunctionGraph:
+        """
+        返回把走廊收缩之后的路口图（节点为路口、死胡同和特殊格子）。
+
+        结果会被缓存，任何单元格通过 set_cell 发生变化后都会重建。
+        """
+        if self._junctions is None:
+            self._junctions = build_junction_graph(self)
+        return self._junctions
+
+    def fork(self) -> 'Environment':
+        """
+        返回一个与当前环境共享底层网格的分支，用于试探“如果……会怎样”。
+
+        分叉本身不复制网格，之后任何一方通过 set_cell 修改时才按行（或按存储的粒度）复制，
+        因此可以从同一张地图上分出很多分支；不打算修改的分支就相当于一份快照。
+        位置索引会复制一份，邻接表等只读缓存直接共享。
+        """
+        child = copy.copy(self)
+        # 分支有自己的日志，从分叉时的序号继续计数；更早的游标在分支上会被视为错过了修改
+        child._journal = deque(maxlen=self.JOURNAL_SIZE)
+        if self._positions is not None:
+            child._positions = {element: set(found) for element, found in self._positions.items()}
+        self._share_storage(child)
+        return child
+
+    def _share_storage(self, child: 'Environment'):
+        """fork 时调用，把双方的存储都标记为共享。子类按自己的存储方式重写。"""
+        self._owned_rows = set()
+        child._owned_rows = set()
+
+    def _own_row(self, y: int) -> list[str]:
+        """返回第 y 行的独占副本，必要时先复制共享的行。"""
+        if y not in self._owned_rows:
+            if not self._owned_rows:
+                # 第一次写入时外层的行列表也是共享的，先复制它（只复制行引用）
+                self._grid = self._grid[:]
+            self._grid[y] = self._grid[y][:]
+            self._owned_rows.add(y)
+        return self._grid[y]
+
+    def get_fields(self) -> MazeFields | None:
+        """
+        返回到起点、终点的距离场和以起点为根的搜索树，地图缺少起点或终点时返回None。
+
+        优先使用随地图一起加载的预计算结果（见 attach_fields），否则计算一次并缓存；
+        墙壁或起点、终点通过 set_cell 发生变化后失效。
+        """
+        if self._fields is None:
+            self._fields = build_maze_fields(self)
+        return self._fields
+
+    def attach_fields(self, fields: MazeFields) -> bool:
+        """使用预先计算好的距离场。与当前地图不符时忽略它并返回False。"""
+        if not fields.matches(self):
+            return False
+        self._fields = fields
+        return True
 
     def get_vision(self, x: int, y: int) -> list[list[str]]:
         """获取以(x, y)为中心的3x3视野。"""
@@ -48,13 +255,31 @@ class Environment:
     def get_cell(self, x: int, y: int) -> str:
         """安全地获取指定坐标的元素。"""
         if self.is_in_bounds(x, y):
-            return self.grid[y][x]
+            return self._grid[y][x]
         return self.WALL  # 将边界外的区域视为墙壁
 
     def set_cell(self, x: int, y: int, value: str):
         """安全地设置指定坐标的元素。"""
         if self.is_in_bounds(x, y):
-            self.grid[y][x] = value
+            row = self._grid[y] if self._owned_rows is None else self._own_row(y)
+            old = row[x]
+            row[x] = value
+            if self._positions is not None:
+                self._update_position_index(x, y, old, value)
+            if old != value:
+                self._cell_changed(x, y, old, value)
+
+    def fill_rect(self, x0: int, y0: int, x1: int, y1: int, value: str):
+        """把 [x0, x1) x [y0, y1) 范围内的单元格都设置为 value，超出边界的部分被忽略。"""
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                self.set_cell(x, y, value)
+
+    def paste(self, x: int, y: int, width: int, codes: bytes):
+        """把按行排列、每行 width 个的单元格编码块写到以 (x, y) 为左上角的区域。"""
+        chars = self.CELL_CHARS
+        for i, code in enumerate(codes):
+            self.set_cell(x + i % width, y + i // width, chars[code])
 
     def is_in_bounds(self, x: int, y: int) -> bool:
         """检查一个坐标是否在迷宫边界内。"""
@@ -73,7 +298,7 @@ class Environment:
             for x in range(self.width):
                 # 注意：这里我们只找初始的通路格，因为元素会被放置在上面
                 # 为了简化，我们直接找非墙壁的格子，因为元素放置后也算通路
-                if self.grid[y][x] == self.PATH:
+                if self._grid[y][x] == self.PATH:
                     paths.append((x, y))
         return paths
 
@@ -90,4 +315,184 @@ class Environment:
             # 添加行标题
             maze_str += f'{i%100:2d}|' + ''.join(row) + '|\n'
             
-        return header + border + maze_str + border
\ No newline at end of file
+        return header + border + maze_str + border
+
+
+class JournalCursor:
+    """
+    修改日志的读者游标。每个读者（渲染器、自动存档、规划器缓存等）各持有一个，互不影响。
+    """
+
+    def __init__(self, env: Environment):
+        self.env = env
+        self.seq = env.journal_seq
+
+    def poll(self) -> list[tuple[int, int, str, str]] | None:
+        """
+        取出上次调用以来的所有修改并前移游标。
+
+        返回None表示错过了部分修改，读者应当整体重新扫描一次。
+        """
+        changes = self.env.changes_since(self.seq)
+        self.seq = self.env.journal_seq
+        return changes
+
+
+class CompactEnvironment(Environment):
+    """
+    使用扁平 bytearray 存储网格的环境，每个单元格只占1个字节。
+
+    (x, y) 处的单元格存放在 cells[y * width + x]，取值为 CELL_CODES 中的小整数编码。
+    对外的 get_cell/set_cell/is_walkable/get_all_paths 接口与 Environment 完全一致，
+    同时通过 cells 暴露原始缓冲区，供需要批量处理的代码直接使用
+    （例如 numpy.frombuffer(env.cells, dtype=numpy.uint8) 可以零拷贝地得到数组）。
+    """
+
+    def _init_storage(self):
+        # 墙壁的编码为0，全零缓冲区就是一整块墙壁
+        self.cells = bytearray(self.width * self.height)
+        self._cells_shared = False
+
+    def _share_storage(self, child: 'Environment'):
+        # cells 必须保持为一整块连续缓冲区，所以写时复制的粒度是整个缓冲区（一次C层面的内存拷贝）
+        self._cells_shared = True
+        child._cells_shared = True
+
+    @property
+    def grid(self) -> list[list[str]]:
+        """
+        解码出 list-of-lists 形式的网格，用于保存、打印等需要字符网格的场合。
+
+        返回的是一份副本，修改它不会影响环境本身。
+        """
+        width = self.width
+        text = bytes(self.cells).translate(_DECODE_TABLE).decode('ascii')
+        return [list(text[y * width:(y + 1) * width]) for y in range(self.height)]
+
+    @grid.setter
+    def grid(self, grid: list[list[str]]):
+        """用字符网格整体替换当前内容，尺寸以传入的网格为准。"""
+        raw = ''.join(''.join(row) for row in grid).encode('ascii')
+        cells = bytearray(raw.translate(_ENCODE_TABLE))
+        if cells and max(cells) >= len(self.CELL_CHARS):
+            raise ValueError("网格中包含无法识别的元素字符。")
+        self.height = len(grid)
+        self.width = len(grid[0]) if grid else 0
+        self.cells = cells
+        self._cells_shared = False
+        self._on_grid_replaced()
+
+    def _build_position_index(self) -> dict[str, set[tuple[int, int]]]:
+        """用 bytearray.find 逐类扫描缓冲区，建立元素位置索引。"""
+        width = self.width
+        cells = self.cells
+        positions = {}
+        for element in self.INDEXED_ELEMENTS:
+            code = bytes([self.CELL_CODES[element]])
+            found = set()
+            i = cells.find(code)
+            while i != -1:
+                found.add((i % width, i // width))
+                i = cells.find(code, i + 1)
+            positions[element] = found
+        return positions
+
+    def walkable_mask(self) -> bytearray:
+        """返回按 y * width + x 排列的可行走掩码，1 表示可行走，0 表示墙壁。"""
+        return self.cells.translate(_WALKABLE_TABLE)
+
+    def index_of(self, x: int, y: int) -> int:
+        """返回 (x, y) 在 cells 缓冲区中的下标。调用方需自行保证坐标在边界内。"""
+        return y * self.width + x
+
+    def get_code(self, x: int, y: int) -> int:
+        """获取指定坐标的元素编码，边界外视为墙壁。"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y * self.width + x]
+        return _WALL_CODE
+
+    def get_cell(self, x: int, y: int) -> str:
+        """安全地获取指定坐标的元素。"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.CELL_CHARS[self.cells[y * self.width + x]]
+        return self.WALL
+
+    def set_cell(self, x: int, y: int, value: str):
+        """安全地设置指定坐标的元素。"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            if self._cells_shared:
+                self.cells = bytearray(self.cells)
+                self._cells_shared = False
+            i = y * self.width + x
+            old = self.cells[i]
+            code = self.CELL_CODES[value]
+            self.cells[i] = code
+            if self._positions is not None:
+                self._update_position_index(x, y, self.CELL_CHARS[old], value)
+            if old != code:
+                self._cell_changed(x, y, self.CELL_CHARS[old], value)
+
+    def fill_rect(self, x0: int, y0: int, x1: int, y1: int, value: str):
+        """
+        把 [x0, x1) x [y0, y1) 范围内的单元格都设置为 value，超出边界的部分被忽略。
+
+        直接对缓冲区做切片赋值（单列时用步长切片），不逐格经过 set_cell；
+        因此按整张网格被替换处理：派生缓存全部丢弃，修改日志的读者需要整体重新扫描。
+        """
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.width), min(y1, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        if self._cells_shared:
+            self.cells = bytearray(self.cells)
+            self._cells_shared = False
+        cells, width = self.cells, self.width
+        code = self.CELL_CODES[value]
+        if x1 - x0 == 1:
+            start = y0 * width + x0
+            cells[start:y1 * width + x0:width] = bytes([code]) * (y1 - y0)
+        else:
+            span = bytes([code]) * (x1 - x0)
+            for y in range(y0, y1):
+                cells[y * width + x0:y * width + x1] = span
+        self._on_grid_replaced()
+
+    def paste(self, x: int, y: int, width: int, codes: bytes):
+        """
+        把按行排列、每行 width 个的单元格编码块写到以 (x, y) 为左上角的区域。
+
+        逐行切片赋值，与 fill_rect 一样按整张网格被替换处理。调用方需保证整个块都在边界内。
+        """
+        if self._cells_shared:
+            self.cells = bytearray(self.cells)
+            self._cells_shared = False
+        cells, stride = self.cells, self.width
+        for row in range(len(codes) // width):
+            start = (y + row) * stride + x
+            cells[start:start + width] = codes[row * width:(row + 1) * width]
+        self._on_grid_replaced()
+
+    def is_walkable(self, x: int, y: int) -> bool:
+        """检查一个单元格是否不是墙壁，即可行走。"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y * self.width + x] != _WALL_CODE
+        return False
+
+    def get_all_paths(self) -> list[tuple[int, int]]:
+        """返回所有通路格子的(x, y)坐标列表。"""
+        # 用 bytearray.find 在C层面跳过墙壁，比逐格比较快得多
+        width = self.width
+        cells = self.cells
+        paths = []
+        i = cells.find(_PATH_BYTE)
+        while i != -1:
+            paths.append((i % width, i // width))
+            i = cells.find(_PATH_BYTE, i + 1)
+        return paths
+
+
+_WALL_CODE = Environment.CELL_CODES[Environment.WALL]
+_PATH_BYTE = bytes([Environment.CELL_CODES[Environment.PATH]])
+_ENCODE_TABLE = bytes.maketrans(Environment.CELL_CHARS.encode('ascii'), bytes(range(len(Environment.CELL_CHARS))))
+_DECODE_TABLE = bytes.maketrans(bytes(range(len(Environment.CELL_CHARS))), Environment.CELL_CHARS.encode('ascii'))
+_WALKABLE_TABLE = bytes([0] + [1] * 255)
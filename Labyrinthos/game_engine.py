@@ -4,22 +4,27 @@ import os
 import pygame
 import sys
 import json
+import time
 import tkinter as tk
 from tkinter import filedialog
 
 
 from agent import Agent
-from environment import Environment
+from environment import Environment, CompactEnvironment
 from renderer import Renderer
 from camera import Camera
-from io_handler import save_maze_to_json, get_saved_maps
-from components.world_generator import generate_world, load_world_from_file
-from components.strategy_core.dp_planner import find_optimal_path_dp
+from io_handler import save_maze_to_json, get_saved_maps, open_mapped_maze
+from mapped_environment import MAZE_EXT
+from components.world_generator import generate_world_steps, load_world_from_file
+from components.strategy_core.replanner import Replanner
 from components.strategy_core.puzzle_solver import PasswordSolver, hash_password
 from components.strategy_core.combat_optimizer import boss_battle_solver 
 from components.strategy_core.greedy_heuristic import get_smarter_greedy_move
 from collections import defaultdict
 
+# 分帧生成地图时，每帧最多花在生成上的时间（秒）
+GENERATION_FRAME_SECONDS = 1 / 120
+
 
 # --- 最终修复版的InputBox ---
 class InputBox:
@@ -85,6 +90,7 @@ class GameEngine:
         self.autoplay_step = 0
         self.autoplay_timer = 0
         self.autoplay_speed = 0.1 # 每0.1秒走一步
+        self.replanner = None # DP自动寻路的重新规划器，随地图一起创建
         self.visited_map = set() # <-- 新增：用于贪心算法的全局地图
         self.tabu_list = [] # <-- 新增：禁忌列表
         self.tabu_list_size = 5 # <-- 禁忌列表的长度（记住最近5步）
@@ -104,6 +110,9 @@ class GameEngine:
         self.battle_animation_speed = 0.4 # 每秒一个动画阶段
         self.battle_animation_phase = 'highlight' # 动画阶段: 'highlight' 或 'damage'
         self.battle_current_state = None # 存储战斗过程中的实时状态
+        # 分帧生成地图的进度
+        self.generation_steps = None
+        self.generation_progress = 0.0
         
         # --- 新增：加载并存储所有战斗图片 ---
         self.boss_images = self._load_images("boss", 6, (128, 128))
@@ -215,7 +224,7 @@ class GameEngine:
         self.renderer = Renderer(self.screen, self.env, IDEAL_CELL_SIZE, self.game_viewport_rect)
         self.camera = Camera(map_width * IDEAL_CELL_SIZE, map_height * IDEAL_CELL_SIZE)
 
-    def _open_file_dialog(self, title="选择文件", filetypes=(("JSON files", "*.json"), ("All files", "*.*"))):
+    def _open_file_dialog(self, title="选择文件", filetypes=(("JSON files", "*.json"), ("Maze files", "*" + MAZE_EXT), ("All files", "*.*"))):
         """
         打开文件选择对话框
         """
@@ -246,23 +255,69 @@ class GameEngine:
             if width % 2 == 0 or height % 2 == 0:
                 width += 1 if width % 2 == 0 else 0
                 height += 1 if height % 2 == 0 else 0
-            self.env = Environment(width, height)
-            generate_world(self.env,difficulty) # 假设generate_world内部处理难度
+            self.env = CompactEnvironment(width, height)
+            # 生成过程分摊到多帧执行，由 _update_generation 推进，窗口在此期间保持响应
+            self.generation_steps = generate_world_steps(self.env, difficulty)
+            self.generation_progress = 0.0
+            self.game_state = 'GENERATING'
+        except Exception as e:
+            self.error_message = f"生成失败: {e}"; print(self.error_message); self.game_state = 'MENU'; self._init_menu()
+
+    def _update_generation(self):
+        """推进分帧生成：本帧最多执行 GENERATION_FRAME_SECONDS 秒，完成后进入游戏。"""
+        deadline = time.perf_counter() + GENERATION_FRAME_SECONDS
+        try:
+            while time.perf_counter() < deadline:
+                self.generation_progress = next(self.generation_steps)
+            return
+        except StopIteration:
+            self.generation_steps = None
+        except Exception as e:
+            self.generation_steps = None
+            self.error_message = f"生成失败: {e}"; print(self.error_message); self.game_state = 'MENU'; self._init_menu()
+            return
+        try:
             save_maze_to_json(self.env)
             start_pos = self._find_start_position()
             if start_pos is None: raise RuntimeError("生成的地图中找不到起点 'S'。")
             self.agent = Agent(x=start_pos[0], y=start_pos[1])
-            self._setup_game_screen_and_camera(width, height)
+            self._setup_game_screen_and_camera(self.env.width, self.env.height)
             self.game_state = 'PLAYING'
             pygame.display.set_caption("Labyrinthos - 迷宫探险")
         except Exception as e:
             self.error_message = f"生成失败: {e}"; print(self.error_message); self.game_state = 'MENU'; self._init_menu()
 
+    def _handle_generating_input(self):
+        """生成过程中只处理关闭窗口和 ESC（取消生成，返回菜单）。"""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT: self.running = False; return
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                self.generation_steps = None
+                self.game_state = 'MENU'; self._init_menu(); return
+
+    def _draw_generating_screen(self):
+        """绘制地图生成的进度条。"""
+        self.screen.fill((20, 20, 40))
+        bar_w, bar_h = 400, 30
+        bar_rect = pygame.Rect((self.screen_width - bar_w) // 2, (self.screen_height - bar_h) // 2, bar_w, bar_h)
+        pygame.draw.rect(self.screen, (60, 60, 80), bar_rect)
+        fill_rect = pygame.Rect(bar_rect.x, bar_rect.y, int(bar_w * self.generation_progress), bar_h)
+        pygame.draw.rect(self.screen, (0, 150, 0), fill_rect)
+        pygame.draw.rect(self.screen, (200, 200, 200), bar_rect, 2)
+        text = self.small_font.render(f"正在生成地图... {self.generation_progress:.0%}（ESC 取消）", True, (255, 255, 255))
+        self.screen.blit(text, text.get_rect(center=(self.screen_width / 2, bar_rect.y - 30)))
+        pygame.display.flip()
+
     def _start_game_from_file(self, filename: str):
         self.tabu_list.clear()
         try:
-            self.env = Environment(1, 1) 
-            success = load_world_from_file(self.env, filename)
+            if filename.endswith(MAZE_EXT):
+                # 二进制地图直接映射打开，不需要逐格解析
+                self.env = open_mapped_maze(filename)
+                success = self.env is not None
+            else:
+                self.env = CompactEnvironment(1, 1)
+                success = load_world_from_file(self.env, filename)
             if not success: raise ValueError(f"无法从 {filename} 加载地图。")
             width, height = self.env.width, self.env.height
             start_pos = self._find_start_position()
@@ -275,11 +330,7 @@ class GameEngine:
             self.error_message = f"加载游戏失败: {e}"; print(self.error_message); self.game_state = 'MENU'; self._init_menu()
 
     def _find_start_position(self) -> tuple[int, int] | None:
-        for y in range(self.env.height):
-            for x in range(self.env.width):
-                if self.env.get_cell(x, y) == Environment.START:
-                    return (x, y)
-        return None
+        return self.env.find_first(Environment.START)
     
     def _start_boss_battle(self):
         """加载BOSS数据，计算策略，并切换到战斗模式"""
@@ -401,6 +452,13 @@ class GameEngine:
             print(f"启动解密模式失败: {e}")
             self.game_state = 'PLAYING'
     
+    def _replan_dp(self):
+        """从玩家当前位置、按当前体力和BOSS进度规划DP路线，返回 (max_gold, path)。"""
+        if self.replanner is None or self.replanner.env is not self.env:
+            self.replanner = Replanner(self.env)
+        return self.replanner.replan(self.agent.get_position(), boss=self.agent.bosses_defeated > 0,
+                                     stamina=self.agent.stamina)
+
     def _update_game_state(self):
         """处理玩家移动后可能触发的事件，并检查胜利/失败条件。"""
         pos = self.agent.get_position()
@@ -434,6 +492,7 @@ class GameEngine:
             self.env.set_cell(pos[0], pos[1], Environment.PATH) # 踩上后机关就消失
         elif cell == Environment.BOSS:
             print("\n--- 遭遇BOSS，准备战斗！ ---")
+            self.agent.bosses_defeated += 1
             if self.selected_boss_file:
                 self._start_boss_battle()
             else:
@@ -447,7 +506,7 @@ class GameEngine:
         # --- 胜利条件检查 ---
         elif cell == Environment.EXIT:
             # 统计地图上是否还有未被击败的BOSS
-            remaining_bosses = sum(1 for row in self.env.grid for c in row if c == Environment.BOSS)
+            remaining_bosses = self.env.count(Environment.BOSS)
             if remaining_bosses == 0:
                 print("\n--- 恭喜！已击败所有BOSS并到达终点！ ---")
                 self.game_state = 'VICTORY' # 切换到胜利状态
@@ -526,17 +585,15 @@ class GameEngine:
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if self.dp_button_rect.collidepoint(event.pos):
                     print("\n--- 按钮点击：开始执行动态规划 ---")
-                    max_gold, optimal_path = find_optimal_path_dp(self.env)
+                    # 从玩家当前位置出发，只规划体力耗尽之前能走完的路线
+                    max_gold, optimal_path = self._replan_dp()
                     if optimal_path:
-                        print("最优路径已找到，开始自动寻路演示...")
+                        print(f"最优路径已找到（还能获得 {max_gold} 金币），开始自动寻路演示...")
                         print(optimal_path)
                         # --- 启动自动寻路模式 ---
                         self.autoplay_path = optimal_path
                         self.autoplay_step = 0
                         self.autoplay_mode = "DP"
-                        # 将agent位置重置到路径起点，以防玩家之前移动过
-                        start_pos = self.autoplay_path[0]
-                        self.agent.x, self.agent.y = start_pos[0], start_pos[1]
                         
                 elif self.greedy_button_rect.collidepoint(event.pos):
                     print("\n--- 按钮点击：开始执行贪心算法演示 ---")
@@ -634,11 +691,9 @@ class GameEngine:
                 if self.battle_turn_index >= len(self.boss_battle_solution['actions']):
                     if self.battle_exit_button_rect.collidepoint(event.pos):
                         # 找到地图上的BOSS并移除
-                        for y in range(self.env.height):
-                           for x in range(self.env.width):
-                               if self.env.get_cell(x, y) == Environment.BOSS:
-                                   self.env.set_cell(x, y, Environment.PATH)
-                                   break
+                        boss_pos = self.env.find_first(Environment.BOSS)
+                        if boss_pos is not None:
+                            self.env.set_cell(boss_pos[0], boss_pos[1], Environment.PATH)
                         
                         # 返回游戏
                         self.game_state = 'PLAYING'
@@ -896,8 +951,8 @@ class GameEngine:
 
         # --- 左半部分：状态信息（两行显示） ---
         if self.agent and self.env:
-            remaining_bosses = sum(1 for row in self.env.grid for cell in row if cell == Environment.BOSS)
-            remaining_lockers = sum(1 for row in self.env.grid for cell in row if cell == Environment.LOCKER)
+            remaining_bosses = self.env.count(Environment.BOSS)
+            remaining_lockers = self.env.count(Environment.LOCKER)
             
             
             # 第一行信息
@@ -915,6 +970,10 @@ class GameEngine:
                 # f"增强鞋: {self.agent.inventory.get('增强鞋', 0)}"
                 
             ]
+            # 到终点的距离直接查预计算的距离场，不需要每帧搜索
+            fields = self.env.get_fields()
+            if fields is not None:
+                info_line2.append(f"距终点: {fields.distance_to_exit(self.agent.x, self.agent.y)}")
             
             hud_font = self.small_font
             start_x, y1, y2 = 15, 10, 40 # 定义起始x和两行的y坐标
@@ -994,7 +1053,7 @@ class GameEngine:
                 state = json.load(f)
             
             # --- 恢复环境 ---
-            env = Environment(state["env"]["width"], state["env"]["height"])
+            env = CompactEnvironment(state["env"]["width"], state["env"]["height"])
             env.grid = state["env"]["grid"]
             
             # --- 恢复 Agent ---
@@ -1002,6 +1061,7 @@ class GameEngine:
             agent.stamina = state["agent"]["stamina"]
             agent.gold = state["agent"]["gold"]
             agent.inventory = defaultdict(int, state["agent"]["inventory"])
+            agent.bosses_defeated = state["agent"].get("bosses_defeated", 0)
             
             # --- 恢复 BOSS / 谜题路径 ---
             selected = state.get("selected_files", {})
@@ -1026,7 +1086,8 @@ class GameEngine:
                     "y": agent.y,
                     "stamina": agent.stamina,
                     "gold": agent.gold,
-                    "inventory": dict(agent.inventory)
+                    "inventory": dict(agent.inventory),
+                    "bosses_defeated": agent.bosses_defeated
                 },
                 # --- 新增：记录当前选中的BOSS和谜题路径 ---
                 "selected_files": {
@@ -1068,6 +1129,12 @@ class GameEngine:
             if self.game_state == 'MENU':
                 self._handle_menu_input()
                 if self.game_state == 'MENU': self._draw_menu()
+            elif self.game_state == 'GENERATING':
+                self._handle_generating_input()
+                if self.game_state == 'GENERATING':
+                    self._update_generation()
+                if self.game_state == 'GENERATING':
+                    self._draw_generating_screen()
              # --- 新增对 PUZZLE 状态的处理 ---
             elif self.game_state == 'PUZZLE':
                 self._handle_puzzle_input()
@@ -1092,12 +1159,13 @@ class GameEngine:
                         self.autoplay_timer = 0
                         
                         vision = self.env.get_vision(self.agent.x, self.agent.y)
-                        bosses_defeated = sum(1 for row in self.env.grid for c in row if c == Environment.BOSS) == 0
+                        bosses_defeated = self.env.count(Environment.BOSS) == 0
                         current_pos = self.agent.get_position()
                         
                         # 调用更智能的贪心算法，并传入禁忌列表
                         dx, dy = get_smarter_greedy_move(
-                            vision, self.visited_map, current_pos, self.tabu_list, bosses_defeated
+                            vision, self.visited_map, current_pos, self.tabu_list, bosses_defeated,
+                            self.env.get_fields()
                         )
                         
                         if dx != 0 or dy != 0:
@@ -1137,7 +1205,17 @@ class GameEngine:
                             if self.env.is_walkable(next_x, next_y):
                                 self.agent.move(dx, dy, self.visited_map) # 移动后检查事件
                                 self.autoplay_step += 1            # ✅ 前进路径
+                                seq = self.env.journal_seq
                                 self._update_game_state()          # ✅ 吃金币、进机关
+                                if self.env.journal_seq != seq and self.game_state == 'PLAYING':
+                                    # 地图有变化（拿走了东西）：从当前位置重新规划，沿原路线走时直接沿用剩下的部分
+                                    _, path = self._replan_dp()
+                                    if path:
+                                        self.autoplay_path = path
+                                        self.autoplay_step = 0
+                                    else:
+                                        print("自动寻路：当前位置已无可行路线，停止。")
+                                        self.autoplay_mode = False
                             else:
                                 print("自动寻路：遇到不可通行区域，停止。")
                                 self.autoplay_mode = False
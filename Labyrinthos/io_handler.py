@@ -2,8 +2,12 @@
 
 import json
 import os
+import struct
+from array import array
 from datetime import datetime
 from environment import Environment
+from mapped_environment import MAZE_EXT, MappedEnvironment, write_maze_file
+from maze_graph import MazeFields, wall_digest
 
 # --- 新增：一个自定义的JSON编码器 ---
 class CompactListEncoder(json.JSONEncoder):
@@ -27,13 +31,92 @@ class CompactListEncoder(json.JSONEncoder):
 # 定义存放地图文件的目录名
 MAPS_DIR = "generated_maps"
 
-def save_maze_to_json(env: Environment):
+# 与地图一起保存的距离场文件：<地图文件路径>.fields
+# 格式为 (魔数, width, height, start_id, exit_id, 墙壁布局摘要) 头部，之后依次是三个 int32 数组：
+# 到起点的距离、到终点的距离、以起点为根的父节点
+FIELDS_EXT = ".fields"
+FIELDS_HEADER = struct.Struct('<4sIIii16s')
+FIELDS_MAGIC = b'LBF2'
+
+
+def save_maze_fields(env: Environment, map_filepath: str) -> str | None:
+    """
+    计算（或复用已缓存的）距离场，保存到地图文件旁边。
+
+    Returns:
+        str | None: 成功则返回距离场文件路径；地图缺少起点或终点、或写入失败时返回None。
+    """
+    fields = env.get_fields()
+    if fields is None:
+        return None
+    filepath = map_filepath + FIELDS_EXT
+    try:
+        with open(filepath, 'wb') as f:
+            f.write(FIELDS_HEADER.pack(FIELDS_MAGIC, fields.width, fields.height, fields.start_id, fields.exit_id,
+                                       wall_digest(env)))
+            for values in (fields.dist_from_start, fields.dist_from_exit, fields.parent):
+                values.tofile(f)
+        return filepath
+    except IOError as e:
+        print(f"错误: 无法保存距离场到文件 {filepath}. 原因: {e}")
+        return None
+
+
+def load_maze_fields(map_filepath: str) -> MazeFields | None:
+    """读取与地图一起保存的距离场，文件不存在或已损坏时返回None。"""
+    filepath = map_filepath + FIELDS_EXT
+    if not os.path.exists(filepath):
+        return None
+    try:
+        with open(filepath, 'rb') as f:
+            magic, width, height, start_id, exit_id, digest = FIELDS_HEADER.unpack(f.read(FIELDS_HEADER.size))
+            if magic != FIELDS_MAGIC:
+                raise ValueError("文件头不正确")
+            arrays = []
+            for _ in range(3):
+                values = array('i')
+                values.fromfile(f, width * height)
+                arrays.append(values)
+        return MazeFields(width, height, start_id, exit_id, *arrays, digest=digest)
+    except (struct.error, ValueError, EOFError, IOError) as e:
+        print(f"警告: 距离场文件 {filepath} 无法读取，将重新计算。原因: {e}")
+        return None
+
+
+def attach_saved_fields(env: Environment, map_filepath: str) -> bool:
+    """如果地图旁边有匹配的距离场文件，就让环境直接使用它。"""
+    fields = load_maze_fields(map_filepath)
+    return fields is not None and env.attach_fields(fields)
+
+
+def precompute_saved_fields() -> int:
+    """为地图目录中没有距离场文件、或距离场文件与地图不符的地图（重新）计算距离场，返回写入的文件数量。"""
+    created = 0
+    for filename in get_saved_maps():
+        filepath = os.path.join(MAPS_DIR, filename)
+        if filename.endswith(MAZE_EXT):
+            env = open_mapped_maze(filename)
+        else:
+            data = load_maze_from_json(filename)
+            grid = data and (data.get("grid") or data.get("maze"))
+            env = None
+            if grid:
+                env = Environment(len(grid[0]), len(grid))
+                env.grid = grid
+        if env is None or attach_saved_fields(env, filepath):
+            continue
+        if save_maze_fields(env, filepath):
+            created += 1
+    return created
+
+def save_maze_to_json(env: Environment, filename: str | None = None):
     """
     将当前环境的迷宫数据保存为JSON文件。
     使用自定义编码器来让迷宫网格横向显示。
 
     Args:
         env (Environment): 要保存的环境对象。
+        filename (str | None): 文件名，为None时按尺寸和时间戳自动命名。
 
     Returns:
         str | None: 成功则返回保存的文件路径，失败则返回None。
@@ -45,8 +128,9 @@ def save_maze_to_json(env: Environment):
             print(f"错误: 无法创建目录 {MAPS_DIR}. 原因: {e}")
             return None
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"map_{env.height}x{env.width}_{timestamp}.json"
+    if filename is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"map_{env.height}x{env.width}_{timestamp}.json"
     filepath = os.path.join(MAPS_DIR, filename)
 
     data_to_save = {
@@ -83,6 +167,7 @@ def save_maze_to_json(env: Environment):
             output += "}\n"
             f.write(output)
 
+        save_maze_fields(env, filepath)
         print(f"迷宫已成功保存到: {filepath}")
         return filepath
     except IOError as e:
@@ -90,16 +175,72 @@ def save_maze_to_json(env: Environment):
         return None
     
     
+def save_maze_to_binary(env: Environment, filename: str | None = None):
+    """
+    将当前环境的迷宫保存为可以直接 mmap 打开的二进制文件（.maze）。
+
+    Args:
+        env (Environment): 要保存的环境对象。
+        filename (str | None): 文件名，为None时按尺寸和时间戳自动命名。
+
+    Returns:
+        str | None: 成功则返回保存的文件路径，失败则返回None。
+    """
+    try:
+        os.makedirs(MAPS_DIR, exist_ok=True)
+    except OSError as e:
+        print(f"错误: 无法创建目录 {MAPS_DIR}. 原因: {e}")
+        return None
+
+    if filename is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"map_{env.height}x{env.width}_{timestamp}{MAZE_EXT}"
+    filepath = os.path.join(MAPS_DIR, filename)
+    try:
+        write_maze_file(env, filepath)
+        save_maze_fields(env, filepath)
+        print(f"迷宫已成功保存到: {filepath}")
+        return filepath
+    except IOError as e:
+        print(f"错误: 无法保存迷宫到文件 {filepath}. 原因: {e}")
+        return None
+
+
+def open_mapped_maze(filename: str) -> MappedEnvironment | None:
+    """
+    以内存映射的方式打开一个 .maze 地图文件，不需要读取或解析整张地图。
+
+    Args:
+        filename (str): 要打开的地图文件名。
+
+    Returns:
+        MappedEnvironment | None: 成功则返回环境对象，失败则返回None。
+    """
+    filepath = os.path.join(MAPS_DIR, filename)
+    if not os.path.exists(filepath):
+        print(f"错误: 地图文件不存在 {filepath}")
+        return None
+
+    try:
+        env = MappedEnvironment(filepath)
+        attach_saved_fields(env, filepath)
+        print(f"地图已从 {filepath} 映射打开。")
+        return env
+    except (ValueError, OSError) as e:
+        print(f"错误: 打开地图文件失败 {filepath}. 原因: {e}")
+        return None
+
+
 def get_saved_maps() -> list[str]:
     """
-    扫描地图目录，返回所有有效的.json地图文件名列表。
+    扫描地图目录，返回所有有效的地图文件名列表（.json 和 .maze）。
     """
     if not os.path.exists(MAPS_DIR):
         return []
     
     try:
         # 筛选出所有以.json结尾的文件，并按修改时间降序排列
-        files = [f for f in os.listdir(MAPS_DIR) if f.endswith('.json')]
+        files = [f for f in os.listdir(MAPS_DIR) if f.endswith(('.json', MAZE_EXT))]
         files.sort(key=lambda f: os.path.getmtime(os.path.join(MAPS_DIR, f)), reverse=True)
         return files
     except OSError as e:
@@ -0,0 +1,81 @@
+# labyrinthos/mapped_environment.py
+
+import mmap
+import os
+import struct
+
+from environment import Environment, CompactEnvironment
+
+# 迷宫二进制文件格式：
+#   width * height 个字节的单元格编码（与 CompactEnvironment.cells 的布局相同），
+#   末尾是 12 字节的尾部信息 (魔数, width, height)。
+# 尾部放在最后，单元格数据从文件开头开始，mmap 时无需考虑偏移量对齐。
+MAZE_MAGIC = b'LBYM'
+MAZE_TRAILER = struct.Struct('<4sII')
+MAZE_EXT = '.maze'
+
+
+def write_maze_file(env: Environment, filepath: str):
+    """把环境按二进制迷宫格式写入文件。"""
+    if isinstance(env, CompactEnvironment):
+        cells = env.cells
+    else:
+        codes = Environment.CELL_CODES
+        cells = bytes(codes[cell] for row in env.grid for cell in row)
+    with open(filepath, 'wb') as f:
+        f.write(cells)
+        f.write(MAZE_TRAILER.pack(MAZE_MAGIC, env.width, env.height))
+
+
+class MappedEnvironment(CompactEnvironment):
+    """
+    通过 mmap 直接映射二进制迷宫文件的环境，打开的开销与迷宫大小无关。
+
+    映射使用 ACCESS_COPY：读取时多个进程共享同一批只读页面，
+    set_cell 的修改只写进本进程私有的副本页（相当于一层覆盖层），永远不会改动文件本身。
+    需要持久化修改时，用 write_maze_file 另存一份。
+    """
+
+    def __init__(self, filepath: str):
+        """
+        打开一个二进制迷宫文件。
+
+        Args:
+            filepath (str): 由 write_maze_file 写出的 .maze 文件路径。
+        """
+        self.filepath = filepath
+        with open(filepath, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < MAZE_TRAILER.size:
+                raise ValueError(f"不是有效的迷宫文件: {filepath}")
+            f.seek(-MAZE_TRAILER.size, os.SEEK_END)
+            magic, width, height = MAZE_TRAILER.unpack(f.read(MAZE_TRAILER.size))
+            if magic != MAZE_MAGIC or f.tell() != width * height + MAZE_TRAILER.size:
+                raise ValueError(f"不是有效的迷宫文件: {filepath}")
+        super().__init__(width, height)
+        # 打开时的修改序号；序号不变说明映射还和文件内容一致
+        self._mapped_seq = self._journal_seq
+
+    def _init_storage(self):
+        self.cells = self._map()
+        self._cells_shared = False
+
+    def _map(self) -> mmap.mmap:
+        """把文件中的单元格数据以写时复制的方式映射进内存。"""
+        with open(self.filepath, 'rb') as f:
+            return mmap.mmap(f.fileno(), self.width * self.height, access=mmap.ACCESS_COPY)
+
+    def _share_storage(self, child: 'Environment'):
+        # 还没有修改过时，分支直接重新映射同一个文件，由操作系统按页做写时复制
+        if self._journal_seq == self._mapped_seq:
+            child.cells = self._map()
+        else:
+            super()._share_storage(child)
+
+    def walkable_mask(self) -> bytearray:
+        """返回按 y * width + x 排列的可行走掩码，1 表示可行走，0 表示墙壁。"""
+        # mmap 没有 translate，先切片成 bytes
+        return bytearray(self.cells[:]).translate(_WALKABLE_TABLE)
+
+
+_WALKABLE_TABLE = bytes([0] + [1] * 255)
@@ -0,0 +1,390 @@
+# labyrinthos/maze_graph.py
+
+import hashlib
+import heapq
+from array import array
+from itertools import accumulate
+
+
+class GridGraph:
+    """
+    可行走单元格的压缩邻接表（CSR格式）。
+
+    单元格用整数编号 cell_id = y * width + x 表示，与 CompactEnvironment.cells 的下标一致。
+    编号为 i 的单元格的邻居是 neighbors[offsets[i]:offsets[i + 1]]，
+    邻居的顺序固定为 右、左、下、上，墙壁格子的邻居列表为空。
+    """
+
+    def __init__(self, width: int, height: int, offsets: array, neighbors: array):
+        self.width = width
+        self.height = height
+        self.offsets = offsets
+        self.neighbors = neighbors
+
+    def cell_id(self, x: int, y: int) -> int:
+        """把(x, y)坐标转换为单元格编号。"""
+        return y * self.width + x
+
+    def position(self, cell_id: int) -> tuple[int, int]:
+        """把单元格编号转换回(x, y)坐标。"""
+        return (cell_id % self.width, cell_id // self.width)
+
+    def neighbors_of(self, cell_id: int) -> array:
+        """返回某个单元格的全部可行走邻居编号。"""
+        return self.neighbors[self.offsets[cell_id]:self.offsets[cell_id + 1]]
+
+    def degree(self, cell_id: int) -> int:
+        """返回某个单元格的可行走邻居数量。"""
+        return self.offsets[cell_id + 1] - self.offsets[cell_id]
+
+    @property
+    def num_edges(self) -> int:
+        """无向边的数量（每条边在邻接表中出现两次）。"""
+        return len(self.neighbors) // 2
+
+
+def build_grid_graph(width: int, height: int, walkable: bytearray) -> GridGraph:
+    """
+    根据可行走掩码构建 GridGraph。
+
+    Args:
+        width (int): 迷宫宽度。
+        height (int): 迷宫高度。
+        walkable (bytearray): 长度为 width * height 的掩码，1 表示可行走，0 表示墙壁。
+    """
+    n = width * height
+    degrees = bytearray(n)
+    neighbors = array('i')
+    append = neighbors.append
+
+    # 按编号递增的顺序只访问可行走格子，邻居会按编号顺序依次写入 neighbors
+    i = walkable.find(1)
+    while i != -1:
+        x = i % width
+        degree = 0
+        if x + 1 < width and walkable[i + 1]:
+            append(i + 1); degree += 1
+        if x > 0 and walkable[i - 1]:
+            append(i - 1); degree += 1
+        if i + width < n and walkable[i + width]:
+            append(i + width); degree += 1
+        if i >= width and walkable[i - width]:
+            append(i - width); degree += 1
+        degrees[i] = degree
+        i = walkable.find(1, i + 1)
+
+    offsets = array('i', accumulate(degrees, initial=0))
+    return GridGraph(width, height, offsets, neighbors)
+
+
+def bfs_distances(graph: GridGraph, source: int) -> array:
+    """
+    从 source 出发做一次广度优先搜索，返回每个单元格到它的步数。
+
+    结果按单元格编号索引，墙壁和不可达的格子为 -1。
+    """
+    return bfs_tree(graph, source)[0]
+
+
+def bfs_tree(graph: GridGraph, source: int) -> tuple[array, array]:
+    """
+    从 source 出发做一次广度优先搜索，返回 (距离, 父节点) 两个按单元格编号索引的数组。
+
+    父节点是广度优先搜索树中朝 source 方向的下一个格子；source 本身、墙壁和不可达的格子为 -1。
+    在无环迷宫中这棵树就是迷宫本身，沿父节点走就是唯一的通路。
+    """
+    offsets, neighbors = graph.offsets, graph.neighbors
+    dist = array('i', [-1]) * (graph.width * graph.height)
+    parent = array('i', [-1]) * (graph.width * graph.height)
+    dist[source] = 0
+    frontier = [source]
+    d = 0
+    while frontier:
+        d += 1
+        next_frontier = []
+        for u in frontier:
+            for v in neighbors[offsets[u]:offsets[u + 1]]:
+                if dist[v] < 0:
+                    dist[v] = d
+                    parent[v] = u
+                    next_frontier.append(v)
+        frontier = next_frontier
+    return dist, parent
+
+
+class MazeFields:
+    """
+    预先计算的迷宫距离场：到起点 S 的距离、到终点 E 的距离，以及以 S 为根的广度优先搜索树。
+
+    三个数组都按单元格编号 cell_id = y * width + x 索引，墙壁和不可达的格子为 -1。
+    它们只取决于墙壁和 S、E 的位置，可以随地图一起保存，加载后直接使用。
+    digest 是计算时墙壁布局的摘要（见 wall_digest），随地图保存的距离场靠它判断是否过期。
+    """
+
+    def __init__(self, width: int, height: int, start_id: int, exit_id: int,
+                 dist_from_start: array, dist_from_exit: array, parent: array, digest: bytes | None = None):
+        self.width = width
+        self.height = height
+        self.start_id = start_id
+        self.exit_id = exit_id
+        self.dist_from_start = dist_from_start
+        self.dist_from_exit = dist_from_exit
+        self.parent = parent
+        self.digest = digest
+
+    def distance_to_exit(self, x: int, y: int) -> int:
+        """(x, y) 到终点的步数，不可达时为 -1。"""
+        return self.dist_from_exit[y * self.width + x]
+
+    def distance_from_start(self, x: int, y: int) -> int:
+        """起点到 (x, y) 的步数，不可达时为 -1。"""
+        return self.dist_from_start[y * self.width + x]
+
+    def path_from_start(self, x: int, y: int) -> list[tuple[int, int]] | None:
+        """沿父节点回溯出从起点到 (x, y) 的最短路径，不可达时返回None。"""
+        cell_id = y * self.width + x
+        if self.dist_from_start[cell_id] < 0:
+            return None
+        path = []
+        while cell_id != -1:
+            path.append((cell_id % self.width, cell_id // self.width))
+            cell_id = self.parent[cell_id]
+        path.reverse()
+        return path
+
+    def matches(self, env) -> bool:
+        """
+        检查这份距离场是否属于 env 当前的地图：尺寸、起点、终点相同，并且墙壁布局的摘要一致。
+
+        没有摘要的距离场（不是从文件读取的）无法核对，视为不匹配。
+        """
+        width = self.width
+        return (self.digest is not None and width == env.width and self.height == env.height
+                and env.get_cell(self.start_id % width, self.start_id // width) == env.START
+                and env.get_cell(self.exit_id % width, self.exit_id // width) == env.EXIT
+                and self.digest == wall_digest(env))
+
+
+def wall_digest(env) -> bytes:
+    """墙壁布局（连同尺寸）的16字节摘要。金币、陷阱等元素的变化不影响它。"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{env.width}x{env.height}".encode())
+    digest.update(env.walkable_mask())
+    return digest.digest()
+
+
+def build_maze_fields(env) -> MazeFields | None:
+    """从起点和终点各做一次广度优先搜索，计算 MazeFields。地图缺少起点或终点时返回None。"""
+    start, exit_pos = env.find_first(env.START), env.find_first(env.EXIT)
+    if start is None or exit_pos is None:
+        return None
+    graph = env.get_adjacency()
+    start_id, exit_id = graph.cell_id(*start), graph.cell_id(*exit_pos)
+    dist_from_start, parent = bfs_tree(graph, start_id)
+    dist_from_exit = bfs_distances(graph, exit_id)
+    return MazeFields(env.width, env.height, start_id, exit_id, dist_from_start, dist_from_exit, parent)
+
+
+class JunctionGraph:
+    """
+    把走廊收缩后的带权图，只保留路口、死胡同和特殊格子（S、E、G、T、L、B）作为节点。
+
+    分治法生成的迷宫大部分格子都位于两端相连的走廊上，收缩之后节点数通常会少一到两个数量级。
+    每条边记录 (目标节点序号, 长度, 第一步的单元格编号)，
+    有了第一步就可以沿走廊唯一地走回去，把节点路径展开成单元格路径。
+    """
+
+    def __init__(self, grid: GridGraph, nodes: list[int], edges: list[list[tuple[int, int, int]]]):
+        self.grid = grid
+        self.nodes = nodes                                   # 节点序号 -> 单元格编号
+        self.node_of = {cell_id: i for i, cell_id in enumerate(nodes)}  # 单元格编号 -> 节点序号
+        self.edges = edges                                   # 节点序号 -> [(目标节点序号, 长度, 第一步)]
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def num_edges(self) -> int:
+        """无向边的数量（每条边在两个端点处各记录一次）。"""
+        return sum(len(out) for out in self.edges) // 2
+
+    def _walk(self, prev: int, cur: int) -> list[int]:
+        """
+        从 prev 走到 cur 后沿走廊一直走到下一个节点，返回途经的单元格编号（含终点节点）。
+
+        如果走廊是一个不含任何节点的环，会在回到 prev 时停下，此时最后一个元素不是节点。
+        """
+        offsets, neighbors = self.grid.offsets, self.grid.neighbors
+        origin = prev
+        cells = [cur]
+        while cur not in self.node_of and cur != origin:
+            a, b = neighbors[offsets[cur]], neighbors[offsets[cur] + 1]
+            prev, cur = cur, (b if a == prev else a)
+            cells.append(cur)
+        return cells
+
+    def expand_edge(self, node: int, first_step: int) -> list[int]:
+        """展开从 node 出发、第一步为 first_step 的边，返回途经的单元格编号（不含起点，含终点）。"""
+        return self._walk(self.nodes[node], first_step)
+
+    def anchors(self, cell_id: int) -> list[tuple[int, list[int]]]:
+        """返回任意可行走格子到相邻节点的 (节点序号, 途经单元格) 列表；节点本身直接返回自己。"""
+        if cell_id in self.node_of:
+            return [(self.node_of[cell_id], [])]
+        offsets, neighbors = self.grid.offsets, self.grid.neighbors
+        anchors = []
+        for k in range(offsets[cell_id], offsets[cell_id + 1]):
+            cells = self._walk(cell_id, neighbors[k])
+            if cells[-1] in self.node_of:
+                anchors.append((self.node_of[cells[-1]], cells))
+        return anchors
+
+    def dijkstra(self, cell_id: int, stops=frozenset()) -> tuple[dict, dict]:
+        """
+        从任意可行走格子出发，在收缩图上求到各节点的最短距离。
+
+        stops 中的节点（出发点本身除外）只记录距离、不再从它继续展开，
+        用于求“途中不经过其他兴趣点”的距离。
+
+        Returns:
+            (dist, pre)：节点序号 -> 距离；节点序号 -> (前一个节点序号, 第一步)，
+            出发点走廊上的第一个节点为 (None, 途经的单元格)。路径用 expand_path 展开。
+        """
+        dist, pre = {}, {}
+        heap = []
+        for node, cells in self.anchors(cell_id):
+            if node not in dist or len(cells) < dist[node]:
+                dist[node] = len(cells)
+                pre[node] = (None, cells)
+                heapq.heappush(heap, (len(cells), node))
+        source = self.node_of.get(cell_id)
+        edges = self.edges
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u] or (u in stops and u != source):
+                continue
+            for v, weight, first_step in edges[u]:
+                nd = d + weight
+                if v not in dist or nd < dist[v]:
+                    dist[v] = nd
+                    pre[v] = (u, first_step)
+                    heapq.heappush(heap, (nd, v))
+        return dist, pre
+
+    def expand_path(self, pre: dict, node: int) -> list[int]:
+        """沿 dijkstra 给出的前驱展开到 node 的单元格路径（不含出发格子，含 node 所在的格子）。"""
+        segments = []
+        while True:
+            prev_node, step = pre[node]
+            if prev_node is None:
+                segments.append(step)  # step 是出发格子到首个节点的走廊
+                break
+            segments.append(self.expand_edge(prev_node, step))
+            node = prev_node
+        cells = []
+        for segment in reversed(segments):
+            cells.extend(segment)
+        return cells
+
+    def shortest_path(self, start: tuple[int, int], goal: tuple[int, int]) -> tuple[int | None, list[tuple[int, int]] | None]:
+        """
+        在收缩图上用 Dijkstra 求 start 到 goal 的最短路，并展开为单元格路径。
+
+        start 和 goal 可以是任意可行走格子，不要求是节点。
+
+        Returns:
+            (路径长度, [(x, y), ...])；不连通时返回 (None, None)。
+        """
+        grid = self.grid
+        start_id, goal_id = grid.cell_id(*start), grid.cell_id(*goal)
+        if start_id == goal_id:
+            return 0, [start]
+
+        # 起点和终点位于同一条走廊上时，可以直接沿走廊到达
+        best_len, best_cells = None, None
+        start_anchors = self.anchors(start_id)
+        for _, cells in start_anchors:
+            if goal_id in cells:
+                direct = cells[:cells.index(goal_id) + 1]
+                if best_len is None or len(direct) < best_len:
+                    best_len, best_cells = len(direct), direct
+
+        # 终点到各相邻节点的走廊，反过来就是从节点走到终点
+        goal_tails = {}
+        for node, cells in self.anchors(goal_id):
+            tail = cells[-2::-1] + [goal_id]
+            if node not in goal_tails or len(tail) < len(goal_tails[node]):
+                goal_tails[node] = tail
+
+        dist, pre = {}, {}
+        heap = []
+        for node, cells in start_anchors:
+            if node not in dist or len(cells) < dist[node]:
+                dist[node] = len(cells)
+                pre[node] = (None, cells)
+                heapq.heappush(heap, (len(cells), node))
+
+        # 找到终点后可以提前停止，所以这里不直接调用 dijkstra
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if u in goal_tails:
+                total = d + len(goal_tails[u]) - (1 if self.nodes[u] == goal_id else 0)
+                if best_len is None or total < best_len:
+                    best_len, best_cells = total, None
+                    best_node = u
+            if best_len is not None and d >= best_len:
+                break
+            for v, weight, first_step in self.edges[u]:
+                nd = d + weight
+                if v not in dist or nd < dist[v]:
+                    dist[v] = nd
+                    pre[v] = (u, first_step)
+                    heapq.heappush(heap, (nd, v))
+
+        if best_len is None:
+            return None, None
+
+        if best_cells is None:
+            best_cells = self.expand_path(pre, best_node)
+            if self.nodes[best_node] != goal_id:
+                best_cells.extend(goal_tails[best_node])
+
+        return best_len, [start] + [grid.position(c) for c in best_cells]
+
+
+def build_junction_graph(env) -> JunctionGraph:
+    """
+    基于环境的 CSR 邻接表构建走廊收缩图。
+
+    度数不为2的可行走格子（路口、死胡同）以及所有特殊元素格子成为节点，
+    其余度数为2的格子被收缩进连接两个节点的带权边中。
+    """
+    grid = env.get_adjacency()
+    offsets, neighbors = grid.offsets, grid.neighbors
+    width = env.width
+
+    special = set()
+    for element in env.INDEXED_ELEMENTS:
+        for x, y in env.positions_of(element):
+            special.add(y * width + x)
+
+    nodes = []
+    walkable = env.walkable_mask()
+    i = walkable.find(1)
+    while i != -1:
+        if offsets[i + 1] - offsets[i] != 2 or i in special:
+            nodes.append(i)
+        i = walkable.find(1, i + 1)
+
+    graph = JunctionGraph(grid, nodes, [])
+    for cell_id in nodes:
+        out = []
+        for k in range(offsets[cell_id], offsets[cell_id + 1]):
+            first_step = neighbors[k]
+            cells = graph._walk(cell_id, first_step)
+            out.append((graph.node_of[cells[-1]], len(cells), first_step))
+        graph.edges.append(out)
+    return graph
@@ -71,49 +71,49 @@ class Renderer:
 
     def draw_environment(self, camera: Camera):
         """绘制相机视野内的迷宫网格和静态元素到指定的视口中。"""
-        # 计算相机视野内的单元格范围 (使用视口宽高)
-        start_col = -camera.camera_rect.x // self.cell_size
-        end_col = start_col + (self.viewport.width // self.cell_size) + 2
-        start_row = -camera.camera_rect.y // self.cell_size
-        end_row = start_row + (self.viewport.height // self.cell_size) + 2
+        # 计算相机视野内的单元格范围 (使用视口宽高)，并裁剪到地图边界内，
+        # 这样即使是分块存储的超大地图，也只会访问视口附近的瓦片
+        start_col = max(0, -camera.camera_rect.x // self.cell_size)
+        end_col = min(self.env.width, start_col + (self.viewport.width // self.cell_size) + 2)
+        start_row = max(0, -camera.camera_rect.y // self.cell_size)
+        end_row = min(self.env.height, start_row + (self.viewport.height // self.cell_size) + 2)
 
         for y in range(start_row, end_row):
             for x in range(start_col, end_col):
-                if self.env.is_in_bounds(x, y):
-                    # 1. 计算物体在世界中的绝对位置
-                    world_rect = pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size)
+                # 1. 计算物体在世界中的绝对位置
+                world_rect = pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size)
+                
+                # 2. 使用相机转换得到在相机内的相对坐标
+                pos_in_camera = camera.apply(world_rect).topleft
+                
+                # 3. 计算最终在屏幕上的绘制位置（相机坐标 + 视口偏移）
+                final_rect = pygame.Rect(
+                    pos_in_camera[0] + self.viewport.x,
+                    pos_in_camera[1] + self.viewport.y,
+                    self.cell_size, self.cell_size
+                )
+
+                # 优化：只绘制实际在视口内的物体
+                if self.viewport.colliderect(final_rect):
+                    cell_char = self.env.get_cell(x, y)
                     
-                    # 2. 使用相机转换得到在相机内的相对坐标
-                    pos_in_camera = camera.apply(world_rect).topleft
+                    # 绘制地形
+                    if cell_char == Environment.WALL:
+                        pygame.draw.rect(self.screen, self.colors[Environment.WALL], final_rect)
+                    else:
+                        pygame.draw.rect(self.screen, self.colors[Environment.PATH], final_rect)
                     
-                    # 3. 计算最终在屏幕上的绘制位置（相机坐标 + 视口偏移）
-                    final_rect = pygame.Rect(
-                        pos_in_camera[0] + self.viewport.x,
-                        pos_in_camera[1] + self.viewport.y,
-                        self.cell_size, self.cell_size
-                    )
-
-                    # 优化：只绘制实际在视口内的物体
-                    if self.viewport.colliderect(final_rect):
-                        cell_char = self.env.get_cell(x, y)
-                        
-                        # 绘制地形
-                        if cell_char == Environment.WALL:
-                            pygame.draw.rect(self.screen, self.colors[Environment.WALL], final_rect)
+                    # 绘制元素
+                    if cell_char != Environment.PATH:
+                        if 'colors' in self.resources:
+                            color = self.resources['colors'].get(cell_char)
+                            if color:
+                                inner_rect = final_rect.inflate(-self.cell_size * 0.2, -self.cell_size * 0.2)
+                                pygame.draw.rect(self.screen, color, inner_rect, border_radius=5)
                         else:
-                            pygame.draw.rect(self.screen, self.colors[Environment.PATH], final_rect)
-                        
-                        # 绘制元素
-                        if cell_char != Environment.PATH:
-                            if 'colors' in self.resources:
-                                color = self.resources['colors'].get(cell_char)
-                                if color:
-                                    inner_rect = final_rect.inflate(-self.cell_size * 0.2, -self.cell_size * 0.2)
-                                    pygame.draw.rect(self.screen, color, inner_rect, border_radius=5)
-                            else:
-                                image = self.resources.get(cell_char)
-                                if image:
-                                    self.screen.blit(image, final_rect)
+                            image = self.resources.get(cell_char)
+                            if image:
+                                self.screen.blit(image, final_rect)
 
     def draw_agent(self, agent: Agent, camera: Camera):
         """在屏幕上绘制代理，同样考虑视口偏移。"""
@@ -0,0 +1,8 @@
+# labyrinthos/tests/conftest.py
+
+import os
+import sys
+
+# 添加项目根目录到模块搜索路径，与各模块的做法一致
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
@@ -0,0 +1,49 @@
+# labyrinthos/tests/test_batch_generator.py
+"""
+批量生成：同样的参数与进程数无关地生成同样的地图，数量为 0 时只写出空清单。
+"""
+import json
+import os
+import sys
+
+import pytest
+
+import batch_generator
+from batch_generator import generate_batch
+from io_handler import MAPS_DIR
+
+
+def read_batch(manifest_path):
+    """清单里的地图记录（去掉耗时）以及每张地图的内容（.json 只取网格，不含生成时间）。"""
+    with open(manifest_path, encoding='utf-8') as f:
+        records = json.load(f)["maps"]
+    maps = {}
+    for record in records:
+        del record["generation_seconds"]
+        with open(os.path.join(MAPS_DIR, record["file"]), 'rb') as f:
+            data = f.read()
+        maps[record["file"]] = json.loads(data)["maze"] if record["file"].endswith('.json') else data
+    return records, maps
+
+
+@pytest.mark.parametrize("fmt", ['json', 'maze'])
+def test_batch_does_not_depend_on_workers(fmt, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    single = read_batch(generate_batch(6, [15, 21], ['简单', '困难'], base_seed=5, workers=1, fmt=fmt))
+    os.rename(MAPS_DIR, "single")
+    parallel = read_batch(generate_batch(6, [15, 21], ['简单', '困难'], base_seed=5, workers=3, fmt=fmt))
+    assert len(single[0]) == 6 and parallel == single
+
+
+def test_empty_batch_writes_empty_manifest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open(generate_batch(0, [15], ['简单']), encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert manifest["count"] == 0 and manifest["maps"] == []
+
+
+@pytest.mark.parametrize("count", ["0", "-3"])
+def test_cli_rejects_non_positive_count(count, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ["batch_generator.py", "--count", count])
+    with pytest.raises(SystemExit):
+        batch_generator.main()
@@ -0,0 +1,176 @@
+# labyrinthos/tests/test_environment.py
+"""
+不同存储方式的环境在同一串操作下的行为必须一致：以列表网格的 Environment 为参照。
+"""
+import random
+
+import pytest
+
+from environment import Environment, CompactEnvironment
+from tiled_environment import TiledEnvironment
+from components.world_generator import generate_world
+from components.strategy_core.dp_planner import dp_planner
+
+CELLS = Environment.CELL_CHARS
+
+
+def random_edits(env, rng, count):
+    """对环境做一串随机修改：单格写入为主，夹杂整块填充和编码块粘贴。"""
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.8:
+            env.set_cell(rng.randrange(-1, env.width + 1), rng.randrange(-1, env.height + 1), rng.choice(CELLS))
+        elif roll < 0.9:
+            x0, y0 = rng.randrange(env.width), rng.randrange(env.height)
+            env.fill_rect(x0, y0, x0 + rng.randrange(1, 5), y0 + rng.randrange(1, 5), rng.choice(CELLS))
+        else:
+            width = rng.randrange(1, 4)
+            codes = bytes(rng.randrange(len(CELLS)) for _ in range(width * rng.randrange(1, 4)))
+            env.paste(rng.randrange(env.width - width + 1), rng.randrange(env.height - 2), width, codes)
+
+
+def assert_same(reference, env):
+    """逐项比较两个环境对外可见的状态。"""
+    assert (env.width, env.height) == (reference.width, reference.height)
+    assert env.grid == reference.grid
+    assert env.walkable_mask() == reference.walkable_mask()
+    assert sorted(env.get_all_paths()) == sorted(reference.get_all_paths())
+    for y in range(-1, reference.height + 1):
+        for x in range(-1, reference.width + 1):
+            assert env.get_cell(x, y) == reference.get_cell(x, y)
+            assert env.is_walkable(x, y) == reference.is_walkable(x, y)
+    for _ in range(5):
+        x, y = random.randrange(reference.width), random.randrange(reference.height)
+        assert env.get_vision(x, y) == reference.get_vision(x, y)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_compact_matches_list_grid(seed):
+    rng = random.Random(seed)
+    reference, compact = Environment(9, 7), CompactEnvironment(9, 7)
+    for env in (reference, compact):
+        random_edits(env, random.Random(seed), 300)
+    assert_same(reference, compact)
+    grid = [[rng.choice(CELLS) for _ in range(5)] for _ in range(3)]
+    reference.grid = grid
+    compact.grid = grid
+    assert_same(reference, compact)
+
+
+
+
+def small_tiled(width, height, tile_dir=None):
+    """3x3 的瓦片、内存里最多两个瓦片：几乎每次跨瓦片访问都会触发淘汰和读盘。"""
+    return TiledEnvironment(width, height, tile_size=3, tile_dir=tile_dir, max_memory=2 * 3 * 3)
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+@pytest.mark.parametrize("seed", range(10))
+def test_tiled_matches_list_grid(seed, on_disk, tmp_path):
+    rng = random.Random(seed)
+    tile_dir = str(tmp_path) if on_disk else None
+    reference, tiled = Environment(9, 7), small_tiled(9, 7, tile_dir)
+    for env in (reference, tiled):
+        random_edits(env, random.Random(seed), 300)
+    assert_same(reference, tiled)
+    if on_disk:
+        tiled.flush()
+        assert_same(reference, small_tiled(9, 7, tile_dir))
+    grid = [[rng.choice(CELLS) for _ in range(5)] for _ in range(4)]
+    reference.grid = grid
+    tiled.grid = grid
+    assert_same(reference, tiled)
+
+
+@pytest.mark.parametrize("env_class", [CompactEnvironment, small_tiled])
+@pytest.mark.parametrize("seed", range(5))
+def test_generates_and_plans_like_list_grid(env_class, seed):
+    reference, env = Environment(15, 15), env_class(15, 15)
+    for each in (reference, env):
+        generate_world(each, '困难', seed=seed)
+    assert_same(reference, env)
+    assert dp_planner(env) == dp_planner(reference)
+
+
+def scanned_positions(env, element):
+    """逐格扫描得到的位置集合，作为位置索引的参照。"""
+    return {(x, y) for y in range(env.height) for x in range(env.width) if env.get_cell(x, y) == element}
+
+
+@pytest.mark.parametrize("env_class", [Environment, CompactEnvironment, small_tiled])
+@pytest.mark.parametrize("seed", range(5))
+def test_position_index_tracks_edits(env_class, seed):
+    env = env_class(11, 9)
+    rng = random.Random(seed)
+    for rounds in range(4):
+        # 第一轮在建立索引之前修改，之后的修改由 set_cell 实时维护
+        random_edits(env, rng, 100)
+        for element in env.INDEXED_ELEMENTS:
+            assert env.positions_of(element) == scanned_positions(env, element)
+            assert env.count(element) == len(scanned_positions(env, element))
+            first = env.find_first(element)
+            assert first is None if not env.count(element) else env.get_cell(*first) == element
+    env.grid = [[rng.choice(CELLS) for _ in range(4)] for _ in range(3)]
+    for element in env.INDEXED_ELEMENTS:
+        assert env.positions_of(element) == scanned_positions(env, element)
+    with pytest.raises(ValueError):
+        env.positions_of(env.PATH)
+
+
+ENV_CLASSES = [Environment, CompactEnvironment, small_tiled]
+
+
+@pytest.mark.parametrize("env_class", ENV_CLASSES)
+def test_journal_records_changes_in_order(env_class, monkeypatch):
+    monkeypatch.setattr(Environment, 'JOURNAL_SIZE', 4)
+    env = env_class(6, 5)
+    seq = env.journal_seq
+    env.set_cell(1, 1, 'G')
+    env.set_cell(1, 1, 'G')  # 内容没变，不记日志
+    env.set_cell(2, 3, 'T')
+    env.set_cell(1, 1, ' ')
+    assert env.changes_since(seq) == [(1, 1, '#', 'G'), (2, 3, '#', 'T'), (1, 1, 'G', ' ')]
+    assert env.changes_since(env.journal_seq) == []
+
+    first, second = env.journal_cursor(), env.journal_cursor()
+    env.set_cell(0, 0, 'L')
+    assert first.poll() == [(0, 0, '#', 'L')]
+    assert first.poll() == []
+    env.set_cell(0, 0, 'B')
+    assert second.poll() == [(0, 0, '#', 'L'), (0, 0, 'L', 'B')]
+
+    # 超出日志容量、整张替换网格后，读者被告知错过了修改
+    for x in range(5):
+        env.set_cell(x, 4, 'S')
+    assert first.poll() is None and first.poll() == []
+    env.grid = [[' '] * 3 for _ in range(2)]
+    assert second.poll() is None and env.changes_since(seq) is None
+
+
+@pytest.mark.parametrize("env_class", ENV_CLASSES)
+@pytest.mark.parametrize("seed", range(5))
+def test_fork_branches_are_independent(env_class, seed):
+    rng = random.Random(seed)
+    parent = env_class(9, 7)
+    random_edits(parent, rng, 100)
+    frozen = Environment(9, 7)
+    frozen.grid = parent.grid
+    parent_cursor = parent.journal_cursor()
+    child = parent.fork()
+    assert_same(frozen, child)
+
+    # 只用 set_cell：CompactEnvironment 的块写入按整体替换处理，不记日志
+    child_seq = child.journal_seq
+    for _ in range(100):
+        child.set_cell(rng.randrange(9), rng.randrange(7), rng.choice(CELLS))
+    assert_same(frozen, parent)
+    assert parent_cursor.poll() == []
+    replay = Environment(9, 7)
+    replay.grid = frozen.grid
+    for x, y, old, new in child.changes_since(child_seq):
+        assert replay.get_cell(x, y) == old
+        replay.set_cell(x, y, new)
+    assert_same(replay, child)
+
+    random_edits(parent, rng, 100)
+    assert_same(replay, child)
@@ -0,0 +1,69 @@
+# labyrinthos/tests/test_io_handler.py
+"""
+与地图一起保存的距离场：匹配时直接使用，地图被改过后必须被拒绝并重新计算。
+"""
+import os
+
+from environment import CompactEnvironment
+from mapped_environment import MappedEnvironment, write_maze_file
+from maze_graph import build_maze_fields
+from components.world_generator import generate_world
+from io_handler import (MAPS_DIR, FIELDS_EXT, save_maze_fields, load_maze_fields, attach_saved_fields,
+                        precompute_saved_fields)
+
+
+def fields_data(fields):
+    return (fields.start_id, fields.exit_id, list(fields.dist_from_start), list(fields.dist_from_exit),
+            list(fields.parent))
+
+
+def save_map(env, filename="map.maze"):
+    os.makedirs(MAPS_DIR, exist_ok=True)
+    path = os.path.join(MAPS_DIR, filename)
+    write_maze_file(env, path)
+    return path
+
+
+def test_saved_fields_are_attached(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    env = CompactEnvironment(21, 15)
+    generate_world(env, '困难', seed=0)
+    path = save_map(env)
+    assert save_maze_fields(env, path) == path + FIELDS_EXT
+
+    mapped = MappedEnvironment(path)
+    assert attach_saved_fields(mapped, path)
+    assert fields_data(mapped.get_fields()) == fields_data(build_maze_fields(env))
+
+
+def test_stale_fields_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    env = CompactEnvironment(21, 15)
+    generate_world(env, '困难', seed=0)
+    path = save_map(env)
+    save_maze_fields(env, path)
+
+    # 拆掉一堵内墙：尺寸、起点、终点都没变，只有墙壁布局的摘要能发现距离场已经过期
+    wall = next((x, y) for y in range(1, env.height - 1) for x in range(1, env.width - 1)
+                if env.get_cell(x, y) == env.WALL)
+    env.set_cell(*wall, env.PATH)
+    save_map(env)
+    mapped = MappedEnvironment(path)
+    assert not attach_saved_fields(mapped, path)
+    assert fields_data(mapped.get_fields()) == fields_data(build_maze_fields(env))
+
+    assert precompute_saved_fields() == 1
+    assert precompute_saved_fields() == 0
+    assert attach_saved_fields(MappedEnvironment(path), path)
+
+
+def test_damaged_fields_file_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    env = CompactEnvironment(15, 15)
+    generate_world(env, '简单', seed=2)
+    path = save_map(env)
+    save_maze_fields(env, path)
+    with open(path + FIELDS_EXT, 'r+b') as f:
+        f.truncate(40)
+    assert load_maze_fields(path) is None
+    assert not attach_saved_fields(MappedEnvironment(path), path)
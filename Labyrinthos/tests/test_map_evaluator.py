@@ -0,0 +1,35 @@
+# labyrinthos/tests/test_map_evaluator.py
+"""
+map_evaluator 的“能否通关”必须与 dp_planner 对体力的理解一致：路线（含起点）最多 stamina 个格子。
+"""
+import pytest
+
+from environment import CompactEnvironment
+from components.world_generator import generate_calibrated_world
+from components.strategy_core.map_evaluator import evaluate_map
+from components.strategy_core.dp_planner import dp_planner
+from test_planners import make_map
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_winnable_matches_planner_stamina(seed):
+    env = make_map(seed)
+    route = evaluate_map(env)["route_length"]
+    for stamina in (route - 1, route, route + 1):
+        winnable = evaluate_map(env, stamina)["winnable"]
+        assert winnable == (stamina > route)
+        if env.count(env.BOSS) == 1:
+            # 只有一个BOSS时必经路线就是最短的通关路线
+            assert (dp_planner(env, 'bitmask', stamina=stamina)[1] is not None) == winnable
+
+
+@pytest.mark.parametrize("stamina", [16, 24, 32])
+@pytest.mark.parametrize("seed", range(6))
+def test_calibrated_maps_are_playable(seed, stamina):
+    env = CompactEnvironment(11, 11)
+    score = generate_calibrated_world(env, '简单', stamina=stamina, seed=seed)
+    if score is None:
+        pytest.skip("这个体力下校准失败")
+    coins, path = dp_planner(env, 'bitmask', stamina=stamina)
+    assert path is not None and len(path) <= stamina
+    assert len(path) - 1 >= score["route_length"]
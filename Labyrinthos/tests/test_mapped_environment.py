@@ -0,0 +1,53 @@
+# labyrinthos/tests/test_mapped_environment.py
+"""
+mmap 打开的 .maze 文件与写出它的环境一致，修改只留在进程内，不会写回文件。
+"""
+import pytest
+
+from environment import Environment, CompactEnvironment
+from mapped_environment import MappedEnvironment, write_maze_file, MAZE_TRAILER
+from components.world_generator import generate_world
+from components.strategy_core.dp_planner import dp_planner
+from test_environment import assert_same
+
+
+@pytest.mark.parametrize("env_class", [Environment, CompactEnvironment])
+@pytest.mark.parametrize("seed", range(3))
+def test_mapped_file_matches_source(env_class, seed, tmp_path):
+    source = env_class(15, 11)
+    generate_world(source, '困难', seed=seed)
+    path = str(tmp_path / "map.maze")
+    write_maze_file(source, path)
+    mapped = MappedEnvironment(path)
+    assert_same(source, mapped)
+    assert dp_planner(mapped) == dp_planner(source)
+
+
+def test_mapped_edits_stay_private(tmp_path):
+    source = CompactEnvironment(9, 7)
+    source.fill_rect(1, 1, 8, 6, source.PATH)
+    path = str(tmp_path / "map.maze")
+    write_maze_file(source, path)
+    with open(path, 'rb') as f:
+        original = f.read()
+
+    mapped = MappedEnvironment(path)
+    untouched = mapped.fork()
+    mapped.set_cell(2, 2, 'G')
+    edited = mapped.fork()
+    edited.set_cell(3, 3, 'T')
+    assert (mapped.get_cell(2, 2), mapped.get_cell(3, 3)) == ('G', ' ')
+    assert (untouched.get_cell(2, 2), edited.get_cell(2, 2), edited.get_cell(3, 3)) == (' ', 'G', 'T')
+    with open(path, 'rb') as f:
+        assert f.read() == original
+    assert_same(source, MappedEnvironment(path))
+
+
+def test_rejects_invalid_file(tmp_path):
+    path = tmp_path / "broken.maze"
+    path.write_bytes(b"#" * 20 + MAZE_TRAILER.pack(b'LBYM', 5, 5))
+    with pytest.raises(ValueError):
+        MappedEnvironment(str(path))
+    path.write_bytes(b"LBYM")
+    with pytest.raises(ValueError):
+        MappedEnvironment(str(path))
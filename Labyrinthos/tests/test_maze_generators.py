@@ -0,0 +1,65 @@
+# labyrinthos/tests/test_maze_generators.py
+"""
+注册表中的每个生成算法都在同一套格点上生成完美迷宫，并且可以用种子复现。
+"""
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from environment import Environment, CompactEnvironment
+from components.maze_generators import MAZE_GENERATORS, carve_with
+from components.world_generator import carve_perfect_maze, generate_world
+from test_world_generator import assert_perfect
+
+ALGORITHMS = sorted(MAZE_GENERATORS)
+
+
+def carve(env_class, algorithm, seed, size=(25, 19)):
+    env = env_class(*size)
+    carve_with(env, algorithm, random.Random(seed))
+    return env
+
+
+@pytest.mark.parametrize("env_class", [Environment, CompactEnvironment])
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+@pytest.mark.parametrize("seed", range(3))
+def test_generators_carve_perfect_lattice_mazes(env_class, algorithm, seed):
+    env = carve(env_class, algorithm, seed)
+    assert_perfect(env)
+    assert all(env.is_walkable(x, y) for y in range(1, env.height - 1, 2) for x in range(1, env.width - 1, 2))
+    assert carve(env_class, algorithm, seed).grid == env.grid
+
+
+def test_recursive_division_is_carve_perfect_maze():
+    expected = CompactEnvironment(25, 19)
+    carve_perfect_maze(expected, random.Random(7))
+    assert carve(CompactEnvironment, 'recursive_division', 7).grid == expected.grid
+
+
+def test_generate_world_accepts_algorithm():
+    env = CompactEnvironment(21, 21)
+    generate_world(env, '简单', seed=1, algorithm='wilson')
+    assert env.count(env.START) == env.count(env.EXIT) == 1
+
+
+def test_unknown_algorithm_raises():
+    with pytest.raises(ValueError):
+        carve_with(CompactEnvironment(9, 9), 'no_such_algorithm')
+
+
+def test_registry_works_without_world_generator_imported():
+    # 只导入注册表时，分治法也要能用（它在调用时才导入 world_generator）
+    code = (
+        "import random, sys\n"
+        "from environment import CompactEnvironment\n"
+        "from components.maze_generators import carve_with\n"
+        "assert 'components.world_generator' not in sys.modules\n"
+        "env = CompactEnvironment(15, 15)\n"
+        "carve_with(env, 'recursive_division', random.Random(0))\n"
+        "assert env.get_all_paths()\n"
+    )
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=project_root, check=True)
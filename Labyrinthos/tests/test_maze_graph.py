@@ -0,0 +1,131 @@
+# labyrinthos/tests/test_maze_graph.py
+"""
+邻接表、走廊收缩图与距离场：与逐格的广度优先搜索对拍。
+"""
+import random
+
+import pytest
+
+from environment import Environment, CompactEnvironment
+from maze_graph import bfs_distances
+from components.strategy_core.poi_planner import PoiGraph
+from test_planners import make_map
+
+INF = float('inf')
+
+
+def walkable_cells(env):
+    return [(x, y) for y in range(env.height) for x in range(env.width) if env.is_walkable(x, y)]
+
+
+def cell_bfs(env, source, stops=()):
+    """直接在网格上逐格搜索的参照；stops 中的格子（出发格子除外）不再继续展开。"""
+    dist = {source: 0}
+    frontier = [source]
+    while frontier:
+        next_frontier = []
+        for x, y in frontier:
+            if (x, y) != source and (x, y) in stops:
+                continue
+            for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if env.is_walkable(nx, ny) and (nx, ny) not in dist:
+                    dist[(nx, ny)] = dist[(x, y)] + 1
+                    next_frontier.append((nx, ny))
+        frontier = next_frontier
+    return dist
+
+
+def assert_walk(env, path):
+    for (ax, ay), (bx, by) in zip(path, path[1:]):
+        assert abs(ax - bx) + abs(ay - by) == 1
+        assert env.is_walkable(bx, by)
+
+
+def assert_adjacency_matches_grid(env):
+    graph = env.get_adjacency()
+    for y in range(env.height):
+        for x in range(env.width):
+            cell_id = graph.cell_id(x, y)
+            assert graph.position(cell_id) == (x, y)
+            neighbors = {graph.position(v) for v in graph.neighbors[graph.offsets[cell_id]:graph.offsets[cell_id + 1]]}
+            expected = set()
+            if env.is_walkable(x, y):
+                expected = {(nx, ny) for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+                            if env.is_walkable(nx, ny)}
+            assert neighbors == expected
+
+
+@pytest.mark.parametrize("env_class", [Environment, CompactEnvironment])
+@pytest.mark.parametrize("seed", range(5))
+def test_adjacency_cache_follows_wall_edits(env_class, seed):
+    rng = random.Random(seed)
+    source = make_map(seed, loops=seed)
+    env = env_class(source.width, source.height)
+    env.grid = source.grid
+    assert_adjacency_matches_grid(env)
+    for _ in range(30):
+        graph = env.get_adjacency()
+        x, y = rng.randrange(env.width), rng.randrange(env.height)
+        old = env.get_cell(x, y)
+        if old == env.WALL:
+            new = env.PATH
+        else:
+            new = rng.choice([env.WALL, env.GOLD, env.TRAP, env.PATH])
+        env.set_cell(x, y, new)
+        # 只有墙壁和通路之间的变化才需要重建
+        assert (env.get_adjacency() is graph) == ((old == env.WALL) == (new == env.WALL))
+        assert_adjacency_matches_grid(env)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_junction_shortest_path_matches_bfs(seed):
+    env = make_map(seed, loops=seed % 6)
+    junctions = env.get_junction_graph()
+    assert junctions.num_nodes < len(walkable_cells(env))
+    rng = random.Random(seed)
+    cells = walkable_cells(env)
+    for _ in range(20):
+        start, goal = rng.choice(cells), rng.choice(cells)
+        expected = cell_bfs(env, start).get(goal)
+        length, path = junctions.shortest_path(start, goal)
+        assert length == expected
+        if length is not None:
+            assert len(path) == length + 1 and path[0] == start and path[-1] == goal
+            assert_walk(env, path)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_junction_dijkstra_matches_bfs_distances(seed):
+    env = make_map(seed, loops=seed % 6)
+    junctions = env.get_junction_graph()
+    graph = env.get_adjacency()
+    source = random.Random(seed).choice(walkable_cells(env))
+    expected = bfs_distances(graph, graph.cell_id(*source))
+    dist, pre = junctions.dijkstra(graph.cell_id(*source))
+    for node, cell_id in enumerate(junctions.nodes):
+        assert dist.get(node, -1) == expected[cell_id]
+        if node in dist:
+            path = [source] + [graph.position(c) for c in junctions.expand_path(pre, node)]
+            assert len(path) == dist[node] + 1 and path[-1] == graph.position(cell_id)
+            assert_walk(env, path)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_poi_legs_match_cell_search(seed):
+    env = make_map(seed, loops=seed % 6, interior_exit=seed % 2 == 1, extra_bosses=seed % 3)
+    rng = random.Random(seed)
+    for start in [None] + rng.sample(walkable_cells(env), 2):
+        poi = PoiGraph(env, start)
+        points = [poi.graph.position(c) for c in poi.cells]
+        # 出发格子在走廊中间时不是收缩图的节点，经过它不算访问了别的兴趣点
+        stops = set(points) if poi.cells[0] in poi.junctions.node_of else set(points[1:])
+        for i, source in enumerate(points):
+            legs, plain = cell_bfs(env, source, stops), cell_bfs(env, source)
+            for j, target in enumerate(points):
+                assert poi.dist[i][j] == legs.get(target, INF)
+                assert poi.grid_dist[i][j] == plain.get(target, INF)
+                if i != j and poi.dist[i][j] < INF:
+                    path = [source] + poi.leg_path(i, j)
+                    assert len(path) == poi.dist[i][j] + 1 and path[-1] == target
+                    assert_walk(env, path)
+                    assert not set(path[1:-1]) & stops
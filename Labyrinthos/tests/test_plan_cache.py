@@ -0,0 +1,71 @@
+# labyrinthos/tests/test_plan_cache.py
+"""
+规划缓存：逐格更新的地图指纹与重新计算的结果一致，缓存不会让环境无法释放。
+"""
+import gc
+import random
+import weakref
+
+import pytest
+
+from environment import Environment, CompactEnvironment
+from tiled_environment import TiledEnvironment
+from mapped_environment import MappedEnvironment, write_maze_file
+from components.strategy_core.plan_cache import PlanCache, grid_fingerprint
+from test_environment import random_edits
+
+CELLS = Environment.CELL_CHARS
+
+
+def small_tiled(width, height):
+    return TiledEnvironment(width, height, tile_size=4, max_memory=2 * 4 * 4)
+
+
+@pytest.mark.parametrize("env_class", [Environment, CompactEnvironment, small_tiled])
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_fingerprint_matches_full_scan(env_class, seed):
+    rng = random.Random(seed)
+    env, cache = env_class(13, 9), PlanCache()
+    for _ in range(10):
+        for _ in range(rng.randrange(1, 30)):
+            env.set_cell(rng.randrange(13), rng.randrange(9), rng.choice(CELLS))
+        assert cache.fingerprint(env) == grid_fingerprint(env)
+    # 块写入和整张替换（CompactEnvironment 上会清空日志）之后重新计算
+    random_edits(env, rng, 50)
+    assert cache.fingerprint(env) == grid_fingerprint(env)
+    env.grid = [[rng.choice(CELLS) for _ in range(5)] for _ in range(4)]
+    assert cache.fingerprint(env) == grid_fingerprint(env)
+
+
+def test_fingerprint_depends_only_on_content(tmp_path):
+    rng = random.Random(0)
+    grid = [[rng.choice(CELLS) for _ in range(11)] for _ in range(7)]
+    envs = [Environment(11, 7), CompactEnvironment(11, 7), small_tiled(11, 7)]
+    for env in envs:
+        env.grid = grid
+    write_maze_file(envs[0], str(tmp_path / "map.maze"))
+    envs.append(MappedEnvironment(str(tmp_path / "map.maze")))
+    assert len({grid_fingerprint(env) for env in envs}) == 1
+
+    env, cache = envs[1], PlanCache()
+    before = cache.fingerprint(env)
+    old = env.get_cell(3, 3)
+    env.set_cell(3, 3, 'G' if old != 'G' else 'T')
+    assert cache.fingerprint(env) != before
+    env.set_cell(3, 3, old)
+    assert cache.fingerprint(env) == before
+    # 尺寸不同、编码相同的地图指纹不同
+    wide, tall = CompactEnvironment(6, 2), CompactEnvironment(2, 6)
+    assert grid_fingerprint(wide) != grid_fingerprint(tall)
+
+
+def test_cache_does_not_keep_environments_alive():
+    cache = PlanCache()
+    env = CompactEnvironment(9, 9)
+    cache.get_or_plan(env, lambda: (0, [(1, 1)]), (1, 1))
+    env.set_cell(1, 1, 'G')
+    cache.fingerprint(env)
+    ref = weakref.ref(env)
+    del env
+    gc.collect()
+    assert ref() is None and len(cache._fingerprints) == 0
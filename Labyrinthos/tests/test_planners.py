@@ -0,0 +1,221 @@
+# labyrinthos/tests/test_planners.py
+"""
+各规划模式与 bitmask_dp_planner 的对拍。
+
+bitmask_dp_planner 按 (位置, 已收集的资源点, 是否经过BOSS) 穷举状态，是其余模式的参照。
+地图都很小（资源点不超过 8 个），覆盖完美迷宫、打通若干墙壁的有环迷宫、
+终点不在叶子上、多个BOSS、体力限制以及从 S 以外的格子出发等情况。
+"""
+import random
+import time
+
+import pytest
+
+from environment import CompactEnvironment
+from components.world_generator import generate_world
+from components.strategy_core.map_evaluator import GOLD_VALUE, TRAP_VALUE, DEFAULT_STAMINA
+from components.strategy_core.dp_planner import dp_planner, bitmask_dp_planner, shortest_route_plan
+
+MAX_ITEMS = 8
+VALUES = {CompactEnvironment.GOLD: GOLD_VALUE, CompactEnvironment.TRAP: TRAP_VALUE}
+
+
+def make_map(seed: int, loops: int = 0, interior_exit: bool = False, extra_bosses: int = 0) -> CompactEnvironment:
+    """
+    生成一张小地图。
+
+    loops 为随机打通的墙壁数（大于0时通常有环）；interior_exit 时把终点挪到一个随机的通路格子上，
+    它一般不再是叶子；extra_bosses 为额外放置的BOSS数。
+    """
+    rng = random.Random(seed)
+    size = rng.choice([9, 11, 13])
+    env = CompactEnvironment(size, size)
+    generate_world(env, rng.choice(['简单', '困难']), seed=seed)
+    for _ in range(loops):
+        x, y = rng.randrange(1, size - 1), rng.randrange(1, size - 1)
+        if env.get_cell(x, y) == env.WALL:
+            env.set_cell(x, y, env.PATH)
+    # 资源点补足或削减到 4 ~ MAX_ITEMS 个，既有取舍又不让参照的状态数爆炸
+    items = sorted(env.positions_of(env.GOLD) | env.positions_of(env.TRAP))
+    target = rng.randrange(4, MAX_ITEMS + 1)
+    for x, y in rng.sample(items, max(0, len(items) - target)):
+        env.set_cell(x, y, env.PATH)
+    paths = env.get_all_paths()
+    for x, y in rng.sample(paths, min(len(paths), max(0, target - len(items)))):
+        env.set_cell(x, y, env.GOLD if rng.random() < 0.7 else env.TRAP)
+    paths = env.get_all_paths()
+    if interior_exit:
+        old = env.find_first(env.EXIT)
+        x, y = rng.choice(paths)
+        env.set_cell(*old, env.PATH)
+        env.set_cell(x, y, env.EXIT)
+        paths = env.get_all_paths()
+    for x, y in rng.sample(paths, min(extra_bosses, len(paths))):
+        env.set_cell(x, y, env.BOSS)
+    return env
+
+
+def walk(env, path, start=None, boss=False, collected=()) -> int:
+    """检查路线合法（相邻、不穿墙、经过BOSS后第一次到达终点即结束），返回沿途实际得到的金币。"""
+    start = start if start is not None else env.find_first(env.START)
+    assert path[0] == start
+    seen = set(collected)
+    coins = 0
+    for i, (x, y) in enumerate(path):
+        if i:
+            px, py = path[i - 1]
+            assert abs(x - px) + abs(y - py) == 1
+        cell = env.get_cell(x, y)
+        assert cell != env.WALL
+        if (x, y) not in seen:
+            seen.add((x, y))
+            coins += VALUES.get(cell, 0)
+        boss = boss or cell == env.BOSS
+        if cell == env.EXIT and boss:
+            assert i == len(path) - 1
+    assert boss and env.get_cell(*path[-1]) == env.EXIT
+    return coins
+
+
+def reference(env, stamina=None, start=None, boss=False, collected=()):
+    """bitmask_dp_planner 的结果；collected 在一个分支上清除，与 dp_planner 的做法相同。"""
+    if collected:
+        env = env.fork()
+        for x, y in collected:
+            env.set_cell(x, y, env.PATH)
+    return bitmask_dp_planner(env, None, None, stamina, start, boss)[0]
+
+
+def check_modes(env, modes, stamina=None, start=None, boss=False, collected=()):
+    """各模式的金币数都应与参照相同，并且给出的路线确实能得到这么多金币、不超出体力。"""
+    expected = reference(env, stamina, start, boss, collected)
+    for mode in modes:
+        budget = stamina
+        if mode == 'poi' and stamina is None:
+            budget = DEFAULT_STAMINA
+            expected_mode = reference(env, budget, start, boss, collected)
+        else:
+            expected_mode = expected
+        coins, path = dp_planner(env, mode, None, stamina=budget, start=start, boss=boss, collected=collected)
+        if mode == 'tree' and coins is None and stamina is not None:
+            continue  # 树形DP的最优路线超出体力时不给出结果，由 'auto' 改用其他模式
+        assert coins == expected_mode, (mode, stamina, start, boss, collected)
+        if coins is not None:
+            assert walk(env, path, start, boss, collected) == coins
+            if budget is not None:
+                assert len(path) <= budget
+    return expected
+
+
+def random_starts(env, rng, count):
+    """随机的出发状态：(出发格子, 是否已经过BOSS, 已收集的资源点)。"""
+    cells = [(x, y) for y in range(env.height) for x in range(env.width) if env.is_walkable(x, y)]
+    items = sorted(env.positions_of(env.GOLD) | env.positions_of(env.TRAP))
+    for _ in range(count):
+        collected = frozenset(rng.sample(items, rng.randrange(min(3, len(items)) + 1)))
+        yield rng.choice(cells), rng.random() < 0.5, collected
+
+
+def tight_stamina(env, rng, start=None, boss=False, collected=()):
+    """比不限体力的最优路线略短或刚好够用的体力，不可达时返回None。"""
+    if collected:
+        branch = env.fork()
+        for x, y in collected:
+            branch.set_cell(x, y, branch.PATH)
+    else:
+        branch = env
+    path = bitmask_dp_planner(branch, None, None, None, start, boss)[1]
+    if path is None:
+        return None
+    return max(1, len(path) - rng.randrange(0, 6))
+
+
+def test_unknown_mode_raises():
+    with pytest.raises(ValueError):
+        dp_planner(make_map(0), 'bitmsk')
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_perfect_maps(seed):
+    env = make_map(seed)
+    rng = random.Random(seed)
+    check_modes(env, ('tree', 'bnb', 'poi', 'auto'))
+    check_modes(env, ('tree', 'bnb', 'poi', 'auto'), stamina=tight_stamina(env, rng))
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_cyclic_maps(seed):
+    env = make_map(100 + seed, loops=1 + seed % 8)
+    rng = random.Random(seed)
+    check_modes(env, ('bnb', 'poi', 'auto'))
+    check_modes(env, ('bnb', 'poi', 'auto'), stamina=tight_stamina(env, rng))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_interior_exit_and_several_bosses(seed):
+    env = make_map(200 + seed, loops=seed % 3, interior_exit=True, extra_bosses=1 + seed % 4)
+    rng = random.Random(seed)
+    modes = ('tree', 'bnb', 'poi', 'auto') if seed % 3 == 0 else ('bnb', 'poi', 'auto')
+    check_modes(env, modes)
+    check_modes(env, modes, stamina=tight_stamina(env, rng))
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_starts_away_from_s(seed):
+    env = make_map(300 + seed, loops=seed % 4, interior_exit=seed % 2 == 1, extra_bosses=seed % 3)
+    rng = random.Random(seed)
+    modes = ('tree', 'bnb', 'poi', 'auto') if seed % 4 == 0 else ('bnb', 'poi', 'auto')
+    for start, boss, collected in random_starts(env, rng, 3):
+        check_modes(env, modes, start=start, boss=boss, collected=collected)
+        stamina = tight_stamina(env, rng, start, boss, collected)
+        check_modes(env, modes, stamina=stamina, start=start, boss=boss, collected=collected)
+
+
+def test_poi_returns_best_route_at_time_limit():
+    # 四十多个兴趣点，完整的子集DP要几分钟
+    env = CompactEnvironment(31, 31)
+    generate_world(env, '困难', seed=0)
+    stats = {}
+    started = time.perf_counter()
+    coins, path = dp_planner(env, 'poi', stats=stats, stamina=DEFAULT_STAMINA, time_limit=0.5)
+    assert time.perf_counter() - started < 5
+    assert stats["aborted"]
+    assert walk(env, path) == coins and len(path) <= DEFAULT_STAMINA
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_poi_returns_best_route_at_label_limit(seed):
+    env = make_map(400 + seed, loops=2)
+    stats = {}
+    coins, path = dp_planner(env, 'poi', memory_limit_mb=0.001, stats=stats, stamina=DEFAULT_STAMINA)
+    assert stats["aborted"]
+    if path is not None:
+        assert walk(env, path) == coins and coins <= reference(env, DEFAULT_STAMINA)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_shortest_route_is_shortest(seed):
+    env = make_map(500 + seed, loops=seed % 4, interior_exit=seed % 2 == 1, extra_bosses=seed % 3)
+    rng = random.Random(seed)
+    for start, boss, collected in [(None, False, ())] + list(random_starts(env, rng, 3)):
+        branch = env.fork()
+        for x, y in collected:
+            branch.set_cell(x, y, branch.PATH)
+        coins, path = shortest_route_plan(branch, start, boss)
+        assert walk(env, path, start, boss, collected) == coins
+        # 少一点体力就没有任何通关路线
+        assert bitmask_dp_planner(branch, None, None, len(path) - 1, start, boss)[1] is None
+        assert bitmask_dp_planner(branch, None, None, len(path), start, boss)[1] is not None
+
+
+def test_auto_is_bounded_when_tree_route_is_too_long():
+    # 不限体力的最优路线远超体力，必经路线则走得完
+    env = CompactEnvironment(41, 41)
+    generate_world(env, '困难', seed=2)
+    stats = {}
+    started = time.perf_counter()
+    coins, path = dp_planner(env, 'auto', stats=stats, stamina=DEFAULT_STAMINA, time_limit=0.5)
+    assert time.perf_counter() - started < 5
+    assert stats["planner"] == 'bnb' and stats["aborted"]
+    assert walk(env, path) == coins and len(path) <= DEFAULT_STAMINA
+    assert coins >= shortest_route_plan(env)[0]
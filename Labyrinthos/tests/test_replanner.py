@@ -0,0 +1,124 @@
+# labyrinthos/tests/test_replanner.py
+"""
+Replanner 沿用上一次路线后半段的条件：沿路线走并拿走途经的资源点时直接返回 path[i:]，
+走偏、路线以外的格子被修改、体力或已收集的资源点与沿路线走过来的情况不一致时完整地重新规划。
+"""
+import pytest
+
+from components.strategy_core.dp_planner import dp_planner
+from components.strategy_core.map_evaluator import DEFAULT_STAMINA
+from components.strategy_core.plan_cache import PlanCache
+from components.strategy_core.replanner import Replanner
+from test_planners import VALUES, make_map
+
+
+def planned_map(seed):
+    """一张起点出发有可行路线、且路线上有资源点的地图，以及对应的 Replanner 和第一次规划的结果。"""
+    env = make_map(seed, loops=seed % 3)
+    replanner = Replanner(env, cache=PlanCache())
+    coins, path = replanner.replan(env.find_first(env.START), stamina=DEFAULT_STAMINA)
+    if path is None or not any(env.get_cell(*cell) in VALUES for cell in path):
+        pytest.skip("路线上没有资源点")
+    return env, replanner, coins, path
+
+
+def step_onto(env, cell, boss):
+    """像游戏那样踩上一个格子：资源点和BOSS变成通路，返回得到的金币和新的BOSS标志。"""
+    content = env.get_cell(*cell)
+    if content in VALUES or content == env.BOSS:
+        env.set_cell(*cell, env.PATH)
+    return VALUES.get(content, 0), boss or content == env.BOSS
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_walking_the_plan_reuses_the_suffix(seed):
+    env, replanner, coins, path = planned_map(seed)
+    boss = False
+    gained = 0
+    for i in range(1, len(path)):
+        value, boss = step_onto(env, path[i], boss)
+        gained += value
+        if value == 0 and i < len(path) - 1:
+            continue  # 游戏只在地图变化后重新规划；中间跳过的步数由 plan["index"] 之后的查找补上
+        remaining, suffix = replanner.replan(path[i], boss, stamina=DEFAULT_STAMINA - i)
+        assert suffix == path[i:]
+        assert remaining == coins - gained
+        assert replanner.replanned == 1
+        # 与从这里重新规划的结果一致
+        assert dp_planner(env, stamina=DEFAULT_STAMINA - i, start=path[i], boss=boss)[0] == remaining
+    assert replanner.reused > 0
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_revisited_cells_resolve_by_stamina(seed):
+    env, replanner, coins, path = planned_map(seed)
+    # 第二次经过某个格子时才重新规划，中间不调用 replan
+    first = {}
+    revisit = next((i for i, cell in enumerate(path) if first.setdefault(cell, i) != i), None)
+    if revisit is None:
+        pytest.skip("路线没有重复经过的格子")
+    boss = False
+    gained = 0
+    for cell in path[1:revisit + 1]:
+        value, boss = step_onto(env, cell, boss)
+        gained += value
+    remaining, suffix = replanner.replan(path[revisit], boss, stamina=DEFAULT_STAMINA - revisit)
+    assert replanner.reused == 1
+    assert suffix == path[revisit:] and remaining == coins - gained
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_leaving_the_path_replans(seed):
+    env, replanner, coins, path = planned_map(seed)
+    x, y = path[0]
+    off_path = [(x + dx, y + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                if env.is_walkable(x + dx, y + dy) and (x + dx, y + dy) != path[1]]
+    if not off_path:
+        pytest.skip("起点只有一个出口")
+    _, boss = step_onto(env, off_path[0], False)
+    remaining, suffix = replanner.replan(off_path[0], boss, stamina=DEFAULT_STAMINA - 1)
+    assert replanner.replanned == 2 and replanner.reused == 0
+    assert remaining == dp_planner(env, stamina=DEFAULT_STAMINA - 1, start=off_path[0], boss=boss)[0]
+    assert suffix is None or suffix[0] == off_path[0]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_edits_off_the_walked_prefix_replan(seed):
+    env, replanner, coins, path = planned_map(seed)
+    # 路线以外的格子被修改
+    on_path = set(path)
+    x, y = next(cell for cell in env.get_all_paths() if cell not in on_path)
+    env.set_cell(x, y, env.GOLD)
+    replanner.replan(path[0], stamina=DEFAULT_STAMINA)
+    assert replanner.replanned == 2 and replanner.reused == 0
+
+    # 路线前方（还没走到）的资源点被拿走
+    coins, path = replanner.replan(path[0], stamina=DEFAULT_STAMINA)
+    ahead = [i for i, cell in enumerate(path) if i > 1 and env.get_cell(*cell) in VALUES]
+    if not ahead:
+        pytest.skip("路线前方没有资源点")
+    boss = step_onto(env, path[1], False)[1]
+    env.set_cell(*path[ahead[-1]], env.PATH)
+    replanned = replanner.replanned
+    replanner.replan(path[1], boss, stamina=DEFAULT_STAMINA - 1)
+    assert replanner.replanned == replanned + 1
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_mismatched_state_replans(seed):
+    env, replanner, coins, path = planned_map(seed)
+    boss = step_onto(env, path[1], False)[1]
+
+    # 剩余体力与沿路线走一步不一致
+    replanner.replan(path[1], boss, stamina=DEFAULT_STAMINA - 2)
+    assert replanner.replanned == 2 and replanner.reused == 0
+
+    # 声称收集过一个路线上还没走到的资源点
+    coins, path = replanner.replan(path[1], boss, stamina=DEFAULT_STAMINA - 2)
+    assert replanner.reused == 1
+    items = [cell for cell in path[2:] if env.get_cell(*cell) in VALUES and cell != path[1]]
+    if not items:
+        pytest.skip("路线前方没有资源点")
+    boss = step_onto(env, path[1], boss)[1]
+    replanner.replan(path[1], boss, collected=[items[0]], stamina=DEFAULT_STAMINA - 3)
+    assert replanner.replanned == 3
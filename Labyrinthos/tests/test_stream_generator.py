@@ -0,0 +1,40 @@
+# labyrinthos/tests/test_stream_generator.py
+"""
+逐行生成的迷宫：每一行长度正确，整张图是完美迷宫，写出的文件可以直接映射打开。
+"""
+import random
+
+import pytest
+
+from environment import Environment
+from mapped_environment import MappedEnvironment
+from components.stream_generator import eller_rows, stream_maze_to_file
+from test_world_generator import assert_perfect
+
+
+@pytest.mark.parametrize("size", [(3, 3), (4, 6), (21, 15), (40, 9)])
+@pytest.mark.parametrize("seed", range(5))
+def test_eller_rows_form_perfect_maze(size, seed):
+    width, height = size
+    rows = list(eller_rows(width, height, random.Random(seed)))
+    assert len(rows) == height and all(len(row) == width for row in rows)
+    env = Environment(width, height)
+    for y, row in enumerate(rows):
+        env.paste(0, y, width, row)
+    assert_perfect(env)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_streamed_file_opens_as_map(seed, tmp_path):
+    path = str(tmp_path / "stream.maze")
+    counts = stream_maze_to_file(path, 31, 21, '困难', seed=seed)
+    env = MappedEnvironment(path)
+    assert_perfect(env)
+    assert counts[env.START] == counts[env.EXIT] == 1
+    for element, count in counts.items():
+        assert env.count(element) == count
+
+    again = str(tmp_path / "again.maze")
+    assert stream_maze_to_file(again, 31, 21, '困难', seed=seed) == counts
+    with open(path, 'rb') as a, open(again, 'rb') as b:
+        assert a.read() == b.read()
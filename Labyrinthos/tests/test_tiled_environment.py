@@ -0,0 +1,86 @@
+# labyrinthos/tests/test_tiled_environment.py
+"""
+分块环境的 fork：分支之间互不影响，原分支的 tile_dir 照常保存，临时目录随分支释放。
+"""
+import gc
+import os
+
+from tiled_environment import TiledEnvironment
+
+SIZE, TILE = 64, 16
+
+
+def open_tiled(tile_dir=None):
+    """只能同时在内存中放两个瓦片的小环境，读遍地图就会反复淘汰。"""
+    return TiledEnvironment(SIZE, SIZE, tile_size=TILE, tile_dir=tile_dir, max_memory=TILE * TILE * 2)
+
+
+def open_floor(tile_dir=None):
+    env = open_tiled(tile_dir)
+    env.fill_rect(0, 0, SIZE - 1, SIZE - 1, env.PATH)
+    return env
+
+
+def cycle_tiles(*envs):
+    """每个瓦片都访问一次，把先前的修改挤出内存。"""
+    for y in range(0, SIZE, TILE):
+        for x in range(0, SIZE, TILE):
+            for env in envs:
+                env.get_cell(x, y)
+
+
+def test_fork_keeps_parent_tile_dir(tmp_path):
+    parent = open_floor(str(tmp_path))
+    parent.set_cell(1, 1, 'G')
+    child = parent.fork()
+    parent.set_cell(20, 20, 'G')
+    parent.flush()
+    reloaded = open_tiled(str(tmp_path))
+    assert reloaded.get_cell(20, 20) == 'G' and reloaded.get_cell(1, 1) == 'G'
+    cycle_tiles(child, parent)
+    assert child.get_cell(20, 20) == ' ' and child.get_cell(1, 1) == 'G'
+
+    child.set_cell(40, 40, 'T')
+    cycle_tiles(child)
+    assert child.get_cell(40, 40) == 'T' and parent.get_cell(40, 40) == ' '
+    assert open_tiled(str(tmp_path)).get_cell(40, 40) == ' '
+
+
+def test_fork_does_not_touch_tiles(tmp_path):
+    parent = open_floor(str(tmp_path))
+    parent.flush()
+    files = sorted(os.listdir(tmp_path))
+    child = parent.fork()
+    assert child.loaded_tiles == 0 and sorted(os.listdir(tmp_path)) == files
+    assert child.get_cell(5, 5) == ' '
+
+
+def test_nested_forks_are_isolated():
+    root = open_floor()
+    child = root.fork()
+    root.set_cell(3, 3, 'G')
+    grandchild = child.fork()
+    child.set_cell(40, 40, 'T')
+    grandchild.set_cell(50, 50, 'L')
+    root.grid = [[root.WALL] * SIZE for _ in range(SIZE)]
+    cycle_tiles(root, child, grandchild)
+    assert [env.get_cell(3, 3) for env in (root, child, grandchild)] == ['#', ' ', ' ']
+    assert [env.get_cell(40, 40) for env in (root, child, grandchild)] == ['#', 'T', ' ']
+    assert [env.get_cell(50, 50) for env in (root, child, grandchild)] == ['#', ' ', 'L']
+
+
+def test_temporary_dirs_are_removed_with_branches():
+    parent = open_floor()
+    child = parent.fork()
+    parent.set_cell(3, 3, 'G')
+    child.set_cell(40, 40, 'T')
+    cycle_tiles(parent, child)
+    dirs = [child._spill_dir, parent._spill_dir, child._base._dir.name]
+    assert all(os.path.isdir(path) for path in dirs)
+    del parent
+    gc.collect()
+    # 子分支还要读取原分支，原分支不会提前释放
+    assert all(os.path.isdir(path) for path in dirs) and child.get_cell(3, 3) == ' '
+    del child
+    gc.collect()
+    assert not any(os.path.isdir(path) for path in dirs)
@@ -0,0 +1,141 @@
+# labyrinthos/tests/test_world_generator.py
+"""
+地图生成：分治法生成的必须是完美迷宫（通路连通且无环），并与原来的递归写法逐格相同。
+"""
+import random
+import sys
+
+import pytest
+
+from environment import Environment, CompactEnvironment
+from tiled_environment import TiledEnvironment
+from components import world_generator
+from components.world_generator import generate_world, generate_world_steps, carve_perfect_maze, _divide, _place_elements
+
+
+def assert_perfect(env):
+    """所有可行走的格子连通，且相邻关系恰好构成一棵树。"""
+    cells = [(x, y) for y in range(env.height) for x in range(env.width) if env.is_walkable(x, y)]
+    edges = sum(env.is_walkable(x + 1, y) + env.is_walkable(x, y + 1) for x, y in cells)
+    assert edges == len(cells) - 1
+    seen, stack = {cells[0]}, [cells[0]]
+    while stack:
+        x, y = stack.pop()
+        for nxt in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if nxt not in seen and env.is_walkable(*nxt):
+                seen.add(nxt)
+                stack.append(nxt)
+    assert len(seen) == len(cells)
+
+
+def walk_distances(env, source):
+    """逐格广度优先搜索得到的步数，作为参照。"""
+    dist, frontier = {source: 0}, [source]
+    while frontier:
+        nxt = []
+        for x, y in frontier:
+            for cell in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if cell not in dist and env.is_walkable(*cell):
+                    dist[cell] = dist[(x, y)] + 1
+                    nxt.append(cell)
+        frontier = nxt
+    return dist
+
+
+def recursive_division(env, x, y, width, height):
+    """分治法原来的递归写法，作为参照。"""
+    for child in _divide(env, x, y, width, height, random):
+        recursive_division(env, *child)
+
+
+@pytest.mark.parametrize("size", [(5, 5), (15, 9), (9, 31), (41, 41)])
+@pytest.mark.parametrize("seed", range(5))
+def test_iterative_division_matches_recursion(size, seed):
+    expected, env = Environment(*size), Environment(*size)
+    random.seed(seed)
+    expected.fill_rect(1, 1, size[0] - 1, size[1] - 1, expected.PATH)
+    recursive_division(expected, 0, 0, size[0] - 1, size[1] - 1)
+    random.seed(seed)
+    carve_perfect_maze(env)
+    assert env.grid == expected.grid
+    assert_perfect(env)
+
+
+def test_division_ignores_recursion_limit(monkeypatch):
+    # 每道墙都贴着区域的一端建，递归写法的深度与高度成正比
+    monkeypatch.setattr(random, 'randrange', lambda start, stop, step=1: start)
+    size = (5, 2 * sys.getrecursionlimit() + 1)
+    with pytest.raises(RecursionError):
+        recursive_division(Environment(*size), 0, 0, size[0] - 1, size[1] - 1)
+    env = CompactEnvironment(*size)
+    carve_perfect_maze(env)
+    assert_perfect(env)
+
+
+@pytest.mark.parametrize("env_class", [CompactEnvironment, TiledEnvironment])
+@pytest.mark.parametrize("seed", range(5))
+def test_wall_drawing_matches_across_storage(env_class, seed):
+    # 墙壁整段写入：紧凑网格用（步长）切片，其余环境逐格经过 set_cell
+    size = (37, 23)
+    expected = Environment(*size)
+    carve_perfect_maze(expected, random.Random(seed))
+    env = env_class(*size) if env_class is CompactEnvironment else env_class(*size, tile_size=8)
+    carve_perfect_maze(env, random.Random(seed))
+    assert env.grid == expected.grid
+    assert_perfect(env)
+
+
+def test_seed_reproduces_world():
+    worlds = []
+    for seed in (3, 3, 4):
+        env = CompactEnvironment(41, 31)
+        generate_world(env, '困难', seed=seed)
+        worlds.append(env.grid)
+    assert worlds[0] == worlds[1] and worlds[0] != worlds[2]
+
+
+def test_parallel_generation_matches_sequential(monkeypatch):
+    # 降低启用进程池的门槛，让一张不大的地图也拆给两个进程
+    monkeypatch.setattr(world_generator, 'PARALLEL_MIN_AREA', 0)
+    sequential, parallel = CompactEnvironment(257, 193), CompactEnvironment(257, 193)
+    generate_world(sequential, '困难', seed=11, workers=1)
+    generate_world(parallel, '困难', seed=11, workers=2)
+    assert parallel.grid == sequential.grid
+    assert_perfect(parallel)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_exit_is_farthest_from_start(seed):
+    env = CompactEnvironment(31, 25)
+    generate_world(env, '简单', seed=seed)
+    dist = walk_distances(env, env.find_first(env.START))
+    assert dist[env.find_first(env.EXIT)] == max(dist.values())
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_elements_stay_in_start_component(seed):
+    # 两条互不相通的走廊：终点和其余元素只能放在起点所在的那一条上
+    env = Environment(9, 5)
+    env.fill_rect(1, 1, 8, 2, env.PATH)
+    env.fill_rect(1, 3, 8, 4, env.PATH)
+    _place_elements(env, env.get_all_paths(), 3, 2, 0, 1, random.Random(seed))
+    start = env.find_first(env.START)
+    dist = walk_distances(env, start)
+    placed = [(x, y) for y in range(env.height) for x in range(env.width) if env.get_cell(x, y) not in '# ']
+    assert all(cell in dist for cell in placed)
+    assert dist[env.find_first(env.EXIT)] == max(dist.values())
+
+
+@pytest.mark.parametrize("algorithm", ['recursive_division', 'kruskal'])
+@pytest.mark.parametrize("seed", [None, 0, 1])
+def test_steps_match_generate_world(seed, algorithm):
+    expected, env = CompactEnvironment(61, 45), CompactEnvironment(61, 45)
+    random.seed(5)
+    generate_world(expected, '困难', seed=seed, algorithm=algorithm)
+    random.seed(5)
+    progress = list(generate_world_steps(env, '困难', seed=seed, algorithm=algorithm, budget=8))
+    assert env.grid == expected.grid
+    assert progress[0] == 0.0 and progress[-1] == 1.0
+    assert progress == sorted(progress)
+    if algorithm == 'recursive_division':
+        assert len(progress) > 10
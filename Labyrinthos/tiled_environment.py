@@ -0,0 +1,277 @@
+# labyrinthos/tiled_environment.py
+
+import os
+import tempfile
+import weakref
+from collections import OrderedDict
+
+from environment import Environment
+
+
+def _tile_file(directory: str, tx: int, ty: int) -> str:
+    return os.path.join(directory, f"tile_{tx}_{ty}.bin")
+
+
+class _TileSnapshot:
+    """
+    fork 时原分支的只读视图，由新分支持有。
+
+    原分支之后第一次修改某个瓦片之前，会先把它当时的内容存进这里（写到一个临时目录）；
+    没有存过的瓦片在原分支上一直没有变，直接向原分支读取当前内容。
+    """
+
+    def __init__(self, source: 'TiledEnvironment'):
+        self.source = source
+        self.saved = set()  # 已经存下 fork 时内容的瓦片
+        self._dir = None    # TemporaryDirectory，第一次保存时才创建，快照释放时删除
+
+    def save(self, key: tuple[int, int], tile: bytearray):
+        if self._dir is None:
+            self._dir = tempfile.TemporaryDirectory(prefix="labyrinthos_fork_")
+        with open(_tile_file(self._dir.name, *key), 'wb') as f:
+            f.write(tile)
+        self.saved.add(key)
+
+    def load(self, key: tuple[int, int]) -> bytearray:
+        if key in self.saved:
+            with open(_tile_file(self._dir.name, *key), 'rb') as f:
+                return bytearray(f.read())
+        return self.source._current_tile(key)
+
+
+class TiledEnvironment(Environment):
+    """
+    按固定大小的瓦片（tile）分块存储网格的环境，用于远超内存容量的超大迷宫。
+
+    每个瓦片是一个 tile_size x tile_size 的 bytearray，编码与 CompactEnvironment 相同。
+    瓦片在第一次被访问时才从磁盘读取或由 tile_factory 生成，
+    内存中最多保留 max_memory 字节的瓦片，超出后按 LRU 顺序淘汰；
+    被修改过的瓦片在淘汰前会写回 tile_dir（未指定时写到一个临时目录）。
+
+    get_cell/set_cell/get_vision 等按格访问的接口与 Environment 完全一致，
+    而 grid、get_all_paths、walkable_mask 以及第一次建立位置索引都需要遍历整张地图，
+    只适合在地图规模可控时使用。
+    """
+
+    def __init__(self, width: int, height: int, tile_size: int = 256, tile_dir: str | None = None,
+                 tile_factory=None, max_memory: int = 64 * 1024 * 1024):
+        """
+        初始化分块环境。
+
+        Args:
+            width (int): 迷宫的宽度。
+            height (int): 迷宫的高度。
+            tile_size (int): 瓦片边长（单元格数）。
+            tile_dir (str | None): 瓦片文件所在目录。已有的瓦片从这里读取，修改过的瓦片也写回这里。
+            tile_factory: 可选的 tile_factory(tx, ty, tile_size) -> bytearray，
+                用于生成磁盘上不存在的瓦片；未提供时缺失的瓦片视为整块墙壁。
+            max_memory (int): 内存中瓦片占用的上限（字节）。
+        """
+        self.tile_size = tile_size
+        self.tile_dir = tile_dir
+        self.tile_factory = tile_factory
+        self.max_tiles = max(1, max_memory // (tile_size * tile_size))
+        super().__init__(width, height)
+
+    def _init_storage(self):
+        self._tiles = OrderedDict()  # (tx, ty) -> bytearray，按最近使用顺序排列
+        self._dirty = set()          # 内存中被修改过、尚未写回磁盘的瓦片
+        self._spill_dir = None       # 未指定 tile_dir 时用于暂存被淘汰的脏瓦片
+        self._spill = None           # 暂存目录的 TemporaryDirectory，本分支释放时删除
+        self._last_key = None        # 最近一次访问的瓦片，连续访问同一瓦片时跳过LRU维护
+        self._last_tile = None
+        self._base = None            # 从别的分支 fork 出来时，它在 fork 时的只读视图（_TileSnapshot）
+        self._snapshots = weakref.WeakSet()  # 从本分支 fork 出去、仍然存活的分支所持有的快照
+
+    # --- 瓦片管理 ---
+
+    def tile_path(self, tx: int, ty: int) -> str | None:
+        """返回瓦片 (tx, ty) 对应的文件路径；没有可用目录时返回None。"""
+        directory = self.tile_dir or self._spill_dir
+        if directory is None:
+            return None
+        return _tile_file(directory, tx, ty)
+
+    def _load_tile(self, tx: int, ty: int) -> bytearray:
+        """
+        从磁盘读取瓦片；本分支没有写过它时，fork 出来的分支向 fork 时的快照读取，
+        其余情况调用 tile_factory 生成。
+        """
+        path = self.tile_path(tx, ty)
+        if path is not None and os.path.exists(path):
+            with open(path, 'rb') as f:
+                return bytearray(f.read())
+        if self._base is not None:
+            return self._base.load((tx, ty))
+        if self.tile_factory is not None:
+            return bytearray(self.tile_factory(tx, ty, self.tile_size))
+        return bytearray(self.tile_size * self.tile_size)
+
+    def _write_tile(self, key: tuple[int, int], tile: bytearray):
+        """把一个瓦片写到磁盘。"""
+        if self.tile_dir is None and self._spill_dir is None:
+            self._spill = tempfile.TemporaryDirectory(prefix="labyrinthos_tiles_")
+            self._spill_dir = self._spill.name
+        directory = self.tile_dir or self._spill_dir
+        os.makedirs(directory, exist_ok=True)
+        with open(self.tile_path(*key), 'wb') as f:
+            f.write(tile)
+
+    def _current_tile(self, key: tuple[int, int]) -> bytearray:
+        """瓦片当前内容的副本，不影响本分支的LRU顺序。"""
+        tile = self._tiles.get(key)
+        return bytearray(tile) if tile is not None else self._load_tile(*key)
+
+    def _preserve(self, key: tuple[int, int], tile: bytearray):
+        """修改瓦片之前调用：还没有保存过它的快照先存下当前内容。"""
+        for snapshot in self._snapshots:
+            if key not in snapshot.saved:
+                snapshot.save(key, tile)
+
+    def _tile(self, tx: int, ty: int) -> bytearray:
+        """取得瓦片 (tx, ty)，必要时加载并按 LRU 淘汰最久未使用的瓦片。"""
+        key = (tx, ty)
+        if key == self._last_key:
+            return self._last_tile
+        tiles = self._tiles
+        tile = tiles.get(key)
+        if tile is None:
+            tile = self._load_tile(tx, ty)
+            tiles[key] = tile
+            while len(tiles) > self.max_tiles:
+                self._evict_oldest()
+        else:
+            tiles.move_to_end(key)
+        self._last_key, self._last_tile = key, tile
+        return tile
+
+    def _evict_oldest(self):
+        """淘汰最久未使用的瓦片，被修改过的瓦片先写回磁盘。"""
+        key, tile = self._tiles.popitem(last=False)
+        if key in self._dirty:
+            self._write_tile(key, tile)
+            self._dirty.discard(key)
+        if key == self._last_key:
+            self._last_key = self._last_tile = None
+
+    def flush(self):
+        """把内存中所有被修改过的瓦片写回磁盘。"""
+        for key in list(self._dirty):
+            self._write_tile(key, self._tiles[key])
+        self._dirty.clear()
+
+    def _share_storage(self, child: 'Environment'):
+        """
+        fork 时不复制、也不读写任何瓦片，代价是 O(1)。
+
+        新分支从空的内存开始，持有原分支的快照（_TileSnapshot）：
+        它被淘汰的脏瓦片写到自己的临时目录，没写过的瓦片通过快照读取 fork 时的内容。
+        原分支照常读写自己的 tile_dir，只是每个瓦片在 fork 之后第一次被修改前，
+        先把原内容存进仍然存活的快照。快照引用着原分支，所以原分支至少与新分支活得一样久。
+        """
+        snapshot = _TileSnapshot(self)
+        self._snapshots.add(snapshot)
+        child._base = snapshot
+        child._snapshots = weakref.WeakSet()
+        child.tile_dir = None
+        child._spill_dir = None
+        child._spill = None
+        child._tiles = OrderedDict()
+        child._dirty = set()
+        child._last_key = child._last_tile = None
+
+    @property
+    def loaded_tiles(self) -> int:
+        """当前驻留在内存中的瓦片数量。"""
+        return len(self._tiles)
+
+    # --- 单元格访问 ---
+
+    def get_code(self, x: int, y: int) -> int:
+        """获取指定坐标的元素编码，边界外视为墙壁。"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            ts = self.tile_size
+            return self._tile(x // ts, y // ts)[(y % ts) * ts + x % ts]
+        return self.CELL_CODES[self.WALL]
+
+    def get_cell(self, x: int, y: int) -> str:
+        """安全地获取指定坐标的元素。"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            ts = self.tile_size
+            return self.CELL_CHARS[self._tile(x // ts, y // ts)[(y % ts) * ts + x % ts]]
+        return self.WALL
+
+    def set_cell(self, x: int, y: int, value: str):
+        """安全地设置指定坐标的元素。"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            ts = self.tile_size
+            tx, ty = x // ts, y // ts
+            tile = self._tile(tx, ty)
+            if self._snapshots:
+                self._preserve((tx, ty), tile)
+            i = (y % ts) * ts + x % ts
+            old = self.CELL_CHARS[tile[i]]
+            tile[i] = self.CELL_CODES[value]
+            self._dirty.add((tx, ty))
+            if self._positions is not None:
+                self._update_position_index(x, y, old, value)
+            if old != value:
+                self._cell_changed(x, y, old, value)
+
+    def is_walkable(self, x: int, y: int) -> bool:
+        """检查一个单元格是否不是墙壁，即可行走。"""
+        return self.get_code(x, y) != self.CELL_CODES[self.WALL]
+
+    # --- 整图操作（需要遍历所有瓦片） ---
+
+    def iter_rows(self):
+        """逐行产出 (y, 该行编码的 bytes)，一次只需要一行瓦片驻留在内存中。"""
+        ts = self.tile_size
+        for y in range(self.height):
+            ty, row_offset = y // ts, (y % ts) * ts
+            row = bytearray()
+            for tx in range((self.width + ts - 1) // ts):
+                row += self._tile(tx, ty)[row_offset:row_offset + ts]
+            yield y, bytes(row[:self.width])
+
+    @property
+    def grid(self) -> list[list[str]]:
+        """解码出完整的 list-of-lists 网格（副本）。会遍历整张地图。"""
+        return [[self.CELL_CHARS[code] for code in row] for _, row in self.iter_rows()]
+
+    @grid.setter
+    def grid(self, grid: list[list[str]]):
+        """用字符网格整体替换当前内容，尺寸以传入的网格为准。"""
+        # 内存中修改过的瓦片马上会被丢弃，先交给快照；其余瓦片在下面被覆盖时再保存
+        for key, tile in self._tiles.items():
+            self._preserve(key, tile)
+        self.height = len(grid)
+        self.width = len(grid[0]) if grid else 0
+        self._tiles.clear()
+        self._dirty.clear()
+        self._last_key = self._last_tile = None
+        self._on_grid_replaced()
+        for y, row in enumerate(grid):
+            for x, cell in enumerate(row):
+                self.set_cell(x, y, cell)
+
+    def walkable_mask(self) -> bytearray:
+        """返回按 y * width + x 排列的可行走掩码。会遍历整张地图。"""
+        wall = self.CELL_CODES[self.WALL]
+        return bytearray(code != wall for _, row in self.iter_rows() for code in row)
+
+    def get_all_paths(self) -> list[tuple[int, int]]:
+        """返回所有通路格子的(x, y)坐标列表。会遍历整张地图。"""
+        path = self.CELL_CODES[self.PATH]
+        return [(x, y) for y, row in self.iter_rows() for x, code in enumerate(row) if code == path]
+
+    def _build_position_index(self) -> dict[str, set[tuple[int, int]]]:
+        """逐行扫描所有瓦片建立位置索引。之后由 set_cell 维护，不会再次扫描。"""
+        positions = {element: set() for element in self.INDEXED_ELEMENTS}
+        chars = self.CELL_CHARS
+        for y, row in self.iter_rows():
+            for x, code in enumerate(row):
+                cell = chars[code]
+                if cell in positions:
+                    positions[cell].add((x, y))
+        return positions